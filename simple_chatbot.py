@@ -5,6 +5,8 @@ This is a fallback version when the full ManagerAgent has issues.
 
 import chainlit as cl
 import os
+import time
+from collections import OrderedDict, deque
 from dotenv import load_dotenv
 import logging
 
@@ -15,8 +17,69 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Session limits for the in-memory store
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "1000"))
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", "3600"))
+MAX_MESSAGES_PER_SESSION = int(os.getenv("MAX_CHAT_HISTORY", "50"))
+
+
+class BoundedSessionStore:
+    """
+    In-memory session dict with LRU eviction and idle expiry.
+
+    Sessions are kept in last-access order, so expired sessions are always at
+    the front and are dropped on every access without a background thread.
+    """
+
+    def __init__(self, max_sessions: int, idle_ttl_seconds: int):
+        self.max_sessions = max_sessions
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self._sessions = OrderedDict()  # session_id -> (last_access, data)
+        self.evicted = 0
+        self.expired = 0
+
+    def _sweep(self, now: float):
+        while self._sessions:
+            last_access, _ = next(iter(self._sessions.values()))
+            if now - last_access <= self.idle_ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def __setitem__(self, session_id, data):
+        now = time.monotonic()
+        self._sweep(now)
+        self._sessions[session_id] = (now, data)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def get(self, session_id, default=None):
+        now = time.monotonic()
+        self._sweep(now)
+        if session_id not in self._sessions:
+            return default
+        _, data = self._sessions[session_id]
+        self._sessions[session_id] = (now, data)
+        self._sessions.move_to_end(session_id)
+        return data
+
+    def __getitem__(self, session_id):
+        data = self.get(session_id)
+        if data is None:
+            raise KeyError(session_id)
+        return data
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+
 # Simple state management without Redis
-chat_sessions = {}
+chat_sessions = BoundedSessionStore(MAX_SESSIONS, SESSION_IDLE_TTL_SECONDS)
 
 @cl.on_chat_start
 async def start():
@@ -32,7 +95,7 @@ async def start():
     
     # Initialize session storage
     chat_sessions[session_id] = {
-        "messages": [],
+        "messages": deque(maxlen=MAX_MESSAGES_PER_SESSION),
         "user_name": "User"
     }
     
@@ -225,6 +288,7 @@ async def main(message: cl.Message):
 • Task Type: {task_type}  
 • Message Length: {len(user_message)} chars
 • Total Messages: {len(chat_sessions.get(session_id, {}).get('messages', []))}
+• Live Sessions: {len(chat_sessions)} (expired: {chat_sessions.expired}, evicted: {chat_sessions.evicted})
             """
             await cl.Message(content=debug_info).send()
             
@@ -251,7 +315,7 @@ async def clear_chat(action):
     """Clear current chat session."""
     session_id = cl.user_session.get("session_id")
     if session_id and session_id in chat_sessions:
-        chat_sessions[session_id]["messages"] = []
+        chat_sessions[session_id]["messages"].clear()
         await cl.Message(content="🗑️ Đã xóa lịch sử chat!").send()
     else:
         await cl.Message(content="❌ Không có lịch sử để xóa.").send()
@@ -0,0 +1,218 @@
+"""
+Exact-match cache of answers to stateless questions.
+
+Answers to questions whose result does not depend on the conversation (FAQ
+answers, web search results) are cached by task type and normalized question
+text, in two tiers:
+
+- a small in-process LRU, for repeats served by the same worker;
+- Redis, shared by every worker, with a TTL.
+
+Keys include a per-collection generation counter stored in Redis. Reindexing
+the collection increments it (see bump_collection_generation), which makes
+every cached answer for that collection unreachable at once; the old entries
+simply expire.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence, Tuple
+
+import msgpack
+
+from data.cache.async_redis_cache import maybe_await
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = " ?!.,;:…"
+
+# Messages whose meaning depends on earlier turns ("còn cái đó thì sao?");
+# their answers are neither served from nor stored in answer caches
+CONTEXT_DEPENDENT_PATTERN = re.compile(
+    r"^\s*(còn|vậy|thế|và)\b|\b(đó|này|kia|ấy|trên|nó|câu trước|ý trước|lúc nãy|vừa rồi|như trên)\b",
+    re.IGNORECASE
+)
+
+
+def is_context_dependent(text: str) -> bool:
+    """Whether a question refers back to earlier turns of the conversation."""
+    return bool(CONTEXT_DEPENDENT_PATTERN.search(text))
+
+
+def normalize_question(text: str) -> str:
+    """Canonical form of a question: NFC, lowercase, single spaces, no trailing punctuation."""
+    text = unicodedata.normalize("NFC", text).lower()
+    return _WHITESPACE.sub(" ", text).strip(_TRAILING_PUNCTUATION)
+
+
+def generation_key(collection_name: str) -> str:
+    """Redis key of the generation counter for a collection."""
+    return f"answer_cache:{collection_name}:gen"
+
+
+def answer_key(collection_name: str, generation: int, task: str, question: str) -> str:
+    """Redis key of a cached answer."""
+    digest = hashlib.sha1(normalize_question(question).encode("utf-8")).hexdigest()
+    return f"answer:{collection_name}:{generation}:{task}:{digest}"
+
+
+def bump_collection_generation(collection_name: str, redis_client=None) -> Optional[int]:
+    """
+    Invalidate every cached answer for a collection; call after (re)indexing it.
+
+    Uses the configured memory backend (MEMORY_BACKEND) when no client is
+    given. Failures are logged, not raised, so indexing never fails because
+    the cache is unreachable.
+    """
+    try:
+        if redis_client is None:
+            from data.cache.backends import create_backend
+            redis_client = create_backend(os.getenv("MEMORY_BACKEND", "redis")).client()
+        generation = int(redis_client.incr(generation_key(collection_name)))
+        logger.info(f"Answer cache for '{collection_name}' invalidated (generation {generation})")
+        return generation
+    except Exception as e:
+        logger.warning(f"Could not invalidate answer cache for '{collection_name}': {e}")
+        return None
+
+
+class CollectionGeneration:
+    """Reads a collection's generation counter, trusting the last value for a few seconds."""
+
+    def __init__(self, redis_client, collection_name: str, check_seconds: float = 5.0):
+        self.redis_client = redis_client
+        self.collection_name = collection_name
+        self.check_seconds = check_seconds
+        self._value = 0
+        self._checked_at = float("-inf")
+
+    async def read(self) -> int:
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_seconds:
+            raw = await maybe_await(self.redis_client.get(generation_key(self.collection_name)))
+            self._value = int(raw) if raw is not None else 0
+            self._checked_at = now
+        return self._value
+
+
+class AnswerCache:
+    """Two-tier exact-match answer cache for one collection."""
+
+    def __init__(
+        self,
+        redis_client,
+        collection_name: str,
+        tasks: Sequence[str] = ("qna", "search"),
+        ttl_seconds: int = 3600,
+        local_max_entries: int = 1024,
+        local_ttl_seconds: float = 300.0,
+        generation_check_seconds: float = 5.0,
+    ):
+        """
+        Args:
+            redis_client: Sync or asyncio Redis client for the shared tier
+            collection_name: Collection whose reindexing invalidates the cache
+            tasks: Task types whose answers are cacheable, in lookup order
+            ttl_seconds: Expiry of shared entries
+            local_max_entries: Size of the in-process LRU tier (0 disables it)
+            local_ttl_seconds: Expiry of in-process entries
+            generation_check_seconds: How long the generation counter is trusted
+                before it is read from Redis again
+        """
+        self.redis_client = redis_client
+        self.collection_name = collection_name
+        self.tasks = tuple(tasks)
+        self.ttl_seconds = ttl_seconds
+        self.local_max_entries = local_max_entries
+        self.local_ttl_seconds = local_ttl_seconds
+        self.generation_check_seconds = generation_check_seconds
+
+        self._local: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation_reader = CollectionGeneration(redis_client, collection_name, generation_check_seconds)
+        self._generation = 0
+        self._stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    async def generation(self) -> int:
+        """Current collection generation; a change drops the local tier."""
+        generation = await self._generation_reader.read()
+        with self._lock:
+            if generation != self._generation:
+                self._local.clear()
+                self._stats["invalidations"] += 1
+                self._generation = generation
+        return generation
+
+    def _local_get(self, key: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            expires_at, task, answer = entry
+            if expires_at < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return task, answer
+
+    def _local_put(self, key: str, task: str, answer: str):
+        if self.local_max_entries <= 0:
+            return
+        with self._lock:
+            self._local[key] = (time.monotonic() + self.local_ttl_seconds, task, answer)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    async def get(self, question: str) -> Optional[Tuple[str, str]]:
+        """Return (task type, answer) for a question, or None."""
+        generation = await self.generation()
+        keys = [answer_key(self.collection_name, generation, task, question) for task in self.tasks]
+
+        for key in keys:
+            hit = self._local_get(key)
+            if hit is not None:
+                with self._lock:
+                    self._stats["local_hits"] += 1
+                return hit
+
+        for key, raw in zip(keys, await maybe_await(self.redis_client.mget(keys))):
+            if raw is None:
+                continue
+            entry = msgpack.unpackb(raw, raw=False)
+            self._local_put(key, entry["t"], entry["a"])
+            with self._lock:
+                self._stats["shared_hits"] += 1
+            return entry["t"], entry["a"]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    async def put(self, question: str, task: str, answer: str):
+        """Cache the answer to a question of a cacheable task type."""
+        if task not in self.tasks:
+            return
+        generation = await self.generation()
+        key = answer_key(self.collection_name, generation, task, question)
+        record = msgpack.packb({"t": task, "a": answer, "ts": time.time()}, use_bin_type=True)
+        await maybe_await(self.redis_client.set(key, record, ex=self.ttl_seconds))
+        self._local_put(key, task, answer)
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_entries"] = len(self._local)
+            stats["generation"] = self._generation
+        lookups = stats["local_hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["local_hits"] + stats["shared_hits"]) / lookups if lookups else 0.0
+        return stats
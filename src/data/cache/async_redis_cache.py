@@ -0,0 +1,107 @@
+import inspect
+from typing import Union
+
+from data.cache.backends import MemoryBackend
+from data.cache.redis_cache import (
+    HistoryMemoryBase,
+    ShortTermMemory,
+    format_history_context,
+    format_history_entry,
+)
+
+
+async def maybe_await(value):
+    """Return the result of a memory call, awaiting it if the backend is async."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+def is_async_client(redis_client) -> bool:
+    """Whether a memory client is an asyncio one (its pipelines are awaited)."""
+    return inspect.iscoroutinefunction(redis_client.pipeline(transaction=False).execute)
+
+
+class AsyncShortTermMemory(HistoryMemoryBase):
+    """
+    asyncio counterpart of ShortTermMemory backed by redis.asyncio.
+
+    Exposes the same API as coroutines so history reads and writes never block
+    the event loop of Chainlit handlers or ManagerAgent. Connections come from
+    the process-wide pool in data.cache.redis_pool.
+    """
+
+    def _create_client(self, backend: MemoryBackend):
+        return backend.async_client()
+
+    async def store(self, key: str, message: Union[str, bytes]):
+        """Store a message in Redis, keeping only the latest 'max_messages' messages."""
+        raw = message.encode("utf-8") if isinstance(message, str) else message
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            self._queue_store(pipe, key, raw)
+            results = await pipe.execute()
+        if self._stored(key, raw, results):
+            await self._enforce_quota(key)
+
+    async def _enforce_quota(self, key: str):
+        """Drop the oldest messages until the session fits its byte quota."""
+        entries = await self.redis_client.lrange(key, 0, -1)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            keep = self._queue_quota_trim(pipe, key, entries)
+            await pipe.execute()
+        self._quota_trimmed(key, len(entries) - keep)
+
+    async def retrieve(self, key: str):
+        """Retrieve all messages from Redis for a session (key)."""
+        messages = await self.retrieve_raw(key)
+        return [msg.decode("utf-8") for msg in messages]
+
+    async def retrieve_raw(self, key: str):
+        """Retrieve all messages for a session as raw bytes, newest first."""
+        if self.history_cache is None:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                self._queue_read(pipe, key)
+                return (await pipe.execute())[0]
+
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            self._queue_version_read(pipe, key)
+            version = (await pipe.execute())[0]
+        cached = self._cached(key, version)
+        if cached is not None:
+            return cached
+
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            self._queue_versioned_read(pipe, key)
+            results = await pipe.execute()
+        return self._versioned_read(key, results)
+
+    async def delete(self, key: str):
+        """Delete all messages for a given key."""
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            self._queue_delete(pipe, key)
+            await pipe.execute()
+        self._deleted(key)
+
+    async def get_history_context(self, session_key):
+        """Build conversation history context"""
+        return format_history_context(await self.retrieve(session_key))
+
+    async def store_message(self, session_key, role, content):
+        """Store a message with timestamp"""
+        await self.store(session_key, format_history_entry(role, content))
+
+    async def store_user_message(self, session_key, content):
+        """Store user message"""
+        await self.store_message(session_key, "User", content)
+
+    async def store_bot_message(self, session_key, content):
+        """Store bot message"""
+        await self.store_message(session_key, "Bot", content)
+
+    async def store_error_message(self, session_key, error):
+        """Store error message"""
+        await self.store_message(session_key, "System", f"Error - {str(error)}")
+
+    # Session bookkeeping lives in the Chainlit user session, not in Redis
+    get_session_key = ShortTermMemory.get_session_key
+    update_message_count = ShortTermMemory.update_message_count
@@ -0,0 +1,89 @@
+"""
+Memory backends for chat history.
+
+The memory components (ShortTermMemory, AsyncShortTermMemory and everything
+built on their `redis_client`) only issue Redis commands, so a backend is just
+the source of the sync and asyncio command clients:
+
+- RedisBackend: clients bound to the process-wide pools of data.cache.redis_pool
+- InProcessBackend: clients over an InProcessStore, with the same semantics
+  (bounded lists, TTLs, atomic pipelines) and no external service, for tests,
+  CI and local benchmarks
+"""
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from data.cache.inprocess_store import AsyncInProcessClient, InProcessClient, InProcessStore
+from data.cache.redis_pool import (
+    RedisPoolSettings,
+    get_async_redis_client,
+    get_default_settings,
+    get_redis_client,
+)
+
+BACKEND_NAMES = ("redis", "memory")
+
+
+class MemoryBackend(ABC):
+    """Provides the command clients used by the memory components."""
+
+    name: str = ""
+
+    @abstractmethod
+    def client(self):
+        """Return a synchronous client with the redis.StrictRedis interface."""
+
+    @abstractmethod
+    def async_client(self):
+        """Return an asyncio client with the redis.asyncio.Redis interface."""
+
+
+class RedisBackend(MemoryBackend):
+    """Redis server reached through the shared connection pools."""
+
+    name = "redis"
+
+    def __init__(self, settings: Optional[RedisPoolSettings] = None):
+        self.settings = settings or get_default_settings()
+
+    def client(self):
+        return get_redis_client(self.settings)
+
+    def async_client(self):
+        return get_async_redis_client(self.settings)
+
+
+class InProcessBackend(MemoryBackend):
+    """Keyspace held in this process; every client of one backend shares it."""
+
+    name = "memory"
+
+    def __init__(self, store: Optional[InProcessStore] = None):
+        self.store = store or InProcessStore()
+
+    def client(self):
+        return InProcessClient(self.store)
+
+    def async_client(self):
+        return AsyncInProcessClient(self.store)
+
+
+_shared_inprocess_backend: Optional[InProcessBackend] = None
+
+
+def create_backend(name: str = "redis", settings: Optional[RedisPoolSettings] = None) -> MemoryBackend:
+    """
+    Create a backend by name.
+
+    "memory" returns one process-wide InProcessBackend, so every component
+    that asks for it sees the same data, as they would with a shared Redis.
+    """
+    global _shared_inprocess_backend
+    if name == "redis":
+        return RedisBackend(settings)
+    if name == "memory":
+        if _shared_inprocess_backend is None:
+            _shared_inprocess_backend = InProcessBackend()
+        return _shared_inprocess_backend
+    raise ValueError(f"Unknown memory backend '{name}', expected one of {BACKEND_NAMES}")
@@ -0,0 +1,117 @@
+"""
+Content-addressed store for processed attachments.
+
+Extracted document content is stored once in Redis under the SHA-256 of the
+uploaded file (`doc:<sha256>`), shared by every user who uploads the same
+file. Chat history only keeps a short reference such as
+
+    [Tài liệu đính kèm: report.pdf | doc:<sha256>]
+
+and prompt assembly expands it back to the full content only for turns that
+need the document.
+"""
+
+import hashlib
+import inspect
+import logging
+import re
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple, Union
+
+import msgpack
+
+from data.cache.async_redis_cache import maybe_await
+from utils.executors import offload_io
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_REFERENCE_PATTERN = re.compile(r"\[Tài liệu đính kèm: ([^\]|]*) \| doc:([0-9a-f]{64})\]")
+
+
+def document_key(digest: str) -> str:
+    """Redis key of a stored document."""
+    return f"doc:{digest}"
+
+
+def file_digest(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's bytes, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_reference(name: str, digest: str) -> str:
+    """Short history placeholder for a stored document."""
+    name = name.replace("]", ")").replace("|", "/")
+    return f"[Tài liệu đính kèm: {name} | doc:{digest}]"
+
+
+def find_references(text: str) -> List[Tuple[str, str]]:
+    """Return (name, digest) for every document reference in a text."""
+    return DOCUMENT_REFERENCE_PATTERN.findall(text)
+
+
+class DocumentStore:
+    """Deduplicated storage of processed document content keyed by file hash."""
+
+    def __init__(self, redis_client, ttl_seconds: Optional[int] = 30 * 24 * 3600):
+        """
+        Args:
+            redis_client: Sync or asyncio Redis client
+            ttl_seconds: Expiry of stored documents, refreshed on every use (None keeps them forever)
+        """
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, digest: str) -> Optional[str]:
+        """Return the stored content for a digest and refresh its TTL."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.get(document_key(digest))
+        if self.ttl_seconds:
+            pipe.expire(document_key(digest), self.ttl_seconds)
+        raw = (await maybe_await(pipe.execute()))[0]
+        if raw is None:
+            return None
+        return msgpack.unpackb(raw, raw=False)["c"]
+
+    async def put(self, digest: str, name: str, content: str) -> bool:
+        """Store content unless it is already present; returns True if it was written."""
+        record = msgpack.packb({"n": name, "c": content, "t": time.time()}, use_bin_type=True)
+        written = await maybe_await(
+            self.redis_client.set(document_key(digest), record, nx=True, ex=self.ttl_seconds)
+        )
+        return bool(written)
+
+    async def get_or_process(
+        self,
+        file_path: str,
+        name: str,
+        process: Union[Callable[[str], str], Callable[[str], Awaitable[str]]],
+        is_error: Callable[[str], bool] = lambda content: False,
+    ) -> Tuple[str, str, bool]:
+        """
+        Return (digest, content, reused) for a file, processing it only if unseen.
+
+        Hashing runs in the I/O pool; `process` is awaited if it is a coroutine
+        function and run in the I/O pool otherwise. Content for which
+        `is_error` returns True is returned but not stored.
+        """
+        digest = await offload_io(file_digest, file_path)
+        content = await self.get(digest)
+        if content is not None:
+            self.hits += 1
+            logger.info(f"Reusing processed document {name} ({digest[:12]})")
+            return digest, content, True
+
+        self.misses += 1
+        if inspect.iscoroutinefunction(process):
+            content = await process(file_path)
+        else:
+            content = await offload_io(process, file_path)
+        if not is_error(content):
+            await self.put(digest, name, content)
+        return digest, content, False
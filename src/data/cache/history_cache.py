@@ -0,0 +1,103 @@
+"""
+In-process write-through cache of recent chat history.
+
+Each session's list is mirrored locally together with the value of a
+per-session version counter kept in Redis (incremented on every write). A
+read only needs the counter: when it matches the cached version the local copy
+is returned, otherwise the full list is fetched again. This keeps multiple
+worker processes consistent while the common read-after-write path avoids an
+LRANGE of the whole list.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+
+def version_key(key: str) -> str:
+    """Redis key of the version counter for a history list."""
+    return f"{key}:ver"
+
+
+def parse_version(value) -> int:
+    """Convert a raw GET/INCR result to a version number (missing counts as 0)."""
+    return int(value) if value is not None else 0
+
+
+class SessionHistoryCache:
+    """Bounded LRU over sessions of newest-first raw history entries."""
+
+    def __init__(self, max_sessions: int = 1024, max_idle_seconds: Optional[float] = None):
+        """
+        Args:
+            max_sessions: Sessions kept locally; the least recently used is dropped beyond it
+            max_idle_seconds: Drop a local copy not checked against the version
+                counter for this long (set it to the session idle TTL, so a copy
+                never outlives the counter it was validated against)
+        """
+        self.max_sessions = max_sessions
+        self.max_idle_seconds = max_idle_seconds
+        # key -> (version, entries, time the version was last checked)
+        self._sessions: "OrderedDict[str, Tuple[int, Deque, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: int) -> Optional[List]:
+        """Return the cached entries if they are at `version`, else None."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._sessions.get(key)
+            if cached is not None and self.max_idle_seconds and now - cached[2] > self.max_idle_seconds:
+                del self._sessions[key]
+                cached = None
+            if cached is None or cached[0] != version:
+                self.misses += 1
+                return None
+            self._sessions[key] = (version, cached[1], now)
+            self._sessions.move_to_end(key)
+            self.hits += 1
+            return list(cached[1])
+
+    def put(self, key: str, version: int, entries: List):
+        """Cache a freshly read list (newest first) at `version`."""
+        with self._lock:
+            self._sessions[key] = (version, deque(entries), time.monotonic())
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def append(self, key: str, new_version: int, entry, max_len: int):
+        """
+        Apply a write that moved the list to `new_version`.
+
+        The local copy is only updated when it was exactly one version behind;
+        otherwise another writer got in between and the entry is dropped so
+        the next read refreshes it.
+        """
+        with self._lock:
+            cached = self._sessions.get(key)
+            if cached is None:
+                return
+            version, entries, _ = cached
+            if version != new_version - 1:
+                del self._sessions[key]
+                return
+            entries.appendleft(entry)
+            while len(entries) > max_len:
+                entries.pop()
+            self._sessions[key] = (new_version, entries, time.monotonic())
+            self._sessions.move_to_end(key)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
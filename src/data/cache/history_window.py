@@ -0,0 +1,122 @@
+"""
+Token-budgeted conversation window.
+
+Chat history is fitted into a fixed token budget instead of a fixed number of
+messages: the newest messages are kept first, any single message larger than
+the per-message limit is elided in the middle, and older messages are dropped
+once the budget is spent. Token counts come from tiktoken and are cached per
+message text, since the same history lines are counted again on every turn.
+"""
+
+import logging
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+ELISION_MARKER = " […đã rút gọn {omitted} tokens…] "
+
+
+class HistoryWindow:
+    """Select the most recent history lines that fit a token budget."""
+
+    def __init__(
+        self,
+        max_tokens: int = 2000,
+        max_message_tokens: int = 400,
+        encoding_name: str = "cl100k_base",
+        cache_size: int = 4096,
+    ):
+        """
+        Args:
+            max_tokens: Total token budget for the history block
+            max_message_tokens: Messages longer than this are elided in the middle
+            encoding_name: tiktoken encoding used for counting
+            cache_size: Number of per-message token counts kept
+        """
+        self.max_tokens = max_tokens
+        self.max_message_tokens = max_message_tokens
+        self.encoding_name = encoding_name
+        self._encoding = self._load_encoding(encoding_name)
+        self._count_cached = lru_cache(maxsize=cache_size)(self._count_uncached)
+
+    @staticmethod
+    def _load_encoding(encoding_name: str):
+        try:
+            return tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            # The BPE file is downloaded on first use; without it fall back to ~4 chars/token
+            logger.warning(f"tiktoken encoding '{encoding_name}' unavailable ({e}), estimating tokens")
+            return None
+
+    def _count_uncached(self, text: str) -> int:
+        if self._encoding is None:
+            return (len(text) + 3) // 4
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def count(self, text: str) -> int:
+        """Number of tokens in a text (cached per distinct text)."""
+        return self._count_cached(text)
+
+    def truncate(self, text: str, limit: Optional[int] = None) -> str:
+        """Elide the middle of a text so it fits `limit` tokens, keeping head and tail."""
+        limit = self.max_message_tokens if limit is None else limit
+        total = self.count(text)
+        if total <= limit:
+            return text
+
+        head_len = max(1, limit * 2 // 3)
+        tail_len = max(0, limit - head_len)
+        omitted = total - head_len - tail_len
+        marker = ELISION_MARKER.format(omitted=omitted)
+
+        if self._encoding is None:
+            head, tail = text[: head_len * 4], text[len(text) - tail_len * 4 :] if tail_len else ""
+            return head + marker + tail
+
+        tokens = self._encoding.encode(text, disallowed_special=())
+        head = self._encoding.decode(tokens[:head_len])
+        tail = self._encoding.decode(tokens[total - tail_len :]) if tail_len else ""
+        return head + marker + tail
+
+    def select(self, lines: Sequence[str], budget: Optional[int] = None) -> Tuple[List[str], int]:
+        """
+        Fit chronological history lines into the budget.
+
+        Returns the kept lines in chronological order and the number of older
+        lines that were dropped.
+        """
+        budget = self.max_tokens if budget is None else budget
+        kept: List[str] = []
+        used = 0
+        for line in reversed(lines):
+            line = self.truncate(line)
+            tokens = self.count(line)
+            if used + tokens > budget:
+                break
+            kept.append(line)
+            used += tokens
+        kept.reverse()
+        return kept, len(lines) - len(kept)
+
+    def cache_info(self):
+        return self._count_cached.cache_info()
+
+
+_default_window: Optional[HistoryWindow] = None
+
+
+def get_default_window() -> HistoryWindow:
+    """Process-wide window shared by the memory backends."""
+    global _default_window
+    if _default_window is None:
+        _default_window = HistoryWindow()
+    return _default_window
+
+
+def configure_history_window(window: HistoryWindow):
+    """Replace the process-wide window (e.g. with budgets from ManagerAgentConfig)."""
+    global _default_window
+    _default_window = window
@@ -0,0 +1,520 @@
+"""
+In-process implementation of the Redis commands used by the memory layer.
+
+`InProcessStore` keeps strings, lists and sorted sets in plain dictionaries
+with Redis semantics for the subset of commands the memory components issue:
+bytes values, inclusive negative list indices, lazy TTL expiry, MULTI/EXEC
+pipelines that run atomically and WATCH with optimistic conflict detection.
+Lua scripts cannot run here: EVAL runs the Python implementation registered
+for the script's source with `register_script`.
+`InProcessClient` and `AsyncInProcessClient` expose it with the same call
+signatures as `redis.StrictRedis` and `redis.asyncio.Redis`, so memory code
+runs unchanged in tests, CI and local benchmarks without a Redis server.
+"""
+
+import fnmatch
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from redis.exceptions import ResponseError, WatchError
+
+# Commands supported by the clients and pipelines
+COMMANDS = frozenset({
+    "ping", "get", "set", "mget", "delete", "exists", "expire", "ttl",
+    "incr", "incrby", "decrby", "append", "strlen",
+    "lpush", "rpush", "lrange", "ltrim", "lindex", "llen",
+    "zadd", "zrem", "zcard", "zrange", "zrangebyscore", "zremrangebyscore", "zscore",
+    "keys", "flushdb", "eval",
+})
+
+# Lua source -> Python implementation taking (store, keys, args)
+_SCRIPTS: Dict[str, Callable[["InProcessStore", List[bytes], List[bytes]], Any]] = {}
+
+
+def register_script(source: str, handler: Callable[["InProcessStore", List[bytes], List[bytes]], Any]):
+    """Register the in-process implementation of a Lua script sent with EVAL."""
+    _SCRIPTS[source] = handler
+
+
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if isinstance(value, (int, float)):
+        return str(value).encode("ascii")
+    raise ResponseError(f"Invalid input of type: '{type(value).__name__}'")
+
+
+def _key(key: Any) -> bytes:
+    return _to_bytes(key)
+
+
+def _range(length: int, start: int, end: int) -> Tuple[int, int]:
+    """Convert inclusive Redis indices (negatives allowed) to a Python [lo, hi) range."""
+    if start < 0:
+        start = max(0, length + start)
+    if end < 0:
+        end = length + end
+    end = min(end, length - 1)
+    if start > end:
+        return 0, 0
+    return start, end + 1
+
+
+class InProcessStore:
+    """Thread-safe keyspace with lazy expiry and per-key write versions for WATCH."""
+
+    def __init__(self):
+        self._data: Dict[bytes, Any] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._versions: Dict[bytes, int] = {}
+        self.lock = threading.RLock()
+
+    # -- keyspace helpers (callers hold the lock) --------------------------
+
+    def _alive(self, key: bytes) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+            self._touch(key)
+        return key in self._data
+
+    def _touch(self, key: bytes):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _lookup(self, key: bytes, kind: type, create: bool = False):
+        if not self._alive(key):
+            if not create:
+                return None
+            self._data[key] = kind()
+        value = self._data[key]
+        if not isinstance(value, kind):
+            raise ResponseError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _drop_if_empty(self, key: bytes, value):
+        if not value:
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def version(self, key: Any) -> int:
+        with self.lock:
+            key = _key(key)
+            self._alive(key)
+            return self._versions.get(key, 0)
+
+    # -- generic -----------------------------------------------------------
+
+    def ping(self) -> bool:
+        return True
+
+    def delete(self, *keys) -> int:
+        with self.lock:
+            removed = 0
+            for key in map(_key, keys):
+                if self._alive(key):
+                    del self._data[key]
+                    self._expires.pop(key, None)
+                    self._touch(key)
+                    removed += 1
+            return removed
+
+    def exists(self, *keys) -> int:
+        with self.lock:
+            return sum(1 for key in map(_key, keys) if self._alive(key))
+
+    def expire(self, key, seconds) -> bool:
+        with self.lock:
+            key = _key(key)
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + float(seconds)
+            return True
+
+    def ttl(self, key) -> int:
+        with self.lock:
+            key = _key(key)
+            if not self._alive(key):
+                return -2
+            deadline = self._expires.get(key)
+            if deadline is None:
+                return -1
+            return max(0, round(deadline - time.monotonic()))
+
+    def keys(self, pattern="*") -> List[bytes]:
+        with self.lock:
+            pattern = _key(pattern).decode("utf-8")
+            return [
+                key for key in list(self._data)
+                if self._alive(key) and fnmatch.fnmatchcase(key.decode("utf-8"), pattern)
+            ]
+
+    def scan_iter(self, match="*", count=None, _type: Optional[str] = None) -> Iterable[bytes]:
+        kinds = {"string": bytes, "list": deque, "zset": dict}
+        with self.lock:
+            matched = [
+                key for key in self.keys(match)
+                if _type is None or isinstance(self._data.get(key), kinds[_type])
+            ]
+        return iter(matched)
+
+    def flushdb(self) -> bool:
+        with self.lock:
+            for key in list(self._data):
+                self._touch(key)
+            self._data.clear()
+            self._expires.clear()
+            return True
+
+    # -- strings -----------------------------------------------------------
+
+    def get(self, key) -> Optional[bytes]:
+        with self.lock:
+            return self._lookup(_key(key), bytes)
+
+    def mget(self, keys, *args) -> List[Optional[bytes]]:
+        if isinstance(keys, (str, bytes)):
+            keys = [keys]
+        with self.lock:
+            return [self.get(key) for key in [*keys, *args]]
+
+    def set(self, key, value, ex=None, px=None, nx=False, xx=False) -> Optional[bool]:
+        with self.lock:
+            key = _key(key)
+            exists = self._alive(key)
+            if (nx and exists) or (xx and not exists):
+                return None
+            self._data[key] = _to_bytes(value)
+            self._expires.pop(key, None)
+            if ex is not None:
+                self._expires[key] = time.monotonic() + float(ex)
+            elif px is not None:
+                self._expires[key] = time.monotonic() + float(px) / 1000
+            self._touch(key)
+            return True
+
+    def incrby(self, key, amount=1) -> int:
+        with self.lock:
+            key = _key(key)
+            current = self._lookup(key, bytes)
+            try:
+                value = int(current or b"0") + int(amount)
+            except ValueError:
+                raise ResponseError("value is not an integer or out of range")
+            self._data[key] = str(value).encode("ascii")
+            self._touch(key)
+            return value
+
+    def incr(self, key, amount=1) -> int:
+        return self.incrby(key, amount)
+
+    def decrby(self, key, amount=1) -> int:
+        return self.incrby(key, -int(amount))
+
+    def append(self, key, value) -> int:
+        with self.lock:
+            key = _key(key)
+            current = self._lookup(key, bytes) or b""
+            self._data[key] = current + _to_bytes(value)
+            self._touch(key)
+            return len(self._data[key])
+
+    def strlen(self, key) -> int:
+        with self.lock:
+            return len(self._lookup(_key(key), bytes) or b"")
+
+    # -- lists -------------------------------------------------------------
+
+    def lpush(self, key, *values) -> int:
+        with self.lock:
+            key = _key(key)
+            items = self._lookup(key, deque, create=True)
+            items.extendleft(_to_bytes(v) for v in values)
+            self._touch(key)
+            return len(items)
+
+    def rpush(self, key, *values) -> int:
+        with self.lock:
+            key = _key(key)
+            items = self._lookup(key, deque, create=True)
+            items.extend(_to_bytes(v) for v in values)
+            self._touch(key)
+            return len(items)
+
+    def lrange(self, key, start, end) -> List[bytes]:
+        with self.lock:
+            items = self._lookup(_key(key), deque)
+            if not items:
+                return []
+            lo, hi = _range(len(items), int(start), int(end))
+            return list(islice(items, lo, hi))
+
+    def ltrim(self, key, start, end) -> bool:
+        with self.lock:
+            key = _key(key)
+            items = self._lookup(key, deque)
+            if items is None:
+                return True
+            lo, hi = _range(len(items), int(start), int(end))
+            # The common LPUSH + LTRIM 0 n-1 case only pops from the tail
+            while len(items) > hi:
+                items.pop()
+            for _ in range(lo):
+                items.popleft()
+            if hi <= lo:
+                items.clear()
+            self._drop_if_empty(key, items)
+            self._touch(key)
+            return True
+
+    def lindex(self, key, index) -> Optional[bytes]:
+        with self.lock:
+            items = self._lookup(_key(key), deque)
+            if not items:
+                return None
+            index = int(index)
+            if -len(items) <= index < len(items):
+                return items[index]
+            return None
+
+    def llen(self, key) -> int:
+        with self.lock:
+            items = self._lookup(_key(key), deque)
+            return len(items) if items else 0
+
+    # -- sorted sets -------------------------------------------------------
+
+    def zadd(self, key, mapping: Dict[Any, float]) -> int:
+        with self.lock:
+            key = _key(key)
+            members = self._lookup(key, dict, create=True)
+            added = 0
+            for member, score in mapping.items():
+                member = _to_bytes(member)
+                if member not in members:
+                    added += 1
+                members[member] = float(score)
+            self._touch(key)
+            return added
+
+    def zrem(self, key, *members) -> int:
+        with self.lock:
+            key = _key(key)
+            current = self._lookup(key, dict)
+            if not current:
+                return 0
+            removed = sum(1 for m in members if current.pop(_to_bytes(m), None) is not None)
+            if removed:
+                self._drop_if_empty(key, current)
+                self._touch(key)
+            return removed
+
+    def zcard(self, key) -> int:
+        with self.lock:
+            members = self._lookup(_key(key), dict)
+            return len(members) if members else 0
+
+    def zscore(self, key, member) -> Optional[float]:
+        with self.lock:
+            members = self._lookup(_key(key), dict)
+            return members.get(_to_bytes(member)) if members else None
+
+    def _sorted(self, members: Dict[bytes, float]) -> List[Tuple[bytes, float]]:
+        return sorted(members.items(), key=lambda item: (item[1], item[0]))
+
+    def zrange(self, key, start, end, withscores=False) -> List:
+        with self.lock:
+            members = self._lookup(_key(key), dict)
+            if not members:
+                return []
+            ordered = self._sorted(members)
+            lo, hi = _range(len(ordered), int(start), int(end))
+            selected = ordered[lo:hi]
+            return selected if withscores else [member for member, _ in selected]
+
+    def zrangebyscore(self, key, min_score, max_score, withscores=False) -> List:
+        with self.lock:
+            members = self._lookup(_key(key), dict)
+            if not members:
+                return []
+            low, high = float(min_score), float(max_score)
+            selected = [(m, score) for m, score in self._sorted(members) if low <= score <= high]
+            return selected if withscores else [member for member, _ in selected]
+
+    def zremrangebyscore(self, key, min_score, max_score) -> int:
+        with self.lock:
+            key = _key(key)
+            members = self._lookup(key, dict)
+            if not members:
+                return 0
+            low, high = float(min_score), float(max_score)
+            doomed = [m for m, score in members.items() if low <= score <= high]
+            for member in doomed:
+                del members[member]
+            if doomed:
+                self._drop_if_empty(key, members)
+                self._touch(key)
+            return len(doomed)
+
+    # -- scripting ---------------------------------------------------------
+
+    def eval(self, script, numkeys, *keys_and_args) -> Any:
+        handler = _SCRIPTS.get(script)
+        if handler is None:
+            raise ResponseError("NOSCRIPT No in-process implementation registered for this script")
+        numkeys = int(numkeys)
+        keys = [_key(key) for key in keys_and_args[:numkeys]]
+        args = [_to_bytes(arg) for arg in keys_and_args[numkeys:]]
+        with self.lock:
+            return handler(self, keys, args)
+
+
+class InProcessPipeline:
+    """Buffered commands executed atomically under the store lock (MULTI/EXEC)."""
+
+    def __init__(self, store: InProcessStore, transaction: bool = True):
+        self.store = store
+        self.transaction = transaction
+        self._commands: List[Tuple[str, tuple, dict]] = []
+        self._watched: Optional[Dict[bytes, int]] = None
+        self._explicit_multi = False
+
+    def __getattr__(self, name):
+        if name not in COMMANDS:
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            # After WATCH and before MULTI commands run immediately, like redis-py
+            if self._watched is not None and not self._explicit_multi:
+                return getattr(self.store, name)(*args, **kwargs)
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return command
+
+    def __len__(self):
+        return len(self._commands)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._clear()
+
+    def watch(self, *keys):
+        with self.store.lock:
+            self._watched = {_key(k): self.store.version(k) for k in keys}
+        return True
+
+    def unwatch(self):
+        self._watched = None
+        return True
+
+    def multi(self):
+        self._explicit_multi = True
+
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        try:
+            with self.store.lock:
+                if self._watched is not None:
+                    for key, version in self._watched.items():
+                        if self.store.version(key) != version:
+                            raise WatchError("Watched variable changed.")
+                return [getattr(self.store, name)(*args, **kwargs) for name, args, kwargs in self._commands]
+        finally:
+            self._clear()
+
+    def reset(self):
+        self._clear()
+
+    def _clear(self):
+        self._commands = []
+        self._watched = None
+        self._explicit_multi = False
+
+
+class InProcessClient:
+    """Synchronous client over an InProcessStore with the redis.StrictRedis call signatures."""
+
+    def __init__(self, store: InProcessStore):
+        self.store = store
+
+    def __getattr__(self, name):
+        if name in COMMANDS or name == "scan_iter":
+            return getattr(self.store, name)
+        raise AttributeError(name)
+
+    def pipeline(self, transaction: bool = True) -> InProcessPipeline:
+        return InProcessPipeline(self.store, transaction)
+
+    def close(self):
+        pass
+
+
+class AsyncInProcessPipeline(InProcessPipeline):
+    """redis.asyncio-style pipeline: commands are buffered, execution is awaited."""
+
+    def __getattr__(self, name):
+        command = super().__getattr__(name)
+
+        def queue_or_run(*args, **kwargs):
+            result = command(*args, **kwargs)
+            if result is self:
+                return self
+            return _ready(result)
+
+        return queue_or_run
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._clear()
+
+    async def watch(self, *keys):
+        return super().watch(*keys)
+
+    async def unwatch(self):
+        return super().unwatch()
+
+    async def execute(self, raise_on_error: bool = True) -> List[Any]:
+        return super().execute(raise_on_error)
+
+    async def reset(self):
+        self._clear()
+
+
+async def _ready(value):
+    return value
+
+
+class AsyncInProcessClient:
+    """asyncio client over an InProcessStore with the redis.asyncio.Redis call signatures."""
+
+    def __init__(self, store: InProcessStore):
+        self.store = store
+
+    def __getattr__(self, name):
+        if name not in COMMANDS:
+            raise AttributeError(name)
+        method = getattr(self.store, name)
+
+        async def command(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return command
+
+    def pipeline(self, transaction: bool = True) -> AsyncInProcessPipeline:
+        return AsyncInProcessPipeline(self.store, transaction)
+
+    async def scan_iter(self, match="*", count=None, _type: Optional[str] = None):
+        for key in self.store.scan_iter(match=match, count=count, _type=_type):
+            yield key
+
+    async def aclose(self):
+        pass
@@ -3,12 +3,55 @@ Memory Handler - Handle messages with short-term memory
 Separate complex logic to make main code readable
 """
 
+from typing import Optional
+
 from data.cache.redis_cache import ShortTermMemory
+from data.cache.async_redis_cache import AsyncShortTermMemory, maybe_await
+from data.cache.backends import MemoryBackend
+from data.cache.history_cache import SessionHistoryCache
+from data.cache.session_policy import SessionPolicy
+from data.cache.session_sweeper import SessionSweeper
 
 
 class MessageMemoryHandler:
-    def __init__(self, max_messages: int = 15):
-        self.session_manager = ShortTermMemory(max_messages=max_messages)
+    def __init__(
+        self,
+        max_messages: int = 15,
+        use_async: bool = False,
+        history_cache_sessions: int = 1024,
+        session_policy: Optional[SessionPolicy] = None,
+        backend: Optional[MemoryBackend] = None,
+    ):
+        """
+        Args:
+            max_messages: Maximum number of messages kept per session
+            use_async: Use the redis.asyncio backend; only the `a*` coroutine methods
+                are available in that mode
+            history_cache_sessions: Sessions kept in the local write-through history
+                cache (0 disables it)
+            session_policy: Idle TTL, byte quota and session cap (default: from the
+                environment, as for ManagerAgent)
+            backend: Memory backend (default: Redis); pass an InProcessBackend to run
+                without a Redis server
+        """
+        session_policy = session_policy or SessionPolicy.from_env()
+        history_cache = (
+            SessionHistoryCache(
+                max_sessions=history_cache_sessions,
+                max_idle_seconds=session_policy.idle_ttl_seconds,
+            )
+            if history_cache_sessions > 0
+            else None
+        )
+        memory_class = AsyncShortTermMemory if use_async else ShortTermMemory
+        self.session_manager = memory_class(
+            max_messages=max_messages,
+            history_cache=history_cache,
+            session_policy=session_policy,
+            backend=backend,
+        )
+        # Started on the first message so it runs on the serving event loop
+        self.session_sweeper = SessionSweeper(self.session_manager.redis_client, session_policy)
 
     def get_history_message(self, message_content: str) -> str:
         """
@@ -20,6 +63,7 @@ class MessageMemoryHandler:
         Returns:
             str: Message with history context added
         """
+        self.session_sweeper.start()
         session_key = self.session_manager.get_session_key()
         self.session_manager.update_message_count()
 
@@ -39,3 +83,26 @@ class MessageMemoryHandler:
         """Store error to memory"""
         session_key = self.session_manager.get_session_key()
         self.session_manager.store_error_message(session_key, error)
+
+    async def aget_history_message(self, message_content: str) -> str:
+        """Async version of get_history_message; works with either backend."""
+        self.session_sweeper.start()
+        session_key = self.session_manager.get_session_key()
+        self.session_manager.update_message_count()
+
+        context = await maybe_await(self.session_manager.get_history_context(session_key))
+        full_message = f"{context}CURRENT QUESTION: {message_content}"
+
+        await maybe_await(self.session_manager.store_user_message(session_key, message_content))
+
+        return full_message
+
+    async def astore_bot_response(self, response: str):
+        """Async version of store_bot_response"""
+        session_key = self.session_manager.get_session_key()
+        await maybe_await(self.session_manager.store_bot_message(session_key, response))
+
+    async def astore_error(self, error: Exception):
+        """Async version of store_error"""
+        session_key = self.session_manager.get_session_key()
+        await maybe_await(self.session_manager.store_error_message(session_key, error))
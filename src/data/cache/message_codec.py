@@ -0,0 +1,196 @@
+"""
+Compact binary encoding for chat history entries.
+
+Messages are stored as msgpack maps with one-letter keys and epoch timestamps
+instead of JSON documents with ISO dates, and decoded into a slotted
+HistoryEntry rather than a pydantic model. Entries written by the old JSON
+format are still decoded, and `migrate_history` rewrites them in place.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Iterable, List, Union
+
+import msgpack
+
+# message_type <-> compact integer code
+_TYPE_CODES = {"user": 0, "assistant": 1, "system": 2}
+_CODE_TYPES = {code: name for name, code in _TYPE_CODES.items()}
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryEntry:
+    """A single chat history message."""
+
+    __slots__ = ("user_id", "message", "ts", "message_type")
+
+    def __init__(
+        self,
+        user_id: str,
+        message: str,
+        timestamp: Union[datetime, float, None] = None,
+        message_type: str = "user",  # user, assistant, system
+    ):
+        self.user_id = user_id
+        self.message = message
+        if timestamp is None:
+            self.ts = time.time()
+        elif isinstance(timestamp, datetime):
+            self.ts = timestamp.timestamp()
+        else:
+            self.ts = float(timestamp)
+        self.message_type = message_type
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.ts)
+
+    def __repr__(self):
+        return (
+            f"HistoryEntry(user_id={self.user_id!r}, message_type={self.message_type!r}, "
+            f"ts={self.ts}, message={self.message[:40]!r})"
+        )
+
+
+def encode_message(entry: HistoryEntry) -> bytes:
+    """Encode a history entry as a compact msgpack map."""
+    return msgpack.packb(
+        {
+            "u": entry.user_id,
+            "m": entry.message,
+            "t": entry.ts,
+            "k": _TYPE_CODES.get(entry.message_type, entry.message_type),
+        },
+        use_bin_type=True,
+    )
+
+
+def is_legacy_entry(raw: Union[bytes, str]) -> bool:
+    """JSON entries start with '{'; msgpack maps never do."""
+    return raw[:1] in (b"{", "{")
+
+
+def decode_message(raw: Union[bytes, str]) -> HistoryEntry:
+    """Decode an entry in either the msgpack or the legacy JSON format."""
+    if is_legacy_entry(raw):
+        data = json.loads(raw)
+        return HistoryEntry(
+            data["user_id"],
+            data["message"],
+            datetime.fromisoformat(data["timestamp"]),
+            data["message_type"],
+        )
+
+    data = msgpack.unpackb(raw, raw=False)
+    kind = data["k"]
+    return HistoryEntry(data["u"], data["m"], data["t"], _CODE_TYPES.get(kind, kind))
+
+
+def decode_history(raw_entries: Iterable[Union[bytes, str]]) -> List[HistoryEntry]:
+    """Decode newest-first raw entries (as stored by LPUSH) into chronological order."""
+    history = []
+    for raw in reversed(list(raw_entries)):
+        try:
+            history.append(decode_message(raw))
+        except (ValueError, KeyError, TypeError, msgpack.UnpackException) as e:
+            logger.warning(f"Error parsing message: {e}")
+    return history
+
+
+def migrate_history(redis_client, key: str) -> int:
+    """
+    Rewrite legacy JSON entries of one history list as msgpack.
+
+    Returns the number of migrated entries. The list is replaced atomically
+    and only if it was not modified while being converted.
+    """
+    with redis_client.pipeline(transaction=True) as pipe:
+        pipe.watch(key)
+        raw_entries = pipe.lrange(key, 0, -1)
+        legacy = sum(1 for raw in raw_entries if is_legacy_entry(raw))
+        if not legacy:
+            pipe.unwatch()
+            return 0
+
+        converted = []
+        for raw in raw_entries:
+            try:
+                converted.append(encode_message(decode_message(raw)))
+            except (ValueError, KeyError, TypeError, msgpack.UnpackException) as e:
+                logger.warning(f"Keeping unparsable entry of {key} as is: {e}")
+                converted.append(raw)
+
+        pipe.multi()
+        pipe.delete(key)
+        pipe.rpush(key, *converted)
+        pipe.execute()
+    return legacy
+
+
+def migrate_all(redis_client, pattern: str = "chat_history:*") -> int:
+    """Migrate every history list matching the pattern; returns migrated entries."""
+    total = 0
+    for key in redis_client.scan_iter(match=pattern, _type="list"):
+        total += migrate_history(redis_client, key)
+    return total
+
+
+def benchmark_decode(history_length: int = 20, turns: int = 2000):
+    """Compare per-turn history decode cost of the JSON + pydantic and msgpack formats."""
+    from pydantic import BaseModel
+
+    class ChatMessage(BaseModel):
+        user_id: str
+        message: str
+        timestamp: datetime
+        message_type: str = "user"
+
+    now = datetime.now()
+    entries = [
+        HistoryEntry("user_bench", f"Câu hỏi số {i} về học phí và học bổng " * 4, now,
+                     "user" if i % 2 == 0 else "assistant")
+        for i in range(history_length)
+    ]
+    legacy_raw = [
+        json.dumps({
+            "user_id": e.user_id,
+            "message": e.message,
+            "timestamp": e.timestamp.isoformat(),
+            "message_type": e.message_type,
+        }).encode("utf-8")
+        for e in entries
+    ]
+    packed_raw = [encode_message(e) for e in entries]
+
+    def decode_legacy(raws):
+        out = []
+        for raw in reversed(raws):
+            data = json.loads(raw.decode("utf-8"))
+            out.append(ChatMessage(
+                user_id=data["user_id"],
+                message=data["message"],
+                timestamp=datetime.fromisoformat(data["timestamp"]),
+                message_type=data["message_type"],
+            ))
+        return out
+
+    for name, decode, raws in (
+        ("json+pydantic", decode_legacy, legacy_raw),
+        ("msgpack+slots", decode_history, packed_raw),
+    ):
+        start = time.perf_counter()
+        for _ in range(turns):
+            decode(raws)
+        elapsed = time.perf_counter() - start
+        size = sum(len(r) for r in raws)
+        print(
+            f"{name:>14}: {elapsed / turns * 1e6:8.1f} us/turn "
+            f"({history_length} messages, {size} bytes stored)"
+        )
+
+
+if __name__ == "__main__":
+    benchmark_decode()
@@ -1,38 +1,227 @@
+import logging
+import time
+from typing import List, Optional, Union
+
 import redis
 import uuid
 from datetime import datetime
 import chainlit as cl
 
+from data.cache.history_window import HistoryWindow, get_default_window
+from data.cache.history_cache import SessionHistoryCache, parse_version, version_key
+from data.cache.backends import InProcessBackend, MemoryBackend, RedisBackend
+from data.cache.redis_pool import get_default_settings
+from data.cache.session_policy import (
+    ACCESS_INDEX_KEY,
+    SessionPolicy,
+    bytes_key,
+    queue_push,
+    quota_keep_count,
+)
 
-class ShortTermMemory:
-    """Manages user sessions and conversation memory with Redis backend"""
+logger = logging.getLogger(__name__)
+
+
+def format_history_entry(role, content):
+    """Format a history entry as '[HH:MM] Role: content'"""
+    timestamp = datetime.now().strftime("%H:%M")
+    return f"[{timestamp}] {role}: {content}"
+
+
+def format_history_context(history, window: Optional[HistoryWindow] = None):
+    """Build conversation history context from newest-first history entries"""
+    if len(history) == 0:
+        return ""
+
+    # Redis LPUSH puts newest first, so reverse to get chronological order,
+    # then keep the most recent messages that fit the token budget
+    window = window or get_default_window()
+    recent, omitted = window.select(list(reversed(history)))
+    context = "\n=== CONVERSATION HISTORY ===\n"
+    if omitted:
+        context += f"[Showing last {len(recent)} of {len(history)} messages]\n"
 
-    def __init__(self, host="localhost", port=6379, db=0, max_messages=15):
-        # Initialize Redis client
-        self.redis_client = redis.StrictRedis(host=host, port=port, db=db)
+    return context + "\n".join(recent) + "\n=== END HISTORY ===\n\n"
+
+
+class HistoryMemoryBase:
+    """
+    Commands and bookkeeping shared by ShortTermMemory and AsyncShortTermMemory.
+
+    Each operation is split into a `_queue_*` method that adds its commands to
+    a pipeline and a method that applies the pipeline's results (local history
+    cache, quota, logging); the two memories only execute or await the
+    pipelines in between.
+    """
+
+    def __init__(
+        self,
+        host=None,
+        port=None,
+        db=None,
+        max_messages=15,
+        pool_settings=None,
+        history_cache: Optional[SessionHistoryCache] = None,
+        session_policy: Optional[SessionPolicy] = None,
+        backend: Optional[MemoryBackend] = None,
+    ):
+        """
+        Args:
+            host, port, db: Redis endpoint; None keeps the value from the pool settings
+            max_messages: Maximum number of messages to store per key
+            pool_settings: RedisPoolSettings for the shared pool (default: process-wide settings)
+            history_cache: Optional write-through cache of recent history per session
+            session_policy: Optional idle TTL, byte quota and last-access tracking
+            backend: Memory backend (default: Redis through the shared pool)
+        """
+        if backend is None:
+            settings = (pool_settings or get_default_settings()).with_endpoint(host, port, db)
+            backend = RedisBackend(settings)
+        self.backend = backend
+        self.redis_client = self._create_client(backend)
         self.max_messages = max_messages  # Maximum number of messages to store
+        self.history_cache = history_cache
+        self.session_policy = session_policy
+        self.quota_trims = 0
+
+    def _create_client(self, backend: MemoryBackend):
+        raise NotImplementedError
+
+    def _queue_store(self, pipe, key: str, raw: bytes):
+        """Push, trim and bump the version counter (one MULTI/EXEC round trip)."""
+        if self.session_policy is None:
+            pipe.lpush(key, raw)
+            pipe.ltrim(key, 0, self.max_messages - 1)
+        else:
+            # Also counts the bytes pushed minus the bytes trimmed
+            queue_push(pipe, key, raw, self.max_messages)
+        pipe.incr(version_key(key))
+        if self.session_policy is not None:
+            self.session_policy.touch(pipe, key)
+
+    def _stored(self, key: str, raw: bytes, results) -> bool:
+        """Apply a store's results; returns whether the session is over its byte quota."""
+        if self.session_policy is None:
+            version, total_bytes = results[2], None
+        else:
+            total_bytes, version = results[0], results[1]
+
+        if self.history_cache is not None:
+            self.history_cache.append(key, version, raw, self.max_messages)
+        logger.debug(f"Stored message for key: {key}")
+
+        max_bytes = self.session_policy.max_session_bytes if self.session_policy is not None else None
+        return bool(max_bytes) and total_bytes > max_bytes
+
+    def _queue_quota_trim(self, pipe, key: str, entries) -> int:
+        """Drop the oldest of a session's entries until it fits its byte quota; returns the entries kept."""
+        keep = quota_keep_count(entries, self.session_policy.max_session_bytes)
+        pipe.ltrim(key, 0, keep - 1)
+        # Recomputed from the list, which also repairs counters of older sessions
+        pipe.set(bytes_key(key), sum(len(entry) for entry in entries[:keep]))
+        pipe.incr(version_key(key))
+        self.session_policy.touch(pipe, key)
+        return keep
+
+    def _quota_trimmed(self, key: str, trimmed: int):
+        if self.history_cache is not None:
+            self.history_cache.invalidate(key)
+        self.quota_trims += 1
+        logger.info(f"Trimmed {trimmed} messages over byte quota for key: {key}")
+
+    def _queue_read(self, pipe, key: str):
+        """Read a whole list (first result), refreshing the session's TTL."""
+        pipe.lrange(key, 0, -1)
+        if self.session_policy is not None:
+            self.session_policy.touch(pipe, key)
+
+    def _queue_version_read(self, pipe, key: str):
+        """Read only the version counter (first result), refreshing the session's TTL."""
+        pipe.get(version_key(key))
+        if self.session_policy is not None:
+            self.session_policy.touch(pipe, key)
+
+    def _cached(self, key: str, version) -> Optional[List[bytes]]:
+        return self.history_cache.get(key, parse_version(version))
+
+    def _queue_versioned_read(self, pipe, key: str):
+        """Read a list together with its version (MULTI/EXEC, so they match)."""
+        pipe.lrange(key, 0, -1)
+        pipe.get(version_key(key))
+
+    def _versioned_read(self, key: str, results) -> List[bytes]:
+        messages, version = results
+        self.history_cache.put(key, parse_version(version), messages)
+        return messages
+
+    def _queue_delete(self, pipe, key: str):
+        # The version counter keeps increasing so stale local copies never match again
+        pipe.delete(key, bytes_key(key))
+        pipe.incr(version_key(key))
+        if self.session_policy is not None:
+            self.session_policy.expire_version(pipe, key)
+        pipe.zrem(ACCESS_INDEX_KEY, key)
+
+    def _deleted(self, key: str):
+        if self.history_cache is not None:
+            self.history_cache.invalidate(key)
+        logger.info(f"Deleted all messages for key: {key}")
+
+
+class ShortTermMemory(HistoryMemoryBase):
+    """Manages user sessions and conversation memory with Redis backend"""
+
+    def _create_client(self, backend: MemoryBackend):
+        # Clients are cheap; Redis connections come from the process-wide shared pool
+        return backend.client()
 
-    def store(self, key: str, message: str):
+    def store(self, key: str, message: Union[str, bytes]):
         """Store a message in Redis, keeping only the latest 'max_messages' messages."""
-        self.redis_client.lpush(key, message)
+        raw = message.encode("utf-8") if isinstance(message, str) else message
+        pipe = self.redis_client.pipeline(transaction=True)
+        self._queue_store(pipe, key, raw)
+        if self._stored(key, raw, pipe.execute()):
+            self._enforce_quota(key)
 
-        # Trim the list to ensure it doesn't exceed the max size
-        self.redis_client.ltrim(key, 0, self.max_messages - 1)
-        print(
-            f"Stored message: {message} for key: {key}. Total messages: {self.redis_client.llen(key)}"
-        )
+    def _enforce_quota(self, key: str):
+        """Drop the oldest messages until the session fits its byte quota."""
+        entries = self.redis_client.lrange(key, 0, -1)
+        pipe = self.redis_client.pipeline(transaction=True)
+        keep = self._queue_quota_trim(pipe, key, entries)
+        pipe.execute()
+        self._quota_trimmed(key, len(entries) - keep)
 
     def retrieve(self, key: str):
         """Retrieve all messages from Redis for a session (key)."""
-        messages = self.redis_client.lrange(key, 0, -1)
+        messages = self.retrieve_raw(key)
         return [
             msg.decode("utf-8") for msg in messages
         ]  # Decode each message from bytes
 
+    def retrieve_raw(self, key: str):
+        """Retrieve all messages for a session as raw bytes, newest first."""
+        if self.history_cache is None:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_read(pipe, key)
+            return pipe.execute()[0]
+
+        # Common case: only the version counter is read and the local copy is current
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_version_read(pipe, key)
+        cached = self._cached(key, pipe.execute()[0])
+        if cached is not None:
+            return cached
+
+        pipe = self.redis_client.pipeline(transaction=True)
+        self._queue_versioned_read(pipe, key)
+        return self._versioned_read(key, pipe.execute())
+
     def delete(self, key: str):
         """Delete all messages for a given key."""
-        self.redis_client.delete(key)
-        print(f"Deleted all messages for key: {key}")
+        pipe = self.redis_client.pipeline(transaction=True)
+        self._queue_delete(pipe, key)
+        pipe.execute()
+        self._deleted(key)
 
     def get_session_key(self):
         """Get or create session key"""
@@ -46,23 +235,11 @@ class ShortTermMemory:
 
     def get_history_context(self, session_key):
         """Build conversation history context"""
-        history = self.retrieve(session_key)
-        if len(history) == 0:
-            return ""
-
-        # Redis LPUSH puts newest first, so reverse to get chronological order
-        # Take up to 8 most recent messages in chronological order
-        recent = list(reversed(history))[:8]
-        context = "\n=== CONVERSATION HISTORY ===\n"
-        if len(history) > 8:
-            context += "[Showing last 8 messages]\n"
-
-        return context + "\n".join(recent) + "\n=== END HISTORY ===\n\n"
+        return format_history_context(self.retrieve(session_key))
 
     def store_message(self, session_key, role, content):
         """Store a message with timestamp"""
-        timestamp = datetime.now().strftime("%H:%M")
-        self.store(session_key, f"[{timestamp}] {role}: {content}")
+        self.store(session_key, format_history_entry(role, content))
 
     def store_user_message(self, session_key, content):
         """Store user message"""
@@ -83,10 +260,10 @@ class ShortTermMemory:
         return count
 
 
-def test_session_manager():
+def test_session_manager(backend: Optional[MemoryBackend] = None):
     """Test function for SessionManager"""
     # Create an instance of the SessionManager class with max 3 messages
-    manager = ShortTermMemory(max_messages=3)
+    manager = ShortTermMemory(max_messages=3, backend=backend)
 
     session_key = "user_1234_session"  # The unique key for this user session
 
@@ -115,6 +292,92 @@ def test_session_manager():
     print(manager.retrieve(session_key))
 
 
+class _CountingConnection(redis.Connection):
+    """Redis connection that counts network round trips (one per packed send)."""
+
+    round_trips = 0
+
+    def send_packed_command(self, command, check_health=True):
+        _CountingConnection.round_trips += 1
+        super().send_packed_command(command, check_health)
+
+
+def benchmark_store(turns: int = 200, host="localhost", port=6379, db=0):
+    """
+    Benchmark round trips and latency per chat turn.
+
+    A turn stores a user and a bot message, as ManagerAgent.process_message does.
+    The legacy path (lpush, ltrim, llen per message) is compared with the
+    pipelined ShortTermMemory.store.
+    """
+    pool = redis.ConnectionPool(
+        host=host, port=port, db=db, connection_class=_CountingConnection
+    )
+    manager = ShortTermMemory(host=host, port=port, db=db, max_messages=20)
+    manager.redis_client = redis.StrictRedis(connection_pool=pool)
+    client = manager.redis_client
+    key = "benchmark:store"
+
+    def legacy_store(message):
+        client.lpush(key, message)
+        client.ltrim(key, 0, manager.max_messages - 1)
+        client.llen(key)
+
+    for name, store in (("legacy", legacy_store), ("pipelined", lambda m: manager.store(key, m))):
+        client.delete(key)
+        _CountingConnection.round_trips = 0
+        start = time.perf_counter()
+        for turn in range(turns):
+            store(f"[user] question {turn}")
+            store(f"[bot] answer {turn}")
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:>10}: {_CountingConnection.round_trips / turns:.1f} round trips/turn, "
+            f"{elapsed / turns * 1000:.3f} ms/turn"
+        )
+
+    client.delete(key)
+
+
+def benchmark_backend(backend: MemoryBackend, turns: int = 2000, sessions: int = 50):
+    """
+    Benchmark the full memory path of a chat turn on a backend.
+
+    A turn stores a user message, reads the history back and stores the bot
+    reply, with the default session policy (TTL refresh, byte quota, access
+    index) enabled. Runs against InProcessBackend without a Redis server.
+    """
+    manager = ShortTermMemory(
+        max_messages=20, backend=backend, session_policy=SessionPolicy()
+    )
+    keys = [f"benchmark:session:{i}" for i in range(sessions)]
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        key = keys[turn % sessions]
+        manager.store(key, f"[user] question {turn}")
+        manager.retrieve_raw(key)
+        manager.store(key, f"[bot] answer {turn}")
+    elapsed = time.perf_counter() - start
+    print(
+        f"{backend.name:>10}: {elapsed / turns * 1e6:.1f} us/turn "
+        f"({turns} turns over {sessions} sessions)"
+    )
+
+    for key in keys:
+        manager.delete(key)
+
+
 # Call the test function when run directly
 if __name__ == "__main__":
-    test_session_manager()
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark":
+        if len(sys.argv) > 2 and sys.argv[2] == "memory":
+            benchmark_backend(InProcessBackend())
+        else:
+            benchmark_store()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--memory":
+        test_session_manager(InProcessBackend())
+    else:
+        test_session_manager()
@@ -0,0 +1,147 @@
+"""
+Process-wide Redis connection pools.
+
+Every memory component (ShortTermMemory, AsyncShortTermMemory and the handlers
+built on them) draws its connections from here, so a process holds one bounded
+pool per Redis endpoint instead of one unbounded client per object.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+
+@dataclass(frozen=True)
+class RedisPoolSettings:
+    """Connection settings for a shared Redis pool."""
+
+    host: str = "localhost"
+    port: int = 6379
+    db: int = 0
+    password: Optional[str] = None
+    max_connections: int = 50
+    socket_timeout: float = 5.0
+    socket_connect_timeout: float = 5.0
+    health_check_interval: int = 30
+    ssl: bool = False
+
+    @classmethod
+    def from_env(cls) -> "RedisPoolSettings":
+        """Load settings from the same environment variables as ManagerAgentConfig."""
+        return cls(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            db=int(os.getenv("REDIS_DB", "0")),
+            password=os.getenv("REDIS_PASSWORD"),
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+            socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "5")),
+            socket_connect_timeout=float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "5")),
+            health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")),
+            ssl=os.getenv("REDIS_SSL", "false").lower() == "true",
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "RedisPoolSettings":
+        """Build settings from a ManagerAgentConfig (or any object with its redis_* fields)."""
+        return cls(
+            host=config.redis_host,
+            port=config.redis_port,
+            db=config.redis_db,
+            password=config.redis_password,
+            max_connections=config.redis_max_connections,
+            socket_timeout=config.redis_socket_timeout,
+            socket_connect_timeout=config.redis_socket_connect_timeout,
+            health_check_interval=config.redis_health_check_interval,
+            ssl=config.redis_ssl,
+        )
+
+    def with_endpoint(
+        self, host: Optional[str] = None, port: Optional[int] = None, db: Optional[int] = None
+    ) -> "RedisPoolSettings":
+        """Return a copy pointing at a different host/port/db, keeping the limits."""
+        return replace(
+            self,
+            host=self.host if host is None else host,
+            port=self.port if port is None else port,
+            db=self.db if db is None else db,
+        )
+
+
+_lock = threading.Lock()
+_default_settings: Optional[RedisPoolSettings] = None
+_sync_pools: Dict[RedisPoolSettings, redis.ConnectionPool] = {}
+_async_pools: Dict[RedisPoolSettings, aioredis.ConnectionPool] = {}
+
+
+def configure_redis_pool(settings: RedisPoolSettings):
+    """Set the default settings used by memory components created afterwards."""
+    global _default_settings
+    with _lock:
+        _default_settings = settings
+
+
+def get_default_settings() -> RedisPoolSettings:
+    """Return the configured default settings, loading them from the environment once."""
+    global _default_settings
+    with _lock:
+        if _default_settings is None:
+            _default_settings = RedisPoolSettings.from_env()
+        return _default_settings
+
+
+def _pool_kwargs(settings: RedisPoolSettings) -> dict:
+    return {
+        "host": settings.host,
+        "port": settings.port,
+        "db": settings.db,
+        "password": settings.password,
+        "max_connections": settings.max_connections,
+        "timeout": settings.socket_timeout,  # wait for a free connection when exhausted
+        "socket_timeout": settings.socket_timeout,
+        "socket_connect_timeout": settings.socket_connect_timeout,
+        "health_check_interval": settings.health_check_interval,
+    }
+
+
+def get_redis_pool(settings: Optional[RedisPoolSettings] = None) -> redis.ConnectionPool:
+    """Return the process-wide blocking connection pool for these settings."""
+    settings = settings or get_default_settings()
+    with _lock:
+        pool = _sync_pools.get(settings)
+        if pool is None:
+            kwargs = _pool_kwargs(settings)
+            if settings.ssl:
+                kwargs["connection_class"] = redis.SSLConnection
+            pool = redis.BlockingConnectionPool(**kwargs)
+            _sync_pools[settings] = pool
+        return pool
+
+
+def get_async_redis_pool(
+    settings: Optional[RedisPoolSettings] = None,
+) -> aioredis.ConnectionPool:
+    """Return the process-wide redis.asyncio connection pool for these settings."""
+    settings = settings or get_default_settings()
+    with _lock:
+        pool = _async_pools.get(settings)
+        if pool is None:
+            kwargs = _pool_kwargs(settings)
+            if settings.ssl:
+                kwargs["connection_class"] = aioredis.SSLConnection
+            pool = aioredis.BlockingConnectionPool(**kwargs)
+            _async_pools[settings] = pool
+        return pool
+
+
+def get_redis_client(settings: Optional[RedisPoolSettings] = None) -> redis.StrictRedis:
+    """Return a client bound to the shared pool."""
+    return redis.StrictRedis(connection_pool=get_redis_pool(settings))
+
+
+def get_async_redis_client(settings: Optional[RedisPoolSettings] = None) -> aioredis.Redis:
+    """Return a redis.asyncio client bound to the shared pool."""
+    return aioredis.Redis(connection_pool=get_async_redis_pool(settings))
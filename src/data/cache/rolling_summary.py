@@ -0,0 +1,196 @@
+"""
+Rolling conversation summary for long sessions.
+
+Once a session has more unsummarized messages than a threshold, the older ones
+are folded into a stored summary (`<history key>:summary`) by a background
+task, leaving only a short raw tail. Prompt context then becomes summary plus
+recent turns, so its size stops growing with session length. Summarization
+never runs on the request path: a turn uses whatever summary is already stored.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import msgpack
+
+from data.cache.async_redis_cache import maybe_await
+from data.cache.history_window import HistoryWindow
+from data.cache.message_codec import HistoryEntry
+
+logger = logging.getLogger(__name__)
+
+# summarize(previous_summary, new_lines) -> updated summary text
+SummarizeFn = Callable[[str, List[str]], Awaitable[str]]
+
+
+def summary_key(key: str) -> str:
+    """Redis key of the rolling summary for a history list."""
+    return f"{key}:summary"
+
+
+class ConversationSummary:
+    """Summary text and the timestamp of the newest message it covers."""
+
+    __slots__ = ("text", "covered_until", "covered_messages")
+
+    def __init__(self, text: str, covered_until: float, covered_messages: int):
+        self.text = text
+        self.covered_until = covered_until
+        self.covered_messages = covered_messages
+
+    def encode(self) -> bytes:
+        return msgpack.packb(
+            {"s": self.text, "t": self.covered_until, "n": self.covered_messages},
+            use_bin_type=True,
+        )
+
+    @classmethod
+    def decode(cls, raw: bytes) -> "ConversationSummary":
+        data = msgpack.unpackb(raw, raw=False)
+        return cls(data["s"], data["t"], data["n"])
+
+
+class RollingSummarizer:
+    """Keeps one rolling summary per session and measures the prompt tokens it saves."""
+
+    def __init__(
+        self,
+        redis_client,
+        summarize: SummarizeFn,
+        format_entry: Callable[[HistoryEntry], str],
+        window: HistoryWindow,
+        trigger_messages: int = 12,
+        keep_recent: int = 6,
+        max_summary_tokens: int = 300,
+        ttl_seconds: Optional[int] = None,
+    ):
+        """
+        Args:
+            redis_client: Sync or asyncio Redis client of the memory backend
+            summarize: Coroutine producing an updated summary from the previous one and new lines
+            format_entry: Formats a history entry as a prompt line
+            window: Token counter used for the summary cap and the metrics
+            trigger_messages: Unsummarized messages that trigger a summarization
+            keep_recent: Messages always kept verbatim after summarizing
+            max_summary_tokens: Summaries longer than this are truncated
+            ttl_seconds: Idle TTL of the session, re-applied when the summary is written
+        """
+        self.redis_client = redis_client
+        self.summarize = summarize
+        self.format_entry = format_entry
+        self.window = window
+        self.trigger_messages = trigger_messages
+        self.keep_recent = keep_recent
+        self.max_summary_tokens = max_summary_tokens
+        self.ttl_seconds = ttl_seconds
+
+        self._in_flight: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "turns": 0,
+            "raw_tokens": 0,
+            "context_tokens": 0,
+            "summaries": 0,
+            "failures": 0,
+        }
+
+    async def load(self, key: str) -> Optional[ConversationSummary]:
+        raw = await maybe_await(self.redis_client.get(summary_key(key)))
+        if raw is None:
+            return None
+        try:
+            return ConversationSummary.decode(raw)
+        except (ValueError, KeyError, TypeError, msgpack.UnpackException):
+            logger.warning(f"Discarding unreadable summary for key: {key}")
+            return None
+
+    @staticmethod
+    def pending(
+        history: List[HistoryEntry], summary: Optional[ConversationSummary]
+    ) -> List[HistoryEntry]:
+        """Messages (chronological) not yet covered by the summary."""
+        if summary is None:
+            return history
+        return [entry for entry in history if entry.ts > summary.covered_until]
+
+    def maybe_schedule(
+        self,
+        key: str,
+        pending: List[HistoryEntry],
+        summary: Optional[ConversationSummary],
+    ):
+        """Start a background summarization if the raw tail grew past the threshold."""
+        if len(pending) <= self.trigger_messages:
+            return
+        with self._lock:
+            if key in self._in_flight:
+                return
+            self._in_flight.add(key)
+
+        to_fold = pending[: len(pending) - self.keep_recent]
+        task = asyncio.get_running_loop().create_task(
+            self._fold(key, to_fold, summary)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fold(
+        self,
+        key: str,
+        entries: List[HistoryEntry],
+        previous: Optional[ConversationSummary],
+    ):
+        try:
+            text = await self.summarize(
+                previous.text if previous else "",
+                [self.format_entry(entry) for entry in entries],
+            )
+            text = self.window.truncate(text.strip(), self.max_summary_tokens)
+            updated = ConversationSummary(
+                text,
+                covered_until=entries[-1].ts,
+                covered_messages=(previous.covered_messages if previous else 0) + len(entries),
+            )
+
+            # Another worker may have folded a later range in the meantime
+            current = await self.load(key)
+            if current is not None and current.covered_until >= updated.covered_until:
+                return
+            # A plain SET drops the key's TTL; keep the session's idle expiry
+            await maybe_await(
+                self.redis_client.set(summary_key(key), updated.encode(), ex=self.ttl_seconds)
+            )
+            with self._lock:
+                self._stats["summaries"] += 1
+            logger.debug(f"Summarized {len(entries)} messages for key: {key}")
+        except Exception as e:
+            with self._lock:
+                self._stats["failures"] += 1
+            logger.error(f"Error summarizing history for key {key}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    async def clear(self, key: str):
+        await maybe_await(self.redis_client.delete(summary_key(key)))
+
+    def record_turn(self, raw_context: str, context: str) -> int:
+        """Record the history tokens of one turn with and without the summary; returns tokens saved."""
+        raw_tokens = self.window.count(raw_context)
+        context_tokens = self.window.count(context)
+        with self._lock:
+            self._stats["turns"] += 1
+            self._stats["raw_tokens"] += raw_tokens
+            self._stats["context_tokens"] += context_tokens
+        return raw_tokens - context_tokens
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+        saved = stats["raw_tokens"] - stats["context_tokens"]
+        stats["tokens_saved"] = saved
+        stats["avg_tokens_saved_per_turn"] = saved / stats["turns"] if stats["turns"] else 0.0
+        return stats
@@ -0,0 +1,284 @@
+"""
+Semantic cache of FAQ answers for paraphrased questions.
+
+Each answered question is embedded and kept in a small in-memory vector
+index: a preallocated matrix of L2-normalized float32 vectors, one row per
+slot, scored against a new question with a single matrix-vector product.
+The nearest previous question is a hit when its cosine similarity reaches
+the threshold, so "học phí một năm là bao nhiêu" can reuse the answer to
+"mỗi năm học phí bao nhiêu tiền?".
+
+Questions that differ only in a name or a number ("học phí ngành KHMT" and
+"học phí ngành Cơ khí", "điểm chuẩn 2023" and "điểm chuẩn 2024") embed almost
+identically, so a hit also requires both questions to mention the same
+entities: numbers, acronyms and capitalized words (see entity_tokens). The
+threshold itself has to be validated on labelled pairs before the cache is
+enabled (see data.cache.semantic_calibration).
+
+Entries expire after a TTL, the least recently used one is evicted when the
+index is full, and the whole index is dropped when the collection's
+generation counter changes (see answer_cache.bump_collection_generation).
+The index is persisted to `<path>.npz` (vectors) and `<path>.json` (questions,
+answers and timestamps), so a restart does not start cold.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from data.cache.answer_cache import CollectionGeneration
+from utils.executors import offload_io
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def entity_tokens(text: str) -> FrozenSet[str]:
+    """
+    Words of a question that name a specific thing, lowercased: anything with a
+    digit, acronyms, and capitalized words other than the first one.
+    """
+    entities = set()
+    for index, word in enumerate(WORD_PATTERN.findall(text)):
+        if any(char.isdigit() for char in word) or (len(word) > 1 and word.isupper()):
+            entities.add(word.lower())
+        elif index > 0 and word[0].isupper():
+            entities.add(word.lower())
+    return frozenset(entities)
+
+
+class SemanticAnswerCache:
+    """Nearest-neighbour answer cache over embedded questions."""
+
+    def __init__(
+        self,
+        embedding_engine,
+        redis_client,
+        collection_name: str,
+        path: Optional[str] = None,
+        threshold: float = 0.92,
+        ttl_seconds: float = 86400.0,
+        max_entries: int = 2000,
+        save_interval_seconds: float = 60.0,
+    ):
+        """
+        Args:
+            embedding_engine: EmbeddingEngine whose model encodes the questions
+            redis_client: Sync or asyncio Redis client holding the generation counter
+            collection_name: FAQ collection whose reindexing invalidates the cache
+            path: File prefix for persistence (None keeps the index in memory only)
+            threshold: Minimum cosine similarity for a cached answer to be reused
+            ttl_seconds: Age after which an entry is no longer served
+            max_entries: Index size; the least recently used entry is evicted beyond it
+            save_interval_seconds: Minimum delay between two saves after new entries
+        """
+        self.embedding_engine = embedding_engine
+        self.path = path
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.save_interval_seconds = save_interval_seconds
+
+        dim = embedding_engine.model.get_sentence_embedding_dimension()
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._used = np.zeros(max_entries, dtype=np.float64)
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._questions: List[Optional[str]] = [None] * max_entries
+        self._answers: List[Optional[str]] = [None] * max_entries
+
+        self._lock = threading.Lock()
+        self._generation_reader = CollectionGeneration(redis_client, collection_name)
+        self._generation = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "entity_mismatches": 0,
+            "stores": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+        if path:
+            self.load()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a question off the event loop as a normalized float32 vector."""
+        vector = await offload_io(
+            self.embedding_engine.model.encode, text, normalize_embeddings=True
+        )
+        return np.asarray(vector, dtype=np.float32)
+
+    def _clear(self):
+        self._valid[:] = False
+        self._questions = [None] * self.max_entries
+        self._answers = [None] * self.max_entries
+        self._dirty = True
+
+    async def _check_generation(self):
+        """Drop the index when the collection has been reindexed."""
+        generation = await self._generation_reader.read()
+        with self._lock:
+            if generation != self._generation:
+                self._clear()
+                self._generation = generation
+                self._stats["invalidations"] += 1
+                logger.info(f"Semantic cache cleared for collection generation {generation}")
+
+    def _expire(self, now: float):
+        expired = self._valid & (self._created < now - self.ttl_seconds)
+        if expired.any():
+            self._valid[expired] = False
+            self._dirty = True
+
+    async def lookup(self, question: str) -> Tuple[Optional[str], np.ndarray]:
+        """
+        Return the cached answer to the nearest previous question that is
+        similar enough and mentions the same entities.
+
+        The question's vector is returned as well, so a miss can be stored
+        with add() without embedding the question twice.
+        """
+        await self._check_generation()
+        vector = await self.embed(question)
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            if not self._valid.any():
+                self._stats["misses"] += 1
+                return None, vector
+            scores = self._vectors @ vector
+            scores[~self._valid] = -1.0
+            candidates = np.flatnonzero(scores >= self.threshold)
+            if not candidates.size:
+                self._stats["misses"] += 1
+                return None, vector
+            entities = entity_tokens(question)
+            best = next(
+                (
+                    int(slot)
+                    for slot in candidates[np.argsort(-scores[candidates])]
+                    if entity_tokens(self._questions[slot]) == entities
+                ),
+                None,
+            )
+            if best is None:
+                self._stats["misses"] += 1
+                self._stats["entity_mismatches"] += 1
+                return None, vector
+            self._used[best] = now
+            self._stats["hits"] += 1
+            logger.debug(f"Semantic cache hit ({scores[best]:.3f}): '{question}' ~ '{self._questions[best]}'")
+            return self._answers[best], vector
+
+    async def add(self, question: str, answer: str, vector: Optional[np.ndarray] = None):
+        """Cache the answer to a question."""
+        if vector is None:
+            vector = await self.embed(question)
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            free = np.flatnonzero(~self._valid)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._used))
+                self._stats["evictions"] += 1
+            self._vectors[slot] = vector
+            self._created[slot] = self._used[slot] = now
+            self._valid[slot] = True
+            self._questions[slot] = question
+            self._answers[slot] = answer
+            self._dirty = True
+            self._stats["stores"] += 1
+            due = self.path and time.monotonic() - self._saved_at >= self.save_interval_seconds
+        if due:
+            await offload_io(self.save)
+
+    def save(self):
+        """Write the index to disk (atomically replacing the previous files)."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            slots = np.flatnonzero(self._valid)
+            vectors = self._vectors[slots].copy()
+            meta = {
+                "generation": self._generation,
+                "entries": [
+                    {
+                        "question": self._questions[i],
+                        "answer": self._answers[i],
+                        "created": float(self._created[i]),
+                        "used": float(self._used[i]),
+                    }
+                    for i in slots
+                ],
+            }
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            with open(f"{self.path}.npz.tmp", "wb") as f:
+                np.savez(f, vectors=vectors)
+            with open(f"{self.path}.json.tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(f"{self.path}.npz.tmp", f"{self.path}.npz")
+            os.replace(f"{self.path}.json.tmp", f"{self.path}.json")
+        except OSError as e:
+            logger.warning(f"Could not save semantic cache to {self.path}: {e}")
+            with self._lock:
+                self._dirty = True
+
+    def load(self):
+        """Load a saved index, skipping expired entries and ones that no longer fit."""
+        if not (os.path.isfile(f"{self.path}.npz") and os.path.isfile(f"{self.path}.json")):
+            return
+        try:
+            with np.load(f"{self.path}.npz") as data:
+                vectors = data["vectors"]
+            with open(f"{self.path}.json", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Could not load semantic cache from {self.path}: {e}")
+            return
+        if vectors.ndim != 2 or vectors.shape[1] != self._vectors.shape[1]:
+            logger.warning(f"Semantic cache at {self.path} was built with another embedding model; ignoring it")
+            return
+
+        entries = meta["entries"]
+        cutoff = time.time() - self.ttl_seconds
+        # Most recently used first, so the size bound keeps the useful ones
+        order = sorted(range(len(entries)), key=lambda i: entries[i]["used"], reverse=True)
+        kept = [i for i in order if entries[i]["created"] >= cutoff][: self.max_entries]
+        with self._lock:
+            self._generation = meta.get("generation", 0)
+            for slot, i in enumerate(kept):
+                self._vectors[slot] = vectors[i]
+                self._created[slot] = entries[i]["created"]
+                self._used[slot] = entries[i]["used"]
+                self._valid[slot] = True
+                self._questions[slot] = entries[i]["question"]
+                self._answers[slot] = entries[i]["answer"]
+        logger.info(f"Loaded {len(kept)} semantic cache entries from {self.path}")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = int(self._valid.sum())
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,112 @@
+"""
+Threshold calibration for the semantic answer cache.
+
+Embeds labelled question pairs (config/semantic_cache_pairs.json) with the
+cache's embedding model and reports, per candidate threshold, how many
+paraphrases would share an answer and how many different questions would be
+served each other's answer, with the cache's entity check applied. A wrong
+answer costs far more than a miss, so the threshold to ship is the lowest one
+without false hits on the pairs:
+
+    python -m data.cache.semantic_calibration --pairs config/semantic_cache_pairs.json
+"""
+
+import argparse
+import json
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from data.cache.semantic_cache import entity_tokens
+
+DEFAULT_PAIRS_PATH = "config/semantic_cache_pairs.json"
+DEFAULT_THRESHOLDS = tuple(round(0.80 + 0.01 * step, 2) for step in range(20))
+
+
+@dataclass
+class ThresholdResult:
+    """Outcome of one threshold on the labelled pairs."""
+
+    threshold: float
+    true_hits: int
+    false_hits: int
+    paraphrases: int
+    different: int
+
+    @property
+    def recall(self) -> float:
+        return self.true_hits / self.paraphrases if self.paraphrases else 0.0
+
+
+def load_pairs(path: str) -> List[Tuple[str, str, bool]]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [(pair["a"], pair["b"], bool(pair["same"])) for pair in data["pairs"]]
+
+
+def pair_similarities(model, pairs: List[Tuple[str, str, bool]]) -> np.ndarray:
+    """Cosine similarity of each pair, with the normalized vectors the cache uses."""
+    first = model.encode([a for a, _, _ in pairs], normalize_embeddings=True)
+    second = model.encode([b for _, b, _ in pairs], normalize_embeddings=True)
+    return np.sum(np.asarray(first) * np.asarray(second), axis=1)
+
+
+def evaluate(
+    pairs: List[Tuple[str, str, bool]],
+    similarities: np.ndarray,
+    thresholds: Iterable[float] = DEFAULT_THRESHOLDS,
+) -> List[ThresholdResult]:
+    """Hits per threshold, counting a pair as a hit only if its entities match as well."""
+    entities_match = np.array([entity_tokens(a) == entity_tokens(b) for a, b, _ in pairs])
+    same = np.array([label for _, _, label in pairs])
+    results = []
+    for threshold in thresholds:
+        hit = (similarities >= threshold) & entities_match
+        results.append(
+            ThresholdResult(
+                threshold=threshold,
+                true_hits=int((hit & same).sum()),
+                false_hits=int((hit & ~same).sum()),
+                paraphrases=int(same.sum()),
+                different=int((~same).sum()),
+            )
+        )
+    return results
+
+
+def recommend(results: List[ThresholdResult]) -> Optional[float]:
+    """Lowest threshold without false hits (None if every threshold has some)."""
+    safe = [result.threshold for result in results if result.false_hits == 0]
+    return min(safe) if safe else None
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Calibrate SEMANTIC_CACHE_THRESHOLD on labelled question pairs.")
+    parser.add_argument("--pairs", default=DEFAULT_PAIRS_PATH, help="JSON file of labelled question pairs")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2", help="Sentence-Transformers model of the cache")
+    args = parser.parse_args(argv)
+
+    from sentence_transformers import SentenceTransformer
+
+    pairs = load_pairs(args.pairs)
+    similarities = pair_similarities(SentenceTransformer(args.model), pairs)
+    for (a, b, same), similarity in sorted(zip(pairs, similarities), key=lambda item: -item[1]):
+        print(f"{similarity:.3f} {'same' if same else 'diff'}  {a} | {b}")
+
+    results = evaluate(pairs, similarities)
+    print("\nthreshold  true hits  false hits  recall")
+    for result in results:
+        print(
+            f"{result.threshold:9.2f}  {result.true_hits:4d}/{result.paraphrases:<4d}"
+            f"  {result.false_hits:4d}/{result.different:<5d}  {result.recall:6.1%}"
+        )
+    threshold = recommend(results)
+    if threshold is None:
+        print("\nEvery threshold serves a wrong answer on these pairs; keep the semantic cache disabled.")
+    else:
+        print(f"\nLowest threshold without false hits: {threshold:.2f}")
+
+
+if __name__ == "__main__":
+    main()
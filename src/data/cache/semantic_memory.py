@@ -0,0 +1,183 @@
+"""
+Per-session semantic memory of past turns.
+
+Every stored message is embedded once and appended to two Redis keys next to
+the session history: `<key>:semvec`, a flat binary string of fixed-size
+records (float64 timestamp + L2-normalized float16 vector, appended with
+APPEND), and `<key>:semtext`, a list of the msgpack-encoded messages in the
+same order. Recall reads the vector blob in one GET, scores all turns with a
+single matrix-vector product and fetches only the top-k messages, so earlier
+turns that fell out of the recency window can still be brought back when they
+are relevant to the current question.
+"""
+
+import asyncio
+import logging
+from typing import List, Optional, Set, Tuple
+
+import msgpack
+import numpy as np
+import redis
+
+from data.cache.async_redis_cache import maybe_await
+from data.cache.message_codec import HistoryEntry, decode_message, encode_message
+from utils.executors import offload_io
+
+logger = logging.getLogger(__name__)
+
+
+def semantic_keys(key: str) -> Tuple[str, str]:
+    """Redis keys of the vector blob and the message list for a history list."""
+    return f"{key}:semvec", f"{key}:semtext"
+
+
+class SemanticMemory:
+    """Embeds session turns at store time and recalls the most relevant older ones."""
+
+    def __init__(
+        self,
+        redis_client,
+        embedding_engine,
+        max_turns: int = 200,
+        top_k: int = 3,
+        min_score: float = 0.35,
+        ttl_seconds: Optional[int] = None,
+    ):
+        """
+        Args:
+            redis_client: Sync or asyncio Redis client of the memory backend
+            embedding_engine: EmbeddingEngine whose model encodes the turns
+            max_turns: Turns kept per session; older ones are compacted away
+            top_k: Default number of turns returned by recall
+            min_score: Minimum cosine similarity for a turn to be recalled
+            ttl_seconds: Idle TTL of the session, re-applied on every write
+        """
+        self.redis_client = redis_client
+        self.embedding_engine = embedding_engine
+        self.max_turns = max_turns
+        self.top_k = top_k
+        self.min_score = min_score
+        self.ttl_seconds = ttl_seconds
+
+        dim = embedding_engine.model.get_sentence_embedding_dimension()
+        self.record_dtype = np.dtype([("t", "<f8"), ("v", "<f2", (dim,))])
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embed a text off the event loop as a normalized float16 vector."""
+        vector = await offload_io(
+            self.embedding_engine.model.encode, text, normalize_embeddings=True
+        )
+        return np.asarray(vector, dtype=np.float16)
+
+    async def add(self, key: str, entry: HistoryEntry, vector: Optional[np.ndarray] = None):
+        """Append a turn (embedding it unless a vector is given)."""
+        if vector is None:
+            vector = await self.embed(entry.message)
+        record = np.zeros(1, dtype=self.record_dtype)
+        record["t"] = entry.ts
+        record["v"] = vector
+
+        vec_key, text_key = semantic_keys(key)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.append(vec_key, record.tobytes())
+        pipe.rpush(text_key, encode_message(entry))
+        self._expire(pipe, vec_key, text_key)
+        results = await maybe_await(pipe.execute())
+        count = results[1]
+
+        # Compact in bulk rather than on every append
+        if count > self.max_turns + self.max_turns // 4:
+            await self._compact(key)
+
+    def _expire(self, pipe, *keys: str):
+        """Queue the session's idle TTL on keys (APPEND creates and SET resets them without one)."""
+        if self.ttl_seconds:
+            for key in keys:
+                pipe.expire(key, self.ttl_seconds)
+
+    def add_in_background(self, key: str, entry: HistoryEntry):
+        """Embed and append a turn without delaying the caller."""
+        task = asyncio.get_running_loop().create_task(self._add_logged(key, entry))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _add_logged(self, key: str, entry: HistoryEntry):
+        try:
+            await self.add(key, entry)
+        except Exception as e:
+            logger.error(f"Error adding semantic memory for key {key}: {e}")
+
+    async def _compact(self, key: str):
+        """Keep only the newest `max_turns` records; skipped if a writer races us."""
+        vec_key, text_key = semantic_keys(key)
+        pipe = self.redis_client.pipeline(transaction=True)
+        try:
+            await maybe_await(pipe.watch(vec_key, text_key))
+            blob = await maybe_await(pipe.get(vec_key)) or b""
+            keep = blob[-self.max_turns * self.record_dtype.itemsize :]
+            pipe.multi()
+            pipe.set(vec_key, keep)
+            pipe.ltrim(text_key, -self.max_turns, -1)
+            self._expire(pipe, vec_key, text_key)
+            await maybe_await(pipe.execute())
+            logger.debug(f"Compacted semantic memory for key: {key}")
+        except redis.WatchError:
+            pass
+        finally:
+            await maybe_await(pipe.reset())
+
+    async def recall(
+        self,
+        key: str,
+        vector: np.ndarray,
+        before: Optional[float] = None,
+        top_k: Optional[int] = None,
+    ) -> List[Tuple[float, HistoryEntry]]:
+        """
+        Return the most similar stored turns (chronological), with their scores.
+
+        Args:
+            key: Session history key
+            vector: Normalized query vector from `embed`
+            before: Only consider turns older than this timestamp (already-visible turns are excluded)
+            top_k: Number of turns to return (default: self.top_k)
+        """
+        top_k = self.top_k if top_k is None else top_k
+        vec_key, text_key = semantic_keys(key)
+        blob = await maybe_await(self.redis_client.get(vec_key))
+        if not blob or top_k <= 0:
+            return []
+
+        records = np.frombuffer(blob, dtype=self.record_dtype)
+        scores = records["v"].astype(np.float32) @ vector.astype(np.float32)
+        if before is not None:
+            scores[records["t"] >= before] = -np.inf
+        scores[scores < self.min_score] = -np.inf
+
+        k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        winners = sorted(int(i) for i in candidates if np.isfinite(scores[i]))
+        if not winners:
+            return []
+
+        pipe = self.redis_client.pipeline(transaction=False)
+        for index in winners:
+            pipe.lindex(text_key, index)
+        raw_entries = await maybe_await(pipe.execute())
+
+        recalled = []
+        for index, raw in zip(winners, raw_entries):
+            if raw is None:
+                continue
+            try:
+                entry = decode_message(raw)
+            except (ValueError, KeyError, TypeError, msgpack.UnpackException):
+                continue
+            # A concurrent compaction shifts list positions; skip mismatched turns
+            if entry.ts == records["t"][index]:
+                recalled.append((float(scores[index]), entry))
+        return recalled
+
+    async def clear(self, key: str):
+        await maybe_await(self.redis_client.delete(*semantic_keys(key)))
@@ -0,0 +1,136 @@
+"""
+Retention policy for chat history sessions in Redis.
+
+Three limits keep history memory bounded as students come and go:
+
+- an idle TTL on every key of a session, refreshed whenever it is read or written;
+- a per-session byte quota, enforced by dropping the oldest messages;
+- a global cap on live sessions, enforced by a background sweeper that evicts
+  the least recently used sessions from a last-access sorted set
+  (see data.cache.session_sweeper).
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from data.cache.history_cache import version_key
+from data.cache.inprocess_store import register_script
+
+# Sorted set of history keys scored by last access time
+ACCESS_INDEX_KEY = "chat_sessions:last_access"
+
+# Keys stored next to a history list: byte counter, rolling summary and
+# semantic memory (see rolling_summary, semantic_memory)
+SESSION_KEY_SUFFIXES = ("", ":bytes", ":summary", ":semvec", ":semtext")
+
+# The version counter (history_cache) is not a session key: it must keep
+# increasing across expiry and eviction, or a restarted counter could match a
+# version still held in another worker's local cache. It lives this many idle
+# TTLs past the last access; local copies are dropped after one idle TTL.
+VERSION_TTL_FACTOR = 4
+
+
+# Pushes an entry, trims the list to its count cap and adjusts the byte counter
+# by the bytes pushed minus the bytes trimmed, so a store stays one round trip.
+# KEYS: history list, byte counter; ARGV: entry, count cap. Returns the new byte count.
+PUSH_SCRIPT = """
+local cap = tonumber(ARGV[2])
+redis.call('LPUSH', KEYS[1], ARGV[1])
+local freed = 0
+for _, entry in ipairs(redis.call('LRANGE', KEYS[1], cap, -1)) do
+    freed = freed + #entry
+end
+redis.call('LTRIM', KEYS[1], 0, cap - 1)
+return redis.call('INCRBY', KEYS[2], #ARGV[1] - freed)
+"""
+
+
+def _push_in_process(store, keys, args):
+    key, counter = keys
+    entry, cap = args[0], int(args[1])
+    store.lpush(key, entry)
+    freed = sum(len(trimmed) for trimmed in store.lrange(key, cap, -1))
+    store.ltrim(key, 0, cap - 1)
+    return store.incrby(counter, len(entry) - freed)
+
+
+register_script(PUSH_SCRIPT, _push_in_process)
+
+
+def bytes_key(key: str) -> str:
+    """Redis key of the byte counter for a history list."""
+    return f"{key}:bytes"
+
+
+def session_keys(key: str) -> List[str]:
+    """All Redis keys that belong to one history session."""
+    return [f"{key}{suffix}" for suffix in SESSION_KEY_SUFFIXES]
+
+
+@dataclass(frozen=True)
+class SessionPolicy:
+    """Retention limits for history sessions; None disables a limit."""
+
+    idle_ttl_seconds: Optional[int] = 7 * 24 * 3600
+    max_session_bytes: Optional[int] = 256 * 1024
+    max_sessions: Optional[int] = 10000
+    sweep_interval_seconds: float = 300.0
+
+    @classmethod
+    def from_env(cls) -> "SessionPolicy":
+        """Load limits from the same environment variables as ManagerAgentConfig (0 disables a limit)."""
+        return cls(
+            idle_ttl_seconds=int(os.getenv("SESSION_IDLE_TTL_SECONDS", str(7 * 24 * 3600))) or None,
+            max_session_bytes=int(os.getenv("MAX_SESSION_BYTES", str(256 * 1024))) or None,
+            max_sessions=int(os.getenv("MAX_SESSIONS", "10000")) or None,
+            sweep_interval_seconds=float(os.getenv("SESSION_SWEEP_INTERVAL", "300")),
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "SessionPolicy":
+        """Build limits from a ManagerAgentConfig (or any object with its session fields)."""
+        return cls(
+            idle_ttl_seconds=config.session_idle_ttl_seconds or None,
+            max_session_bytes=config.max_session_bytes or None,
+            max_sessions=config.max_sessions or None,
+            sweep_interval_seconds=config.session_sweep_interval_seconds,
+        )
+
+    @property
+    def version_ttl_seconds(self) -> Optional[int]:
+        """TTL of a session's version counter (None when sessions never expire)."""
+        return self.idle_ttl_seconds * VERSION_TTL_FACTOR if self.idle_ttl_seconds else None
+
+    def expire_version(self, pipe, key: str):
+        """Queue the TTL of a session's version counter (an INCR may have created it without one)."""
+        if self.version_ttl_seconds:
+            pipe.expire(version_key(key), self.version_ttl_seconds)
+
+    def touch(self, pipe, key: str, now: Optional[float] = None):
+        """Queue TTL refresh and last-access update for a session on a pipeline."""
+        if self.idle_ttl_seconds:
+            for session_key in session_keys(key):
+                pipe.expire(session_key, self.idle_ttl_seconds)
+        self.expire_version(pipe, key)
+        pipe.zadd(ACCESS_INDEX_KEY, {key: now if now is not None else time.time()})
+
+
+def queue_push(pipe, key: str, raw: bytes, max_messages: int):
+    """Queue a capped LPUSH whose result is the session's new byte count."""
+    pipe.eval(PUSH_SCRIPT, 2, key, bytes_key(key), raw, max_messages)
+
+
+def quota_keep_count(entries: Sequence[bytes], max_bytes: int) -> int:
+    """
+    Number of newest entries (newest first) that fit the byte quota.
+
+    The newest entry is always kept, even when it alone exceeds the quota.
+    """
+    used = 0
+    for index, entry in enumerate(entries):
+        used += len(entry)
+        if used > max_bytes:
+            return max(1, index)
+    return len(entries)
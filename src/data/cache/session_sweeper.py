@@ -0,0 +1,148 @@
+"""
+Background sweeper for chat history sessions.
+
+Enforces the global session cap of a SessionPolicy by evicting the least
+recently used sessions, deletes sessions idle past the TTL (and their
+last-access index entries), and keeps the retention metrics (live sessions, bytes
+held, expirations and evictions). It runs on the event loop; with a sync
+client its commands run in the shared I/O pool, so a sweep never blocks
+the chat sessions served on that loop.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from data.cache.async_redis_cache import is_async_client
+from data.cache.history_cache import version_key
+from data.cache.session_policy import ACCESS_INDEX_KEY, SessionPolicy, bytes_key, session_keys
+from utils.executors import offload_io
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSweeper:
+    """Background task that enforces the session cap and refreshes metrics."""
+
+    def __init__(self, redis_client, policy: SessionPolicy, batch_size: int = 500):
+        """
+        Args:
+            redis_client: Sync or asyncio Redis client of the memory backend
+            policy: Retention limits to enforce
+            batch_size: Sessions read or deleted per round trip
+        """
+        self.redis_client = redis_client
+        self.policy = policy
+        self.batch_size = batch_size
+        self._blocking = not is_async_client(redis_client)
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "live_sessions": 0,
+            "bytes_held": 0,
+            "expired_sessions": 0,
+            "evicted_sessions": 0,
+            "sweeps": 0,
+            "last_sweep": 0.0,
+            "last_sweep_seconds": 0.0,
+        }
+
+    def record(self, name: str, amount: int = 1):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + amount
+
+    async def _call(self, command, *args):
+        if self._blocking:
+            return await offload_io(command, *args)
+        return await command(*args)
+
+    async def _delete_sessions(self, keys: List[str]):
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start : start + self.batch_size]
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key in batch:
+                pipe.delete(*session_keys(key))
+                # Bumped, not deleted, so local copies of the old history never match again
+                pipe.incr(version_key(key))
+                self.policy.expire_version(pipe, key)
+            pipe.zrem(ACCESS_INDEX_KEY, *batch)
+            await self._call(pipe.execute)
+
+    async def sweep(self) -> Dict[str, float]:
+        """Run one sweep and return the updated metrics."""
+        started = time.perf_counter()
+        now = time.time()
+
+        # Sessions idle longer than the TTL have normally expired in Redis already;
+        # their keys are deleted too, in case one was written without a TTL
+        if self.policy.idle_ttl_seconds:
+            expired = await self._call(
+                self.redis_client.zrangebyscore, ACCESS_INDEX_KEY, 0, now - self.policy.idle_ttl_seconds
+            )
+            await self._delete_sessions([k.decode("utf-8") for k in expired])
+            self.record("expired_sessions", len(expired))
+
+        live = await self._call(self.redis_client.zcard, ACCESS_INDEX_KEY)
+        if self.policy.max_sessions and live > self.policy.max_sessions:
+            excess = live - self.policy.max_sessions
+            oldest = await self._call(self.redis_client.zrange, ACCESS_INDEX_KEY, 0, excess - 1)
+            await self._delete_sessions([k.decode("utf-8") for k in oldest])
+            self.record("evicted_sessions", len(oldest))
+            logger.info(f"Evicted {len(oldest)} least recently used chat sessions")
+            live -= len(oldest)
+
+        bytes_held = 0
+        for start in range(0, live, self.batch_size):
+            keys = await self._call(
+                self.redis_client.zrange, ACCESS_INDEX_KEY, start, start + self.batch_size - 1
+            )
+            if not keys:
+                break
+            counters = await self._call(
+                self.redis_client.mget, [bytes_key(k.decode("utf-8")) for k in keys]
+            )
+            bytes_held += sum(int(c) for c in counters if c is not None)
+
+        with self._lock:
+            self._stats["live_sessions"] = live
+            self._stats["bytes_held"] = bytes_held
+            self._stats["sweeps"] += 1
+            self._stats["last_sweep"] = now
+            self._stats["last_sweep_seconds"] = time.perf_counter() - started
+        return self.stats()
+
+    async def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping chat sessions: {e}")
+            await asyncio.sleep(self.policy.sweep_interval_seconds)
+
+    def start(self):
+        """Start sweeping on the running event loop, or in a daemon thread if there is none."""
+        if self._task is not None or self._thread is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._thread = threading.Thread(
+                target=asyncio.run, args=(self.run_forever(),), daemon=True
+            )
+            self._thread.start()
+        else:
+            self._task = loop.create_task(self.run_forever())
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats)
@@ -52,6 +52,27 @@ class EmbeddingEngine:
                 )
         return embeddings
 
+    def get_embeddings_batch(
+        self, texts: List[str], batch_size: int = 64
+    ) -> List[List[float]]:
+        """
+        Generate embeddings for a list of texts in batched model calls.
+
+        Unlike `get_embeddings`, the whole list is encoded by the model in chunks of
+        `batch_size`, which is much faster for bulk indexing.
+
+        Args:
+            texts: A list of text strings.
+            batch_size: Number of texts encoded per model call.
+
+        Returns:
+            A list of embeddings (list of floats) corresponding to each text.
+        """
+        if not texts:
+            return []
+        embeddings = self.model.encode(texts, batch_size=batch_size)
+        return embeddings.tolist()
+
     def get_query_embedding(self, query: str) -> List[float]:
         """
         Generate an embedding for a query string.
@@ -0,0 +1,422 @@
+"""
+Bulk directory ingestion into Milvus.
+
+Walks a directory of PDF, DOCX, TXT, CSV and XLSX files, turns every file into
+text records, embeds them and inserts them into a single Milvus collection.
+Files are processed by a worker pool and progress is written to a JSON
+checkpoint after every inserted batch, so an interrupted run resumes where it
+stopped. Every record carries the file it came from and its batch number, so
+rows of a changed or partly ingested file are deleted before it is inserted
+again.
+
+The job only writes to collections with its own schema; it refuses to append
+to (or drop) another kind of collection, such as the FAQ collection.
+
+Usage:
+    python -m data.milvus.bulk_ingest <directory> --collection my_docs --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pymilvus import Collection, DataType, FieldSchema, utility
+
+from data.embeddings.embedding_engine import EmbeddingEngine
+from data.cache.answer_cache import bump_collection_generation
+from data.milvus.indexing import MilvusIndexer, load_rows_from_csv, load_rows_from_xlsx
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".txt", ".csv", ".xlsx"}
+TEXT_FIELD = "text"
+SOURCE_FIELD = "source"  # file path relative to the ingested directory
+BATCH_FIELD = "batch"  # insert batch of the record within its file
+DEFAULT_COLLECTION = "bulk_documents"
+
+# Fields a collection needs for the job to append to it
+REQUIRED_FIELDS = {TEXT_FIELD, f"{TEXT_FIELD}_dense_embedding", SOURCE_FIELD, BATCH_FIELD}
+
+
+def _metadata_fields() -> List[FieldSchema]:
+    return [
+        FieldSchema(name=SOURCE_FIELD, dtype=DataType.VARCHAR, max_length=4096),
+        FieldSchema(name=BATCH_FIELD, dtype=DataType.INT64),
+    ]
+
+
+@dataclass
+class FileResult:
+    """Outcome of ingesting a single file."""
+
+    path: str
+    status: str = "pending"  # pending, done, failed, skipped
+    size_bytes: int = 0
+    records: int = 0
+    batches_done: int = 0
+    seconds: float = 0.0
+    error: str = ""
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def kb_per_second(self) -> float:
+        return (self.size_bytes / 1024) / self.seconds if self.seconds > 0 else 0.0
+
+
+@dataclass
+class IngestionCheckpoint:
+    """JSON checkpoint recording per-file progress of a bulk ingestion run."""
+
+    path: str
+    collection_name: str
+    files: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def load(cls, path: str, collection_name: str) -> "IngestionCheckpoint":
+        """Load an existing checkpoint, or start a fresh one for the collection."""
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("collection_name") == collection_name:
+                return cls(path=path, collection_name=collection_name, files=data["files"])
+            logger.warning(
+                f"Checkpoint {path} belongs to collection '{data.get('collection_name')}', starting fresh"
+            )
+        return cls(path=path, collection_name=collection_name)
+
+    def entry(self, file_key: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.files.get(file_key, {}))
+
+    def update(self, file_key: str, **values: Any):
+        """Update the entry for a file and persist the checkpoint atomically."""
+        with self._lock:
+            self.files.setdefault(file_key, {}).update(values)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"collection_name": self.collection_name, "files": self.files},
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            os.replace(tmp_path, self.path)
+
+    def reset(self):
+        with self._lock:
+            self.files = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class BulkIngestionJob:
+    """Ingest every supported file under a directory into one Milvus collection."""
+
+    def __init__(
+        self,
+        directory: str,
+        collection_name: str,
+        checkpoint_path: Optional[str] = None,
+        workers: int = 4,
+        batch_size: int = 256,
+        recreate: bool = False,
+        splitter_model: str = "bkai-foundation-models/vietnamese-bi-encoder",
+        language: str = "vi",
+        max_tokens: int = 200,
+    ):
+        """
+        Args:
+            directory: Root directory to walk for documents
+            collection_name: Milvus collection that receives all records
+            checkpoint_path: JSON checkpoint file (default: <directory>/.ingest_checkpoint.json)
+            workers: Number of files processed concurrently
+            batch_size: Records embedded and inserted per batch; a checkpoint is written after each
+            recreate: Drop the collection and ignore any previous checkpoint
+            splitter_model: Sentence-transformers model used to chunk PDF/DOCX/TXT files
+            language: Language of the documents ('en' or 'vi')
+            max_tokens: Maximum tokens per chunk for PDF/DOCX/TXT files
+        """
+        self.directory = Path(directory)
+        self.collection_name = collection_name
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.recreate = recreate
+        self.splitter_model = splitter_model
+        self.language = language
+        self.max_tokens = max_tokens
+        self.checkpoint = IngestionCheckpoint.load(
+            checkpoint_path or str(self.directory / ".ingest_checkpoint.json"),
+            collection_name,
+        )
+        self.embedding_engine: Optional[EmbeddingEngine] = None
+        self.collection: Optional[Collection] = None
+        self._insert_lock = threading.Lock()
+        self._local = threading.local()
+
+    def discover_files(self) -> List[Path]:
+        """Return all supported files under the directory in a stable order."""
+        return sorted(
+            p
+            for p in self.directory.rglob("*")
+            if p.is_file() and p.suffix.lower() in SUPPORTED_EXTENSIONS
+        )
+
+    def _file_key(self, path: Path) -> str:
+        return str(path.relative_to(self.directory))
+
+    def _check_schema(self):
+        """Refuse to append to, or drop, a collection that this job did not create."""
+        fields = {f.name for f in Collection(self.collection_name).schema.fields}
+        if self.recreate and TEXT_FIELD not in fields:
+            raise ValueError(
+                f"Collection '{self.collection_name}' is not a bulk ingestion collection; "
+                "refusing to drop it. Choose another --collection."
+            )
+        if not self.recreate and not REQUIRED_FIELDS <= fields:
+            raise ValueError(
+                f"Collection '{self.collection_name}' does not have the bulk ingestion schema "
+                f"(missing {sorted(REQUIRED_FIELDS - fields)}). Choose another --collection, "
+                "or --recreate it if it was created by an older version of this job."
+            )
+
+    def _prepare_collection(self):
+        """Create the text collection once; existing collections are appended to."""
+        indexer = MilvusIndexer(
+            collection_name=self.collection_name, faq_file=str(self.directory)
+        )
+        indexer.connect()
+
+        exists = utility.has_collection(self.collection_name)
+        if exists:
+            self._check_schema()
+        if self.recreate:
+            self.checkpoint.reset()
+        if self.recreate or not exists:
+            indexer.create_collection(
+                data_sample={TEXT_FIELD: ""}, extra_fields=_metadata_fields()
+            )
+            indexer.create_index(categories=[TEXT_FIELD])
+            self.collection = indexer.collection
+        else:
+            self.collection = Collection(self.collection_name)
+            self.collection.load()
+
+        self.embedding_engine = EmbeddingEngine(model_name="all-MiniLM-L6-v2")
+
+    def _splitter(self):
+        # SemanticSplitter holds a spaCy pipeline and a model, so keep one per worker thread
+        splitter = getattr(self._local, "splitter", None)
+        if splitter is None:
+            from utils.basetools.semantic_splitter import SemanticSplitter
+
+            splitter = SemanticSplitter(
+                model_name=self.splitter_model,
+                language=self.language,
+                max_tokens=self.max_tokens,
+            )
+            self._local.splitter = splitter
+        return splitter
+
+    def load_records(self, path: Path) -> List[str]:
+        """Turn a file into the list of texts to index."""
+        suffix = path.suffix.lower()
+
+        if suffix in {".csv", ".xlsx"}:
+            rows = (
+                load_rows_from_csv(path) if suffix == ".csv" else load_rows_from_xlsx(path)
+            )
+            return [" | ".join(f"{k}: {v}" for k, v in row.items()) for row in rows]
+
+        from utils.basetools.semantic_splitter import load_docx, load_pdf, load_txt
+
+        loaders = {".txt": load_txt, ".pdf": load_pdf, ".docx": load_docx}
+        content = loaders[suffix](path)
+        if not content or not content.strip():
+            return []
+        return self._splitter().split(content)
+
+    def _insert_batch(self, file_key: str, batch_index: int, texts: List[str]):
+        assert self.embedding_engine is not None and self.collection is not None
+        embeddings = self.embedding_engine.get_embeddings_batch(texts)
+        rows = [
+            {
+                TEXT_FIELD: text,
+                f"{TEXT_FIELD}_dense_embedding": embedding,
+                SOURCE_FIELD: file_key,
+                BATCH_FIELD: batch_index,
+            }
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._insert_lock:
+            self.collection.insert(rows)
+
+    def _delete_rows(self, file_key: str, from_batch: int = 0):
+        """Delete the rows of a file inserted by an earlier run, from a batch on."""
+        assert self.collection is not None
+        source = json.dumps(file_key, ensure_ascii=False)
+        with self._insert_lock:
+            self.collection.delete(
+                f"{SOURCE_FIELD} == {source} and {BATCH_FIELD} >= {from_batch}"
+            )
+
+    def ingest_file(self, path: Path) -> FileResult:
+        """Ingest one file, resuming after the last checkpointed batch."""
+        file_key = self._file_key(path)
+        stat = path.stat()
+        result = FileResult(path=file_key, size_bytes=stat.st_size)
+        previous = self.checkpoint.entry(file_key)
+
+        unchanged = (
+            previous.get("size_bytes") == stat.st_size
+            and previous.get("mtime") == stat.st_mtime
+        )
+        if unchanged and previous.get("status") == "done":
+            result.status = "skipped"
+            result.records = previous.get("records", 0)
+            return result
+        start_batch = previous.get("batches_done", 0) if unchanged else 0
+
+        start = time.perf_counter()
+        try:
+            # A changed file restarts at batch 0 and a resumed one may have a batch
+            # inserted after the last checkpoint; either way, drop those rows first
+            if previous:
+                self._delete_rows(file_key, start_batch)
+            texts = self.load_records(path)
+            batches = [
+                texts[i : i + self.batch_size]
+                for i in range(0, len(texts), self.batch_size)
+            ]
+            for batch_index in range(start_batch, len(batches)):
+                self._insert_batch(file_key, batch_index, batches[batch_index])
+                self.checkpoint.update(
+                    file_key,
+                    status="in_progress",
+                    size_bytes=stat.st_size,
+                    mtime=stat.st_mtime,
+                    batches_done=batch_index + 1,
+                )
+
+            result.status = "done"
+            result.records = len(texts)
+            result.batches_done = len(batches)
+        except Exception as e:
+            logger.error(f"Failed to ingest {file_key}: {e}")
+            result.status = "failed"
+            result.error = str(e)
+
+        result.seconds = time.perf_counter() - start
+        self.checkpoint.update(
+            file_key,
+            status=result.status,
+            size_bytes=stat.st_size,
+            mtime=stat.st_mtime,
+            records=result.records,
+            seconds=result.seconds,
+            error=result.error,
+        )
+        return result
+
+    def run(self) -> List[FileResult]:
+        """Run the ingestion and return one result per discovered file."""
+        files = self.discover_files()
+        logger.info(f"Found {len(files)} files under {self.directory}")
+        if not files:
+            return []
+
+        self._prepare_collection()
+
+        results: List[FileResult] = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.ingest_file, path): path for path in files}
+            for future in as_completed(futures):
+                result = future.result()
+                logger.info(
+                    f"[{len(results) + 1}/{len(files)}] {result.path}: {result.status}"
+                )
+                results.append(result)
+
+        assert self.collection is not None
+        self.collection.flush()
+        if any(r.status == "done" for r in results):
+            bump_collection_generation(self.collection_name)
+        return sorted(results, key=lambda r: r.path)
+
+
+def format_report(results: List[FileResult]) -> str:
+    """Format a per-file throughput and failure report."""
+    lines = [
+        f"{'File':<50} {'Status':<8} {'Records':>8} {'Seconds':>8} {'Rec/s':>8} {'KB/s':>8}",
+        "-" * 95,
+    ]
+    for r in results:
+        lines.append(
+            f"{r.path[-50:]:<50} {r.status:<8} {r.records:>8} {r.seconds:>8.2f} "
+            f"{r.records_per_second:>8.1f} {r.kb_per_second:>8.1f}"
+        )
+
+    processed = [r for r in results if r.status == "done"]
+    failed = [r for r in results if r.status == "failed"]
+    skipped = [r for r in results if r.status == "skipped"]
+    total_seconds = sum(r.seconds for r in processed)
+    total_records = sum(r.records for r in processed)
+    lines.append("-" * 95)
+    lines.append(
+        f"Processed: {len(processed)}  Skipped (checkpoint): {len(skipped)}  Failed: {len(failed)}  "
+        f"Records: {total_records}  Worker time: {total_seconds:.2f}s"
+    )
+
+    if failed:
+        lines.append("\nFailures:")
+        for r in failed:
+            lines.append(f"  - {r.path}: {r.error}")
+
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk-ingest a directory of documents into Milvus.")
+    parser.add_argument("directory", help="Directory containing PDF, DOCX, TXT, CSV and XLSX files")
+    parser.add_argument(
+        "--collection",
+        default=DEFAULT_COLLECTION,
+        help="Target Milvus collection (must not be the FAQ collection)",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Number of files processed concurrently")
+    parser.add_argument("--batch-size", type=int, default=256, help="Records per insert batch")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file path")
+    parser.add_argument("--recreate", action="store_true", help="Drop the collection and start over")
+    parser.add_argument("--language", default="vi", choices=["vi", "en"], help="Document language")
+    parser.add_argument("--max-tokens", type=int, default=200, help="Maximum tokens per chunk")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    job = BulkIngestionJob(
+        directory=args.directory,
+        collection_name=args.collection,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        recreate=args.recreate,
+        language=args.language,
+        max_tokens=args.max_tokens,
+    )
+    start = time.perf_counter()
+    results = job.run()
+    print(format_report(results))
+    print(f"Wall time: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ from data.embeddings.embedding_engine import EmbeddingEngine
 import json
 import csv
 from data.milvus.milvus_client import MilvusClient
+from data.cache.answer_cache import bump_collection_generation
 import logging
 import pandas as pd
 
@@ -19,6 +20,42 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def load_rows_from_csv(file_path):
+    """Load non-empty rows from a CSV file as dictionaries."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        data = [
+            {k: v for k, v in row.items() if v and str(v).strip()}
+            for row in reader
+            if any(v and str(v).strip() for v in row.values())
+        ]
+    logger.info(f"Loaded {len(data)} entries from {file_path}.")
+    return data
+
+
+def load_rows_from_xlsx(file_path):
+    """Load non-empty rows from every sheet of an XLSX file as dictionaries."""
+    data = []
+    for engine in ["openpyxl", "xlrd", "calamine"]:
+        try:
+            xls = pd.ExcelFile(file_path, engine=engine)   # type: ignore
+            for sheet_name in xls.sheet_names:
+                df = pd.read_excel(xls, sheet_name=sheet_name)
+                for _, row in df.iterrows():
+                    row_data = {
+                        k: v
+                        for k, v in row.items()
+                        if pd.notna(v) and str(v).strip()
+                    }
+                    if row_data:
+                        data.append(row_data)
+            logger.info(f"Loaded {len(data)} entries from {file_path}.")
+            return data
+        except Exception:
+            continue
+    raise Exception(f"Could not open Excel file {file_path}")
+
+
 class MilvusIndexer:
     def __init__(
         self,
@@ -35,8 +72,13 @@ class MilvusIndexer:
         """Connect to the Milvus server."""
         self.milvus_client._connect()
 
-    def create_collection(self, data_sample=None):
-        """Create a Milvus collection with dynamic schema based on data columns."""
+    def create_collection(self, data_sample=None, extra_fields=None):
+        """
+        Create a Milvus collection with dynamic schema based on data columns.
+
+        Each column gets dense and sparse embedding fields; `extra_fields` are
+        FieldSchema objects added as is (plain metadata without embeddings).
+        """
         if data_sample is None:
             loader = (
                 self.load_faq_data_from_csv
@@ -86,6 +128,8 @@ class MilvusIndexer:
                 ]
             )
 
+        fields.extend(extra_fields or [])
+
         functions = []
         for category in categories:
             functions.append(
@@ -115,37 +159,11 @@ class MilvusIndexer:
 
     def load_faq_data_from_csv(self):
         """Load FAQ data from the CSV file."""
-        with open(self.faq_file, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            data = [
-                {k: v for k, v in row.items() if v and str(v).strip()}
-                for row in reader
-                if any(v and str(v).strip() for v in row.values())
-            ]
-        logger.info(f"Loaded {len(data)} entries from {self.faq_file}.")
-        return data
+        return load_rows_from_csv(self.faq_file)
 
     def load_faq_data_from_xlsx(self):
         """Load FAQ data from the XLSX file with many sheets."""
-        data = []
-        for engine in ["openpyxl", "xlrd", "calamine"]:
-            try:
-                xls = pd.ExcelFile(self.faq_file, engine=engine)   # type: ignore
-                for sheet_name in xls.sheet_names:
-                    df = pd.read_excel(xls, sheet_name=sheet_name)
-                    for _, row in df.iterrows():
-                        row_data = {
-                            k: v
-                            for k, v in row.items()
-                            if pd.notna(v) and str(v).strip()
-                        }
-                        if row_data:
-                            data.append(row_data)
-                logger.info(f"Loaded {len(data)} entries from {self.faq_file}.")
-                return data
-            except Exception:
-                continue
-        raise Exception(f"Could not open Excel file {self.faq_file}")
+        return load_rows_from_xlsx(self.faq_file)
 
     def generate_embeddings(self, data):
         """Generate dense embeddings for all categories dynamically."""
@@ -264,6 +282,8 @@ class MilvusIndexer:
         self.create_index()
         self.insert_data(faq_data)
         logger.info("Data has been successfully inserted into Milvus.")
+        # Answers cached from the previous contents are no longer valid
+        bump_collection_generation(self.collection_name)
 
 
 if __name__ == "__main__":
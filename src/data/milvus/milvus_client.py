@@ -11,6 +11,12 @@ from typing import List, Dict, Any, Optional
 import traceback
 import os
 
+# Value of the "ranker" key on hybrid_search hits: "score" is a WeightedRanker
+# similarity (higher is better) or, on the vector-only fallback, an L2
+# distance (lower is better)
+RANKER_WEIGHTED = "weighted"
+RANKER_L2 = "l2"
+
 
 class MilvusClient:
     def __init__(self, collection_name: str = "summerschool_workshop"):
@@ -276,6 +282,7 @@ class MilvusClient:
                             "Question": hit.entity.get("Question"),
                             "Answer": hit.entity.get("Answer"),
                             "score": hit.score,
+                            "ranker": RANKER_WEIGHTED,
                         }
                     )
             print(f"Formatted {len(output)} results")
@@ -303,6 +310,7 @@ class MilvusClient:
                                 "Question": hit.entity.get("Question"),
                                 "Answer": hit.entity.get("Answer"),
                                 "score": hit.score,
+                                "ranker": RANKER_L2,
                             }
                         )
                 return output
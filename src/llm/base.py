@@ -1,20 +1,201 @@
+"""
+Shared LLM model and agent factory.
+
+Every agent in the process talks to Gemini through one provider backed by one
+httpx.AsyncClient, so connections are kept alive and reused across agents and
+requests, and the number of concurrent connections to the API is bounded.
+Every request also goes through the shared rate limiter (llm.rate_limiter),
+so all agents draw from one request and token budget.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
 from pydantic_ai import Agent
-from typing import List, Callable
-import asyncio
+from pydantic_ai.messages import PartDeltaEvent, PartStartEvent, TextPart, TextPartDelta
 from pydantic_ai.models.gemini import GeminiModel
 from pydantic_ai.providers.google_gla import GoogleGLAProvider
-import os
-import chainlit as cl
-from data.cache.redis_cache import ShortTermMemory
 
-provider = GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY"))
-model = GeminiModel("gemini-2.0-flash", provider=provider)
-session_manager = ShortTermMemory(max_messages=15)
+from llm.rate_limiter import estimate_tokens, get_rate_limiter
+
+
+@dataclass(frozen=True)
+class LLMClientSettings:
+    """Model and HTTP connection settings shared by all agents."""
+
+    model_name: str = "gemini-2.0-flash"
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+    timeout: float = 60.0
+    connect_timeout: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "LLMClientSettings":
+        """Load settings from the same environment variables as ManagerAgentConfig."""
+        return cls(
+            model_name=os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10")),
+            keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+            timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "LLMClientSettings":
+        """Build settings from a ManagerAgentConfig (or any object with its llm_* fields)."""
+        return cls(
+            model_name=config.model_name,
+            max_connections=config.llm_max_connections,
+            max_keepalive_connections=config.llm_max_keepalive_connections,
+            keepalive_expiry=config.llm_keepalive_expiry,
+            timeout=config.llm_timeout,
+            connect_timeout=config.llm_connect_timeout,
+        )
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that sends each request through the shared rate limiter.
+
+    The token cost is estimated from the request body (the prompt, history
+    and tool definitions) plus an allowance for the answer; 429 responses
+    are retried after the limiter's backoff.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = get_rate_limiter()
+        tokens = estimate_tokens(request.content) + limiter.settings.expected_output_tokens
+        return await limiter.call_async(lambda: self._transport.handle_async_request(request), tokens)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+_lock = threading.Lock()
+_settings: Optional[LLMClientSettings] = None
+_http_client: Optional[httpx.AsyncClient] = None
+_provider: Optional[GoogleGLAProvider] = None
+_models: Dict[str, GeminiModel] = {}
+
+
+def configure_llm_client(settings: LLMClientSettings):
+    """
+    Set the settings used by the shared client.
+
+    Takes effect for the connection limits only if the HTTP client has not
+    been created yet, so call it before building agents.
+    """
+    global _settings
+    with _lock:
+        _settings = settings
+
+
+def get_llm_settings() -> LLMClientSettings:
+    """Return the configured settings, loading them from the environment once."""
+    global _settings
+    with _lock:
+        if _settings is None:
+            _settings = LLMClientSettings.from_env()
+        return _settings
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide keep-alive HTTP client for LLM calls."""
+    global _http_client
+    settings = get_llm_settings()
+    with _lock:
+        if _http_client is None:
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=settings.max_connections,
+                    max_keepalive_connections=settings.max_keepalive_connections,
+                    keepalive_expiry=settings.keepalive_expiry,
+                )
+            )
+            _http_client = httpx.AsyncClient(
+                transport=RateLimitedTransport(transport),
+                # Waiting for a free pooled connection is bounded by the request timeout
+                timeout=httpx.Timeout(settings.timeout, connect=settings.connect_timeout),
+            )
+        return _http_client
+
+
+def get_provider() -> GoogleGLAProvider:
+    """Return the shared Gemini provider."""
+    global _provider
+    http_client = get_http_client()
+    with _lock:
+        if _provider is None:
+            _provider = GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY"), http_client=http_client)
+        return _provider
+
+
+def get_model(model_name: Optional[str] = None) -> GeminiModel:
+    """Return the shared model for a name (default: the configured model)."""
+    model_name = model_name or get_llm_settings().model_name
+    provider = get_provider()
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = GeminiModel(model_name, provider=provider)
+            _models[model_name] = model
+        return model
+
+
+async def close_llm_client():
+    """Close the shared HTTP client (e.g. on application shutdown)."""
+    global _http_client, _provider
+    with _lock:
+        client, _http_client, _provider = _http_client, None, None
+        _models.clear()
+    if client is not None:
+        await client.aclose()
+
+
+async def stream_text(agent: Agent, prompt: str) -> AsyncIterator[str]:
+    """
+    Yield the text of an agent run as it is generated, as deltas.
+
+    Every model request of the run is streamed, not only the first one that
+    produces text: `run_stream` would take a short preamble the model writes
+    before a tool call as the final answer and end the run there. Tool calls
+    run as usual between requests. Text written before a tool call is kept
+    and separated from the answer that follows it by a blank line.
+    """
+    async with agent.iter(prompt) as run:
+        emitted = False
+        async for node in run:
+            if not Agent.is_model_request_node(node):
+                continue
+            separate = emitted
+            async with node.stream(run.ctx) as events:
+                async for event in events:
+                    if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                        text = event.part.content
+                    elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
+                        text = event.delta.content_delta
+                    else:
+                        continue
+                    if not text:
+                        continue
+                    if separate:
+                        yield "\n\n"
+                        separate = False
+                    emitted = True
+                    yield text
 
 
 class AgentClient:
-    def __init__(self , system_prompt: str, tools: List[Callable], model: GeminiModel = model):
-        self.model = model
+    def __init__(self , system_prompt: str, tools: List[Callable], model: Optional[GeminiModel] = None):
+        self.model = model or get_model()
         self.system_prompt = system_prompt
         self.tools = tools
 
@@ -0,0 +1,310 @@
+"""
+Client-side rate limiting for Gemini calls.
+
+Every LLM call in the process draws from one pair of token buckets, a
+request budget (RATE_LIMIT_PER_MINUTE) and a token budget
+(RATE_LIMIT_TOKENS_PER_MINUTE), before it is sent:
+
+- waiting callers are served in priority order: interactive chat ahead of
+  background work (rolling summaries, batch jobs), first come first served
+  within a priority;
+- a 429 response blocks all callers for a backoff delay (the Retry-After
+  header if present, otherwise exponential) and the call is retried; the
+  delay resets after the next success;
+- token costs are estimated from the prompt size before the call, since
+  the real usage is only known afterwards.
+
+The limiter is thread-safe and works from any event loop, so the async HTTP
+transport of the shared client (llm.base), sync HTTP calls and library
+clients all share it.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Priorities: lower values are served first
+INTERACTIVE = 0
+BACKGROUND = 10
+
+_PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+_priority: contextvars.ContextVar[int] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """Run the LLM calls made inside the block (and tasks started from it) at a priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def estimate_tokens(text: Any) -> int:
+    """Rough token count of a prompt (about 4 characters or bytes per token)."""
+    return max(1, len(text) // 4) if text else 1
+
+
+def is_rate_limit_error(error: Any) -> bool:
+    """Whether an exception or error message reports a Gemini 429."""
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a call waited longer than its limit for rate budget."""
+
+
+@dataclass(frozen=True)
+class RateLimiterSettings:
+    """Budgets and backoff for the shared limiter."""
+
+    requests_per_minute: int = 60
+    tokens_per_minute: int = 1_000_000
+    max_wait_seconds: float = 30.0
+    max_retries: int = 3
+    expected_output_tokens: int = 512
+    backoff_initial_seconds: float = 1.0
+    backoff_max_seconds: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "RateLimiterSettings":
+        """Load settings from the same environment variables as ManagerAgentConfig."""
+        return cls(
+            requests_per_minute=int(os.getenv("RATE_LIMIT_PER_MINUTE", "60")),
+            tokens_per_minute=int(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "1000000")),
+            max_wait_seconds=float(os.getenv("RATE_LIMIT_MAX_WAIT", "30")),
+            max_retries=int(os.getenv("RATE_LIMIT_RETRIES", "3")),
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "RateLimiterSettings":
+        """Build settings from a ManagerAgentConfig (or any object with its rate_limit_* fields)."""
+        return cls(
+            requests_per_minute=config.rate_limit_per_minute,
+            tokens_per_minute=config.rate_limit_tokens_per_minute,
+            max_wait_seconds=config.rate_limit_max_wait_seconds,
+            max_retries=config.rate_limit_retries,
+        )
+
+
+class RateLimiter:
+    """Request and token buckets with a priority queue and 429 backoff."""
+
+    def __init__(self, settings: Optional[RateLimiterSettings] = None):
+        self.settings = settings or RateLimiterSettings()
+        self._lock = threading.Lock()
+        now = time.monotonic()
+        self._requests = float(self.settings.requests_per_minute)
+        self._tokens = float(self.settings.tokens_per_minute)
+        self._refilled_at = now
+        self._blocked_until = now
+        self._backoff = self.settings.backoff_initial_seconds
+        self._queue: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._stats: Dict[str, Any] = {
+            "acquired": {},
+            "wait_seconds": {},
+            "max_wait_seconds": 0.0,
+            "rate_limited": 0,
+            "retries": 0,
+            "timeouts": 0,
+        }
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._requests = min(
+            float(self.settings.requests_per_minute),
+            self._requests + elapsed * self.settings.requests_per_minute / 60.0,
+        )
+        self._tokens = min(
+            float(self.settings.tokens_per_minute),
+            self._tokens + elapsed * self.settings.tokens_per_minute / 60.0,
+        )
+
+    def _try_take(self, ticket: Tuple[int, int], tokens: int) -> float:
+        """Take budget if this ticket is next and budget is available; else return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._queue[0] != ticket:
+                # Someone with a higher priority or an earlier ticket goes first
+                return 0.02
+            # A call larger than the whole token budget waits for a full bucket
+            tokens = min(tokens, self.settings.tokens_per_minute)
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                heapq.heappop(self._queue)
+                return 0.0
+            request_wait = (1 - self._requests) * 60.0 / self.settings.requests_per_minute
+            token_wait = (tokens - self._tokens) * 60.0 / self.settings.tokens_per_minute
+            return max(request_wait, token_wait, 0.01)
+
+    def _enqueue(self, priority: Optional[int]) -> Tuple[int, int]:
+        ticket = (_priority.get() if priority is None else priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._queue, ticket)
+        return ticket
+
+    def _leave(self, ticket: Tuple[int, int]):
+        with self._lock:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+
+    def _record(self, priority: int, waited: float):
+        name = _PRIORITY_NAMES.get(priority, str(priority))
+        with self._lock:
+            self._stats["acquired"][name] = self._stats["acquired"].get(name, 0) + 1
+            self._stats["wait_seconds"][name] = self._stats["wait_seconds"].get(name, 0.0) + waited
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+
+    def _timed_out(self, ticket: Tuple[int, int], waited: float, timeout: float):
+        self._leave(ticket)
+        with self._lock:
+            self._stats["timeouts"] += 1
+        raise RateLimitTimeout(f"Waited {waited:.1f}s for LLM rate budget (limit {timeout:.1f}s)")
+
+    def acquire(self, tokens: int = 1, priority: Optional[int] = None, timeout: Optional[float] = None) -> float:
+        """Block until a call of `tokens` tokens may be sent; returns the seconds waited."""
+        timeout = self.settings.max_wait_seconds if timeout is None else timeout
+        ticket = self._enqueue(priority)
+        start = time.monotonic()
+        try:
+            while True:
+                wait = self._try_take(ticket, tokens)
+                waited = time.monotonic() - start
+                if wait <= 0:
+                    self._record(ticket[0], waited)
+                    return waited
+                if waited + wait > timeout:
+                    self._timed_out(ticket, waited, timeout)
+                time.sleep(min(wait, 0.25))
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    async def acquire_async(
+        self, tokens: int = 1, priority: Optional[int] = None, timeout: Optional[float] = None
+    ) -> float:
+        """Wait without blocking the event loop until a call may be sent; returns the seconds waited."""
+        timeout = self.settings.max_wait_seconds if timeout is None else timeout
+        ticket = self._enqueue(priority)
+        start = time.monotonic()
+        try:
+            while True:
+                wait = self._try_take(ticket, tokens)
+                waited = time.monotonic() - start
+                if wait <= 0:
+                    self._record(ticket[0], waited)
+                    return waited
+                if waited + wait > timeout:
+                    self._timed_out(ticket, waited, timeout)
+                await asyncio.sleep(min(wait, 0.25))
+        except BaseException:
+            self._leave(ticket)
+            raise
+
+    def on_rate_limited(self, retry_after: Optional[str] = None):
+        """Pause all callers after a 429, for Retry-After seconds or the current backoff."""
+        try:
+            delay = float(retry_after) if retry_after else self._backoff
+        except ValueError:
+            delay = self._backoff
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+            self._backoff = min(self._backoff * 2, self.settings.backoff_max_seconds)
+            self._stats["rate_limited"] += 1
+
+    def on_success(self):
+        with self._lock:
+            self._backoff = self.settings.backoff_initial_seconds
+
+    def call(self, send: Callable[[], Any], tokens: int = 1, priority: Optional[int] = None) -> Any:
+        """
+        Send a sync HTTP request (requests or httpx) under the limiter,
+        retrying after 429 responses; returns the last response.
+        """
+        for attempt in range(self.settings.max_retries + 1):
+            self.acquire(tokens, priority)
+            response = send()
+            if response.status_code != 429:
+                self.on_success()
+                return response
+            self.on_rate_limited(response.headers.get("retry-after"))
+            if attempt == self.settings.max_retries:
+                return response
+            response.close()
+            with self._lock:
+                self._stats["retries"] += 1
+
+    async def call_async(
+        self, send: Callable[[], Awaitable[Any]], tokens: int = 1, priority: Optional[int] = None
+    ) -> Any:
+        """Async call(): send an httpx request, retrying after 429 responses."""
+        for attempt in range(self.settings.max_retries + 1):
+            await self.acquire_async(tokens, priority)
+            response = await send()
+            if response.status_code != 429:
+                self.on_success()
+                return response
+            self.on_rate_limited(response.headers.get("retry-after"))
+            if attempt == self.settings.max_retries:
+                return response
+            await response.aclose()
+            with self._lock:
+                self._stats["retries"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls and wait time per priority, callers waiting, 429s, retries and budget left."""
+        with self._lock:
+            self._refill(time.monotonic())
+            stats = {
+                **self._stats,
+                "acquired": dict(self._stats["acquired"]),
+                "wait_seconds": dict(self._stats["wait_seconds"]),
+                "waiting": len(self._queue),
+                "requests_available": int(self._requests),
+                "tokens_available": int(self._tokens),
+                "backoff_seconds": self._backoff,
+                "blocked_seconds": max(0.0, self._blocked_until - time.monotonic()),
+            }
+        stats["avg_wait_seconds"] = {
+            name: stats["wait_seconds"][name] / count for name, count in stats["acquired"].items() if count
+        }
+        return stats
+
+
+_lock = threading.Lock()
+_settings: Optional[RateLimiterSettings] = None
+_limiter: Optional[RateLimiter] = None
+
+
+def configure_rate_limiter(settings: RateLimiterSettings):
+    """Set the budgets; replaces the limiter if it already exists."""
+    global _settings, _limiter
+    with _lock:
+        _settings = settings
+        _limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide limiter, loading its settings from the environment if not configured."""
+    global _settings, _limiter
+    with _lock:
+        if _limiter is None:
+            _limiter = RateLimiter(_settings or RateLimiterSettings.from_env())
+        return _limiter
@@ -3,6 +3,8 @@ from adalflow.components.model_client.google_client import GoogleGenAIClient
 import os
 from dotenv import load_dotenv
 
+from llm.rate_limiter import estimate_tokens, get_rate_limiter, is_rate_limit_error
+
 load_dotenv()
 # --- Khởi tạo client từ AdalFlow ---
 client = GoogleGenAIClient(api_key=os.getenv("GEMINI_API_KEY"))
@@ -40,7 +42,16 @@ generator = Generator(
 
 # --- Hàm gọi agent ---
 def ask_agent(user_query: str) -> str:
-    output = generator(prompt_kwargs={"user_query": user_query})
+    # Dùng chung hạn mức gọi Gemini với các agent; Generator trả lỗi 429 trong output.error
+    limiter = get_rate_limiter()
+    tokens = estimate_tokens(system_prompt.data + user_query) + model_kwargs["max_output_tokens"]
+    for attempt in range(limiter.settings.max_retries + 1):
+        limiter.acquire(tokens)
+        output = generator(prompt_kwargs={"user_query": user_query})
+        if not (output.error and is_rate_limit_error(output.error)):
+            limiter.on_success()
+            break
+        limiter.on_rate_limited()
     return output.raw_response  # hoặc .data / .raw_response
 
 
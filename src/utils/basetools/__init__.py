@@ -26,7 +26,8 @@ from .faq_tool import (
     SearchInput as FAQInput,
     SearchOutput as FAQOutput,
     faq_tool,
-    create_faq_tool
+    create_faq_tool,
+    capture_faq_results
 )
 
 # File Reading Tool
@@ -124,6 +125,7 @@ __all__ = [
     'FAQOutput',
     'faq_tool',
     'create_faq_tool',
+    'capture_faq_results',
     
     # File Reading Tool
     'FileContentOutput',
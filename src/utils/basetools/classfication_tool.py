@@ -6,6 +6,8 @@ from typing import Any, Dict, List
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from llm.rate_limiter import estimate_tokens, get_rate_limiter
+
 load_dotenv()
 
 
@@ -58,11 +60,15 @@ def classify_scholarship_http(
     }
 
 
-    resp = requests.post(
-        ENDPOINT,
-        params={"key": API_KEY},
-        json=payload,
-        timeout=timeout,
+    # Shares the rate budget with the agents; the label reply is a few tokens
+    resp = get_rate_limiter().call(
+        lambda: requests.post(
+            ENDPOINT,
+            params={"key": API_KEY},
+            json=payload,
+            timeout=timeout,
+        ),
+        tokens=estimate_tokens(system_prompt + user_prompt) + 16,
     )
     resp.raise_for_status()
     data = resp.json()
@@ -1,10 +1,57 @@
-from data.embeddings.embedding_engine import EmbeddingEngine
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from data.milvus.milvus_client import MilvusClient
-from typing import List
+from typing import Iterator, List, Optional
 from pydantic import BaseModel, Field
 from typing import Dict, Any
 
-embedding_engine = EmbeddingEngine()
+_embedding_engine = None
+_embedding_engine_lock = threading.Lock()
+
+
+def get_embedding_engine():
+    """
+    Return the shared EmbeddingEngine, loading the model on first use.
+
+    Loading lazily keeps processes that only import the tools package (such
+    as the CPU pool's workers) from loading the model.
+    """
+    global _embedding_engine
+    with _embedding_engine_lock:
+        if _embedding_engine is None:
+            from data.embeddings.embedding_engine import EmbeddingEngine
+            _embedding_engine = EmbeddingEngine()
+        return _embedding_engine
+
+
+def __getattr__(name: str):
+    # `from utils.basetools.faq_tool import embedding_engine` keeps working
+    if name == "embedding_engine":
+        return get_embedding_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Results of the FAQ searches made in the current request, when captured
+_captured_results: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar(
+    "faq_captured_results", default=None
+)
+
+
+@contextmanager
+def capture_faq_results() -> Iterator[List[Dict[str, Any]]]:
+    """
+    Collect the results of every faq_tool call made inside the block.
+
+    The list is shared through a context variable, so it also receives the
+    results of tool calls an agent runs in worker threads during the block.
+    """
+    results: List[Dict[str, Any]] = []
+    token = _captured_results.set(results)
+    try:
+        yield results
+    finally:
+        _captured_results.reset(token)
 
 
 class SearchInput(BaseModel):
@@ -22,11 +69,14 @@ class SearchOutput(BaseModel):
 
 
 def faq_tool(
-    input: SearchInput, collection_name: str = "summerschool_workshop"
+    input: SearchInput,
+    collection_name: str = "summerschool_workshop",
+    client: Optional[MilvusClient] = None,
 ) -> SearchOutput:
-    client = MilvusClient(collection_name=collection_name)
+    if client is None:
+        client = MilvusClient(collection_name=collection_name)
 
-    query_embedding = embedding_engine.get_query_embedding(input.query)
+    query_embedding = get_embedding_engine().get_query_embedding(input.query)
 
     results = client.hybrid_search(
         query_text=input.query,
@@ -34,6 +84,9 @@ def faq_tool(
         limit=input.limit,
         search_answers=input.search_answers,
     )
+    captured = _captured_results.get()
+    if captured is not None:
+        captured.extend(results)
     return SearchOutput(results=results)
 
 
@@ -45,11 +98,20 @@ def create_faq_tool(collection_name: str = "summerschool_workshop"):
         collection_name: Name of the Milvus collection to use for searches
 
     Returns:
-        A function that performs FAQ searches using the specified collection
+        A function that performs FAQ searches using the specified collection;
+        it connects on its first search and reuses that MilvusClient afterwards
     """
+    clients: List[MilvusClient] = []
+    client_lock = threading.Lock()
+
+    def get_client() -> MilvusClient:
+        with client_lock:
+            if not clients:
+                clients.append(MilvusClient(collection_name=collection_name))
+            return clients[0]
 
     def configured_faq_tool(input: SearchInput) -> SearchOutput:
         # Collection name is fixed and cannot be changed by the agent
-        return faq_tool(input, collection_name=collection_name)
+        return faq_tool(input, collection_name=collection_name, client=get_client())
 
     return configured_faq_tool
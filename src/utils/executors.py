@@ -0,0 +1,254 @@
+"""
+Process-wide executors for blocking work called from async code.
+
+Most tools are synchronous: FAQ search (embedding plus Milvus), web search
+and scraping, file reading, SMTP, document parsing and OCR. Run on the event
+loop, one slow call freezes every Chainlit session in the process, so they
+are offloaded to one of two bounded pools:
+
+- io: a thread pool for blocking I/O (network, disk) and for work that needs
+  objects living in this process, such as the loaded embedding model;
+- cpu: a process pool for CPU-bound work on picklable inputs (document
+  parsing, OCR), so it does not compete with the event loop for the GIL.
+
+offload_io/offload_cpu run a call in a pool and await it; io_tool/cpu_tool
+wrap a sync tool function as an async one with the same signature and
+docstring, so agents register it unchanged. submit_io hands back the pool's
+own future instead, for callers that need to know when the worker is really
+free again (an awaiting task can be cancelled, the thread it waits on cannot).
+Each pool keeps its own metrics.
+"""
+
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass(frozen=True)
+class ExecutorSettings:
+    """Sizes of the shared pools."""
+
+    io_workers: int = 16
+    cpu_workers: int = 2
+    cpu_processes: bool = True
+
+    @classmethod
+    def from_env(cls) -> "ExecutorSettings":
+        """Load settings from the same environment variables as ManagerAgentConfig."""
+        return cls(
+            io_workers=int(os.getenv("EXECUTOR_IO_WORKERS", "16")),
+            cpu_workers=int(os.getenv("EXECUTOR_CPU_WORKERS", "2")),
+            cpu_processes=os.getenv("EXECUTOR_CPU_PROCESSES", "true").lower() == "true",
+        )
+
+    @classmethod
+    def from_config(cls, config) -> "ExecutorSettings":
+        """Build settings from a ManagerAgentConfig (or any object with its executor_* fields)."""
+        return cls(
+            io_workers=config.executor_io_workers,
+            cpu_workers=config.executor_cpu_workers,
+            cpu_processes=config.executor_cpu_processes,
+        )
+
+
+class PoolMetrics:
+    """Counters for one pool: calls in flight, failures, queueing and run time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0,
+        }
+
+    def submitted(self):
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["in_flight"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+
+    def finished(self, seconds: float, failed: bool):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            self._stats["failed" if failed else "completed"] += 1
+            self._stats["total_seconds"] += seconds
+            self._stats["max_seconds"] = max(self._stats["max_seconds"], seconds)
+
+    def cancelled(self):
+        """A call dropped from the queue before a worker picked it up."""
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            self._stats["cancelled"] += 1
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._stats["in_flight"]
+
+    def stats(self, workers: int) -> Dict[str, float]:
+        """Counters plus queue depth (calls waiting for a worker) and mean latency."""
+        with self._lock:
+            stats = dict(self._stats)
+        done = stats["completed"] + stats["failed"]
+        stats["workers"] = workers
+        stats["queued"] = max(0, stats["in_flight"] - workers)
+        stats["avg_seconds"] = stats["total_seconds"] / done if done else 0.0
+        return stats
+
+
+_lock = threading.Lock()
+_settings: Optional[ExecutorSettings] = None
+_io_executor: Optional[ThreadPoolExecutor] = None
+_cpu_executor: Optional[Executor] = None
+_metrics = {"io": PoolMetrics(), "cpu": PoolMetrics()}
+
+
+def configure_executors(settings: ExecutorSettings):
+    """
+    Set the pool sizes.
+
+    Takes effect only for pools not created yet, so call it at startup.
+    """
+    global _settings
+    with _lock:
+        _settings = settings
+
+
+def get_executor_settings() -> ExecutorSettings:
+    """Return the configured settings, loading them from the environment once."""
+    global _settings
+    with _lock:
+        if _settings is None:
+            _settings = ExecutorSettings.from_env()
+        return _settings
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """Return the shared thread pool for blocking I/O."""
+    global _io_executor
+    settings = get_executor_settings()
+    with _lock:
+        if _io_executor is None:
+            _io_executor = ThreadPoolExecutor(max_workers=settings.io_workers, thread_name_prefix="io")
+        return _io_executor
+
+
+def get_cpu_executor() -> Executor:
+    """Return the shared pool for CPU-bound work (processes, or threads if disabled)."""
+    global _cpu_executor
+    settings = get_executor_settings()
+    with _lock:
+        if _cpu_executor is None:
+            if settings.cpu_processes:
+                # Forking a process that holds model and client threads is unsafe
+                _cpu_executor = ProcessPoolExecutor(
+                    max_workers=settings.cpu_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                _cpu_executor = ThreadPoolExecutor(max_workers=settings.cpu_workers, thread_name_prefix="cpu")
+        return _cpu_executor
+
+
+def _submit(pool: str, executor: Executor, call: Callable[[], Any]) -> Future:
+    # Recorded when the worker is done, not when the caller stops waiting,
+    # so calls left running by a cancelled caller still count as in flight
+    metrics = _metrics[pool]
+    metrics.submitted()
+    start = time.perf_counter()
+    future = executor.submit(call)
+
+    def finished(done: Future):
+        if done.cancelled():
+            metrics.cancelled()
+        else:
+            metrics.finished(time.perf_counter() - start, done.exception() is not None)
+
+    future.add_done_callback(finished)
+    return future
+
+
+async def _offload(pool: str, executor: Executor, call: Callable[[], Any]) -> Any:
+    return await asyncio.wrap_future(_submit(pool, executor, call))
+
+
+async def offload_io(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call in the I/O thread pool, keeping the caller's context variables."""
+    context = contextvars.copy_context()
+    return await _offload("io", get_io_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def submit_io(func: Callable[..., Any], *args, **kwargs) -> Future:
+    """
+    Submit a blocking call to the I/O thread pool and return its future.
+
+    Cancelling the future only stops a call still waiting for a worker; one
+    already running finishes, and the future completes when it does.
+    """
+    context = contextvars.copy_context()
+    return _submit("io", get_io_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+def io_saturated() -> bool:
+    """Whether every I/O worker is busy, so a new call would wait in the queue."""
+    return _metrics["io"].in_flight() >= get_executor_settings().io_workers
+
+
+async def offload_cpu(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a CPU-bound call in the CPU pool.
+
+    With worker processes, `func` must be a module-level function and its
+    arguments and result must be picklable; context variables are not carried.
+    """
+    return await _offload("cpu", get_cpu_executor(), functools.partial(func, *args, **kwargs))
+
+
+def io_tool(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a blocking tool as an async tool that runs in the I/O pool."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await offload_io(func, *args, **kwargs)
+
+    return wrapper
+
+
+def cpu_tool(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a CPU-bound module-level tool as an async tool that runs in the CPU pool."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await offload_cpu(func, *args, **kwargs)
+
+    return wrapper
+
+
+def executor_stats() -> Dict[str, Dict[str, float]]:
+    """Metrics per pool: calls submitted, in flight and queued, failures and latency."""
+    settings = get_executor_settings()
+    return {
+        "io": _metrics["io"].stats(settings.io_workers),
+        "cpu": _metrics["cpu"].stats(settings.cpu_workers),
+    }
+
+
+def shutdown_executors(wait: bool = True):
+    """Shut both pools down (e.g. on application shutdown)."""
+    global _io_executor, _cpu_executor
+    with _lock:
+        executors, _io_executor, _cpu_executor = (_io_executor, _cpu_executor), None, None
+    for executor in executors:
+        if executor is not None:
+            executor.shutdown(wait=wait)
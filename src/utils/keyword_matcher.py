@@ -0,0 +1,114 @@
+"""
+Precompiled multi-pattern keyword matching.
+
+Routing and gating heuristics check messages against many keyword lists. A
+KeywordMatcher compiles all keywords of all categories into one regex and
+returns every category hit in a single scan of the text. Matching is
+case-insensitive and on whole words only ("lỗi" does not match "trả lời",
+"hi" does not match "Chị"); overlapping and nested keywords ("lịch",
+"lịch thi", "thi") are all reported.
+
+Phrases of several words are matched without diacritics ("hoc phi" matches
+"Học phí"). Single-word keywords keep them: once folded, many Vietnamese
+syllables collide ("kiểm"/"kiếm", "ngay"/"ngày", "thi"/"thì").
+"""
+
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Mapping, Set, Tuple
+
+# A keyword of one word, matched with its diacritics
+SINGLE_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip Vietnamese diacritics (đ becomes d)."""
+    text = text.lower().replace("đ", "d")
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def lower_text(text: str) -> str:
+    """Lowercase with diacritics kept, in composed form."""
+    return unicodedata.normalize("NFC", text.lower())
+
+
+class _KeywordPattern:
+    """One regex over a set of keywords, reporting whole-word matches."""
+
+    def __init__(self, owners: Mapping[str, Set[Hashable]]):
+        keywords = sorted(owners, key=len, reverse=True)
+
+        # The regex reports the longest keyword starting at each position; the
+        # shorter keywords that are whole-word prefixes of it match there as well.
+        self.matches: Dict[str, List[Tuple[str, Set[Hashable]]]] = {
+            keyword: [
+                (other, owners[other])
+                for other in keywords
+                if keyword.startswith(other)
+                and (len(other) == len(keyword) or not keyword[len(other)].isalnum())
+            ]
+            for keyword in keywords
+        }
+        # Keywords must start and end at word boundaries; a lookahead does not
+        # consume text, so matches can overlap
+        alternation = "|".join(re.escape(keyword) for keyword in keywords) or r"(?!)"
+        self.pattern = re.compile(rf"(?<!\w)(?=({alternation})(?!\w))")
+
+    def scan(self, text: str, hits: Dict[Hashable, Set[str]]):
+        seen = set()
+        for found in self.pattern.finditer(text):
+            keyword = found.group(1)
+            if keyword in seen:
+                continue
+            seen.add(keyword)
+            for matched, categories in self.matches[keyword]:
+                for category in categories:
+                    hits[category].add(matched)
+
+
+class KeywordMatcher:
+    """Matches the keywords of several categories in one pass."""
+
+    def __init__(self, categories: Mapping[Hashable, Iterable[str]]):
+        """
+        Args:
+            categories: Keywords per category; a keyword may belong to several categories
+        """
+        words: Dict[str, Set[Hashable]] = defaultdict(set)
+        phrases: Dict[str, Set[Hashable]] = defaultdict(set)
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                word = lower_text(keyword.strip())
+                if SINGLE_WORD.fullmatch(word):
+                    words[word].add(category)
+                    continue
+                normalized = normalize_text(keyword.strip())
+                if normalized:
+                    phrases[normalized].add(category)
+
+        self.categories = list(categories)
+        self._words = _KeywordPattern(words)
+        self._phrases = _KeywordPattern(phrases)
+
+    def match(self, text: str) -> Dict[Hashable, Set[str]]:
+        """
+        Return the keywords found in a text, grouped by category (single
+        words as written lowercase, phrases without diacritics).
+        """
+        hits: Dict[Hashable, Set[str]] = defaultdict(set)
+        if not text:
+            return hits
+        self._words.scan(lower_text(text), hits)
+        self._phrases.scan(normalize_text(text), hits)
+        return hits
+
+    def counts(self, text: str) -> Dict[Hashable, int]:
+        """Number of distinct keywords found per category (0 for categories without hits)."""
+        hits = self.match(text)
+        return {category: len(hits.get(category, ())) for category in self.categories}
+
+    def matches_any(self, text: str, category: Hashable) -> bool:
+        """Whether any keyword of a category occurs in a text."""
+        return bool(self.match(text).get(category))
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from workflow.admission import (
+    QUEUE_FULL,
+    QUEUE_TIMEOUT,
+    USER_LIMIT,
+    AdmissionController,
+    AdmissionRejected,
+    deadline_paused,
+)
+
+
+async def hold(event: asyncio.Event, result="ok"):
+    await event.wait()
+    return result
+
+
+def test_requests_run_and_are_counted():
+    async def scenario():
+        controller = AdmissionController()
+        result = await controller.run("u", lambda: asyncio.sleep(0, "xong"))
+        return result, controller.stats()
+
+    result, stats = asyncio.run(scenario())
+
+    assert result == "xong"
+    assert stats["admitted"] == stats["completed"] == 1
+    assert stats["active"] == stats["queue_depth"] == stats["users_in_flight"] == 0
+
+
+def test_user_limit_rejects_extra_requests_of_one_user():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=5, max_per_user=1)
+        release = asyncio.Event()
+        first = asyncio.create_task(controller.run("u", lambda: hold(release)))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.run("u", lambda: hold(release))
+        other = await controller.run("v", lambda: asyncio.sleep(0, "v"))
+        release.set()
+        return rejected.value.reason, other, await first, controller.stats()
+
+    reason, other, first, stats = asyncio.run(scenario())
+
+    assert reason == USER_LIMIT
+    assert (first, other) == ("ok", "v")
+    assert stats["rejected_user_limit"] == 1
+    assert stats["users_in_flight"] == 0
+
+
+def test_full_queue_sheds_requests():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, max_per_user=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(controller.run("a", lambda: hold(release)))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(controller.run("b", lambda: hold(release)))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.run("c", lambda: hold(release))
+        depth = controller.stats()["queue_depth"]
+        release.set()
+        await asyncio.gather(running, queued)
+        return rejected.value.reason, depth, controller.stats()
+
+    reason, depth, stats = asyncio.run(scenario())
+
+    assert reason == QUEUE_FULL
+    assert depth == 1
+    assert stats["completed"] == 2
+    assert stats["max_queue_depth"] == 1
+
+
+def test_request_waiting_too_long_is_rejected():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, queue_timeout_seconds=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(controller.run("a", lambda: hold(release)))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.run("b", lambda: hold(release))
+        release.set()
+        await running
+        return rejected.value.reason, controller.stats()
+
+    reason, stats = asyncio.run(scenario())
+
+    assert reason == QUEUE_TIMEOUT
+    assert stats["rejected_queue_timeout"] == 1
+    assert stats["queue_depth"] == stats["users_in_flight"] == 0
+
+
+def test_deadline_cancels_the_handler_and_frees_the_slot():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, request_timeout_seconds=0.05)
+        with pytest.raises(asyncio.TimeoutError):
+            await controller.run("u", lambda: asyncio.sleep(1))
+        after = await controller.run("u", lambda: asyncio.sleep(0, "ok"))
+        return after, controller.stats()
+
+    after, stats = asyncio.run(scenario())
+
+    assert after == "ok"
+    assert stats["timed_out"] == 1
+    assert stats["active"] == 0
+
+
+def test_paused_deadline_excludes_one_off_work():
+    async def handler():
+        async with deadline_paused():
+            await asyncio.sleep(0.15)
+        await asyncio.sleep(0.02)
+        return "ok"
+
+    async def scenario():
+        controller = AdmissionController(request_timeout_seconds=0.1)
+        return await controller.run("u", handler)
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_deadline_keeps_running_outside_the_paused_block():
+    async def handler():
+        async with deadline_paused():
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.2)
+
+    async def scenario():
+        controller = AdmissionController(request_timeout_seconds=0.1)
+        await controller.run("u", handler)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(scenario())
+
+
+def test_deadline_paused_outside_a_request_is_a_no_op():
+    async def scenario():
+        async with deadline_paused():
+            return "ok"
+
+    assert asyncio.run(scenario()) == "ok"
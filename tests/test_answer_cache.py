@@ -0,0 +1,110 @@
+import asyncio
+
+from data.cache.answer_cache import (
+    AnswerCache,
+    bump_collection_generation,
+    is_context_dependent,
+    normalize_question,
+)
+from data.cache.backends import InProcessBackend
+
+
+def cache_for(client, **kwargs):
+    kwargs.setdefault("generation_check_seconds", 0)
+    return AnswerCache(client, "faq", **kwargs)
+
+
+def test_questions_are_normalized():
+    assert normalize_question("  Học phí   bao nhiêu?? ") == "học phí bao nhiêu"
+    assert is_context_dependent("Còn ngành đó thì sao?")
+    assert not is_context_dependent("Học phí ngành KHMT là bao nhiêu?")
+
+
+def test_answer_is_shared_between_workers():
+    client = InProcessBackend().client()
+    first, second = cache_for(client), cache_for(client)
+
+    async def scenario():
+        await first.put("Học phí bao nhiêu?", "qna", "10 triệu")
+        return await second.get("học phí   bao nhiêu"), await second.get("học phí bao nhiêu")
+
+    shared, local = asyncio.run(scenario())
+
+    assert shared == local == ("qna", "10 triệu")
+    assert second.stats()["shared_hits"] == 1
+    assert second.stats()["local_hits"] == 1
+
+
+def test_only_cacheable_tasks_are_stored():
+    cache = cache_for(InProcessBackend().client(), tasks=("qna",))
+
+    async def scenario():
+        await cache.put("Gửi email cho phòng đào tạo", "email", "Đã gửi")
+        return await cache.get("Gửi email cho phòng đào tạo")
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_bumping_the_generation_invalidates_every_tier():
+    client = InProcessBackend().client()
+    cache = cache_for(client)
+
+    async def scenario():
+        await cache.put("Học phí bao nhiêu?", "qna", "10 triệu")
+        before = await cache.get("Học phí bao nhiêu?")
+        generation = bump_collection_generation("faq", client)
+        after = await cache.get("Học phí bao nhiêu?")
+        return before, generation, after
+
+    before, generation, after = asyncio.run(scenario())
+
+    assert before == ("qna", "10 triệu")
+    assert generation == 1
+    assert after is None
+    stats = cache.stats()
+    assert stats["invalidations"] == 1
+    assert stats["generation"] == 1
+    assert stats["local_entries"] == 0
+
+
+def test_generation_is_trusted_for_the_check_interval():
+    client = InProcessBackend().client()
+    cache = cache_for(client, generation_check_seconds=3600)
+
+    async def scenario():
+        await cache.put("Học phí bao nhiêu?", "qna", "10 triệu")
+        bump_collection_generation("faq", client)
+        return await cache.get("Học phí bao nhiêu?")
+
+    # Answers may lag a reindex by at most generation_check_seconds
+    assert asyncio.run(scenario()) == ("qna", "10 triệu")
+
+
+def test_other_collections_are_not_invalidated():
+    client = InProcessBackend().client()
+    cache = cache_for(client)
+
+    async def scenario():
+        await cache.put("Học phí bao nhiêu?", "qna", "10 triệu")
+        bump_collection_generation("other", client)
+        return await cache.get("Học phí bao nhiêu?")
+
+    assert asyncio.run(scenario()) == ("qna", "10 triệu")
+
+
+def test_failed_invalidation_is_reported_not_raised():
+    class Unreachable:
+        def incr(self, key):
+            raise ConnectionError("Redis down")
+
+    assert bump_collection_generation("faq", Unreachable()) is None
+
+
+def test_works_with_the_asyncio_client():
+    cache = cache_for(InProcessBackend().async_client(), local_max_entries=0)
+
+    async def scenario():
+        await cache.put("Học phí bao nhiêu?", "search", "10 triệu")
+        return await cache.get("Học phí bao nhiêu?")
+
+    assert asyncio.run(scenario()) == ("search", "10 triệu")
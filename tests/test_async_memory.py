@@ -0,0 +1,43 @@
+import asyncio
+
+from data.cache.async_redis_cache import AsyncShortTermMemory
+from data.cache.backends import InProcessBackend
+from data.cache.history_cache import SessionHistoryCache, version_key
+from data.cache.redis_cache import ShortTermMemory
+from data.cache.session_policy import ACCESS_INDEX_KEY, SessionPolicy, bytes_key
+
+
+def test_async_memory_stores_what_the_sync_memory_reads():
+    backend = InProcessBackend()
+    policy = SessionPolicy(idle_ttl_seconds=600, max_session_bytes=9, max_sessions=None)
+    memory = AsyncShortTermMemory(
+        max_messages=3, history_cache=SessionHistoryCache(), session_policy=policy, backend=backend
+    )
+    reader = ShortTermMemory(max_messages=3, session_policy=policy, backend=backend)
+
+    async def scenario():
+        for message in ("một", "hai", "ba", "bốn"):
+            await memory.store("s", message)
+        return await memory.retrieve("s")
+
+    assert asyncio.run(scenario()) == ["bốn", "ba"]
+    assert reader.retrieve("s") == ["bốn", "ba"]
+    assert int(backend.client().get(bytes_key("s"))) == len("bốnba".encode("utf-8"))
+    assert memory.quota_trims == 2
+
+
+def test_async_delete_clears_the_session_and_bumps_its_version():
+    backend = InProcessBackend()
+    cache = SessionHistoryCache()
+    memory = AsyncShortTermMemory(history_cache=cache, session_policy=SessionPolicy(), backend=backend)
+    client = backend.client()
+
+    async def scenario():
+        await memory.store("s", "xin chào")
+        await memory.retrieve("s")
+        await memory.delete("s")
+        indexed = client.zscore(ACCESS_INDEX_KEY, "s")
+        return indexed, await memory.retrieve("s")
+
+    assert asyncio.run(scenario()) == (None, [])
+    assert int(client.get(version_key("s"))) == 2
@@ -0,0 +1,87 @@
+import time
+
+from data.cache.backends import InProcessBackend
+from data.cache.history_cache import SessionHistoryCache, parse_version, version_key
+from data.cache.redis_cache import ShortTermMemory
+
+
+def test_get_returns_entries_only_at_the_cached_version():
+    cache = SessionHistoryCache()
+    cache.put("s", 3, [b"b", b"a"])
+
+    assert cache.get("s", 3) == [b"b", b"a"]
+    assert cache.get("s", 4) is None
+    assert cache.get("other", 0) is None
+    assert cache.stats() == {"sessions": 1, "hits": 1, "misses": 2}
+
+
+def test_append_applies_a_write_one_version_ahead():
+    cache = SessionHistoryCache()
+    cache.put("s", 1, [b"b", b"a"])
+
+    cache.append("s", 2, b"c", max_len=2)
+
+    assert cache.get("s", 2) == [b"c", b"b"]
+
+
+def test_append_drops_the_copy_when_another_writer_got_in_between():
+    cache = SessionHistoryCache()
+    cache.put("s", 1, [b"a"])
+
+    cache.append("s", 3, b"c", max_len=10)
+
+    assert cache.get("s", 3) is None
+    assert cache.stats()["sessions"] == 0
+
+
+def test_least_recently_used_session_is_dropped():
+    cache = SessionHistoryCache(max_sessions=2)
+    cache.put("a", 1, [])
+    cache.put("b", 1, [])
+    cache.get("a", 1)
+    cache.put("c", 1, [])
+
+    assert cache.get("a", 1) == []
+    assert cache.get("b", 1) is None
+
+
+def test_copy_not_validated_within_max_idle_is_dropped():
+    cache = SessionHistoryCache(max_idle_seconds=0.05)
+    cache.put("s", 1, [b"a"])
+    time.sleep(0.1)
+
+    # Even at a matching version: the counter may have expired and restarted
+    assert cache.get("s", 1) is None
+
+
+def test_parse_version_treats_a_missing_counter_as_zero():
+    assert parse_version(None) == 0
+    assert parse_version(b"7") == 7
+
+
+def test_memory_rereads_history_written_by_another_worker():
+    backend = InProcessBackend()
+    reader = ShortTermMemory(max_messages=5, history_cache=SessionHistoryCache(), backend=backend)
+    writer = ShortTermMemory(max_messages=5, backend=backend)
+
+    reader.store("s", "một")
+    assert reader.retrieve("s") == ["một"]
+
+    writer.store("s", "hai")
+
+    assert reader.retrieve("s") == ["hai", "một"]
+    assert int(backend.client().get(version_key("s"))) == 2
+
+
+def test_memory_serves_its_own_writes_from_the_local_copy():
+    cache = SessionHistoryCache()
+    memory = ShortTermMemory(max_messages=2, history_cache=cache, backend=InProcessBackend())
+    memory.store("s", "một")
+    memory.retrieve("s")
+
+    memory.store("s", "hai")
+    memory.store("s", "ba")
+    hits = cache.stats()["hits"]
+
+    assert memory.retrieve("s") == ["ba", "hai"]
+    assert cache.stats()["hits"] == hits + 1
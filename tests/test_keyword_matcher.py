@@ -0,0 +1,55 @@
+import unicodedata
+
+import pytest
+
+from utils.keyword_matcher import KeywordMatcher, lower_text, normalize_text
+
+
+@pytest.mark.parametrize(
+    "keyword, text",
+    [
+        ("lỗi", "Trả lời giúp mình câu này"),
+        ("kiếm", "Cho mình kiểm tra lịch thi"),
+        ("ngày", "Mình cần nộp ngay"),
+        ("hi", "Chị ơi cho em hỏi"),
+        ("thi", "Vậy thì sao ạ"),
+    ],
+)
+def test_single_words_keep_their_diacritics(keyword, text):
+    assert not KeywordMatcher({"k": [keyword]}).matches_any(text, "k")
+
+
+def test_single_words_match_whole_words_only():
+    matcher = KeywordMatcher({"k": ["thi", "hi"]})
+
+    assert matcher.match("Lịch thi cuối kỳ") == {"k": {"thi"}}
+    assert matcher.match("Hi, mình là tân sinh viên") == {"k": {"hi"}}
+    assert matcher.match("thiết kế, thiên văn, hiểu") == {}
+
+
+def test_phrases_match_without_diacritics():
+    matcher = KeywordMatcher({"fee": ["học phí"], "schedule": ["lịch thi"]})
+
+    assert matcher.matches_any("hoc phi nam nay bao nhieu", "fee")
+    assert matcher.matches_any("HỌC PHÍ năm nay", "fee")
+    assert not matcher.matches_any("học phíxyz", "fee")
+    assert matcher.counts("lich thi va hoc phi") == {"fee": 1, "schedule": 1}
+    assert matcher.counts("điểm rèn luyện") == {"fee": 0, "schedule": 0}
+
+
+def test_overlapping_keywords_are_all_reported():
+    matcher = KeywordMatcher({"a": ["học bổng"], "b": ["học bổng khuyến khích"], "c": ["bổng"]})
+
+    assert matcher.match("Điều kiện học bổng khuyến khích") == {
+        "a": {"hoc bong"},
+        "b": {"hoc bong khuyen khich"},
+        "c": {"bổng"},
+    }
+
+
+def test_decomposed_input_matches_composed_keywords():
+    decomposed = unicodedata.normalize("NFD", "Lỗi đăng ký")
+
+    assert KeywordMatcher({"k": ["lỗi"]}).matches_any(decomposed, "k")
+    assert lower_text(decomposed) == "lỗi đăng ký"
+    assert normalize_text(decomposed) == "loi dang ky"
@@ -0,0 +1,103 @@
+import json
+from datetime import datetime
+
+import msgpack
+
+from data.cache.backends import InProcessBackend
+from data.cache.message_codec import (
+    HistoryEntry,
+    decode_history,
+    decode_message,
+    encode_message,
+    is_legacy_entry,
+    migrate_all,
+    migrate_history,
+)
+
+
+def legacy_entry(user_id, message, timestamp, message_type="user") -> bytes:
+    return json.dumps({
+        "user_id": user_id,
+        "message": message,
+        "timestamp": timestamp.isoformat(),
+        "message_type": message_type,
+    }).encode("utf-8")
+
+
+def test_round_trip_keeps_every_field():
+    entry = HistoryEntry("user_1", "Học phí ngành KHMT là bao nhiêu?", 1718000000.25, "assistant")
+
+    decoded = decode_message(encode_message(entry))
+
+    assert decoded.user_id == "user_1"
+    assert decoded.message == "Học phí ngành KHMT là bao nhiêu?"
+    assert decoded.ts == 1718000000.25
+    assert decoded.message_type == "assistant"
+
+
+def test_known_types_are_stored_as_codes_and_unknown_ones_as_is():
+    assert msgpack.unpackb(encode_message(HistoryEntry("u", "m", 0, "system")))["k"] == 2
+
+    decoded = decode_message(encode_message(HistoryEntry("u", "m", 0, "tool")))
+
+    assert decoded.message_type == "tool"
+
+
+def test_legacy_json_entry_is_decoded():
+    timestamp = datetime(2024, 6, 10, 8, 30, 15)
+    raw = legacy_entry("user_1", "Xin chào", timestamp, "assistant")
+
+    decoded = decode_message(raw)
+
+    assert is_legacy_entry(raw) and is_legacy_entry(raw.decode("utf-8"))
+    assert not is_legacy_entry(encode_message(decoded))
+    assert decoded.timestamp == timestamp
+    assert decoded.message_type == "assistant"
+
+
+def test_decode_history_is_chronological_and_skips_broken_entries():
+    first = encode_message(HistoryEntry("u", "first", 1))
+    second = legacy_entry("u", "second", datetime(2024, 1, 1))
+    third = encode_message(HistoryEntry("u", "third", 3))
+
+    # LPUSH stores newest first
+    history = decode_history([third, b"{not json", second, first])
+
+    assert [entry.message for entry in history] == ["first", "second", "third"]
+
+
+def test_migrate_history_rewrites_legacy_entries_in_place():
+    client = InProcessBackend().client()
+    key = "chat_history:user_1"
+    packed = encode_message(HistoryEntry("user_1", "mới", 2))
+    client.rpush(key, packed, legacy_entry("user_1", "cũ", datetime(2024, 1, 1)), b"{broken")
+
+    assert migrate_history(client, key) == 2
+
+    raw_entries = client.lrange(key, 0, -1)
+    assert raw_entries[0] == packed
+    assert not is_legacy_entry(raw_entries[1])
+    assert decode_message(raw_entries[1]).message == "cũ"
+    # Entries that cannot be parsed are kept rather than lost
+    assert raw_entries[2] == b"{broken"
+
+
+def test_migrate_history_leaves_migrated_lists_alone():
+    backend = InProcessBackend()
+    client = backend.client()
+    key = "chat_history:user_1"
+    client.rpush(key, encode_message(HistoryEntry("user_1", "mới", 2)))
+    version = backend.store.version(key)
+
+    assert migrate_history(client, key) == 0
+    assert backend.store.version(key) == version
+
+
+def test_migrate_all_covers_every_history_list():
+    client = InProcessBackend().client()
+    for user in ("a", "b"):
+        client.rpush(f"chat_history:{user}", legacy_entry(user, "hi", datetime(2024, 1, 1)))
+    client.set("chat_history:a:ver", 3)
+
+    assert migrate_all(client) == 2
+    assert migrate_all(client) == 0
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from llm.rate_limiter import (
+    BACKGROUND,
+    INTERACTIVE,
+    RateLimiter,
+    RateLimiterSettings,
+    RateLimitTimeout,
+    estimate_tokens,
+    is_rate_limit_error,
+    llm_priority,
+)
+
+
+class Response:
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"retry-after": retry_after} if retry_after else {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+def limiter(**kwargs) -> RateLimiter:
+    kwargs.setdefault("max_wait_seconds", 5.0)
+    return RateLimiter(RateLimiterSettings(**kwargs))
+
+
+def test_calls_within_budget_do_not_wait():
+    rate_limiter = limiter(requests_per_minute=60, tokens_per_minute=1000)
+
+    waited = [rate_limiter.acquire(tokens=100) for _ in range(5)]
+
+    assert max(waited) < 0.05
+    stats = rate_limiter.stats()
+    assert stats["acquired"] == {"interactive": 5}
+    assert stats["tokens_available"] <= 500 + 1
+
+
+def test_exhausted_budget_times_out():
+    rate_limiter = limiter(requests_per_minute=1)
+    rate_limiter.acquire()
+
+    with pytest.raises(RateLimitTimeout):
+        rate_limiter.acquire(timeout=0.1)
+
+    stats = rate_limiter.stats()
+    assert stats["timeouts"] == 1
+    assert stats["waiting"] == 0
+
+
+def test_interactive_calls_are_served_before_background_ones():
+    # One request per 0.1s
+    rate_limiter = limiter(requests_per_minute=600)
+    rate_limiter._requests = 0.0
+    order = []
+
+    def call(name, priority, delay):
+        time.sleep(delay)
+        rate_limiter.acquire(priority=priority)
+        order.append(name)
+
+    threads = [
+        threading.Thread(target=call, args=("background", BACKGROUND, 0.0)),
+        threading.Thread(target=call, args=("interactive", INTERACTIVE, 0.03)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert order == ["interactive", "background"]
+
+
+def test_priority_follows_the_context():
+    rate_limiter = limiter()
+
+    async def scenario():
+        with llm_priority(BACKGROUND):
+            await rate_limiter.acquire_async()
+        await rate_limiter.acquire_async()
+
+    asyncio.run(scenario())
+
+    assert rate_limiter.stats()["acquired"] == {"background": 1, "interactive": 1}
+
+
+def test_429_blocks_callers_and_backs_off_exponentially():
+    rate_limiter = limiter(backoff_initial_seconds=0.05, backoff_max_seconds=0.15)
+
+    rate_limiter.on_rate_limited()
+    blocked = rate_limiter.stats()["blocked_seconds"]
+    waited = rate_limiter.acquire()
+
+    assert 0 < blocked <= 0.05
+    assert waited >= 0.04
+    assert rate_limiter.stats()["backoff_seconds"] == 0.1
+
+    rate_limiter.on_rate_limited()
+    rate_limiter.on_rate_limited()
+    assert rate_limiter.stats()["backoff_seconds"] == 0.15
+
+    rate_limiter.on_success()
+    assert rate_limiter.stats()["backoff_seconds"] == 0.05
+
+
+def test_retry_after_header_sets_the_delay():
+    rate_limiter = limiter(backoff_initial_seconds=10)
+
+    rate_limiter.on_rate_limited("0.05")
+
+    assert rate_limiter.stats()["blocked_seconds"] <= 0.05
+
+
+def test_call_retries_after_429():
+    rate_limiter = limiter(backoff_initial_seconds=0.01, max_retries=3)
+    responses = [Response(429), Response(429, retry_after="0.01"), Response(200)]
+    sent = list(responses)
+
+    result = rate_limiter.call(lambda: sent.pop(0))
+
+    assert result is responses[-1]
+    assert responses[0].closed and responses[1].closed
+    stats = rate_limiter.stats()
+    assert stats["rate_limited"] == 2
+    assert stats["retries"] == 2
+
+
+def test_call_async_gives_up_after_max_retries():
+    rate_limiter = limiter(backoff_initial_seconds=0.01, backoff_max_seconds=0.01, max_retries=1)
+
+    async def send():
+        return Response(429)
+
+    result = asyncio.run(rate_limiter.call_async(send))
+
+    assert result.status_code == 429
+    assert not result.closed
+    assert rate_limiter.stats()["rate_limited"] == 2
+
+
+def test_helpers():
+    assert estimate_tokens("x" * 400) == 100
+    assert estimate_tokens("") == 1
+    assert is_rate_limit_error(Exception("429 RESOURCE_EXHAUSTED"))
+    assert not is_rate_limit_error(Exception("500 INTERNAL"))
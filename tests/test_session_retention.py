@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+from data.cache.backends import InProcessBackend
+from data.cache.history_cache import version_key
+from data.cache.memory_handler import MessageMemoryHandler
+from data.cache.redis_cache import ShortTermMemory
+from data.cache.session_policy import (
+    ACCESS_INDEX_KEY,
+    SessionPolicy,
+    bytes_key,
+    quota_keep_count,
+    session_keys,
+)
+from data.cache.session_sweeper import SessionSweeper
+from utils.executors import executor_stats
+
+
+def memory_with(policy: SessionPolicy, max_messages: int = 15):
+    backend = InProcessBackend()
+    return ShortTermMemory(max_messages=max_messages, session_policy=policy, backend=backend), backend.client()
+
+
+def test_store_sets_idle_ttl_and_records_last_access():
+    policy = SessionPolicy(idle_ttl_seconds=600, max_sessions=None)
+    memory, client = memory_with(policy)
+
+    memory.store("s", "xin chào")
+
+    assert 0 < client.ttl("s") <= 600
+    assert 0 < client.ttl(bytes_key("s")) <= 600
+    assert client.ttl(version_key("s")) > 600
+    assert client.zscore(ACCESS_INDEX_KEY, "s") is not None
+    assert int(client.get(bytes_key("s"))) == len("xin chào".encode("utf-8"))
+
+
+def test_idle_session_expires():
+    policy = SessionPolicy(idle_ttl_seconds=0.05, max_sessions=None)
+    memory, client = memory_with(policy)
+    memory.store("s", "xin chào")
+
+    time.sleep(0.1)
+
+    assert memory.retrieve("s") == []
+    assert client.exists(bytes_key("s")) == 0
+
+
+def test_reading_a_session_refreshes_its_ttl():
+    policy = SessionPolicy(idle_ttl_seconds=0.3, max_sessions=None)
+    memory, client = memory_with(policy)
+    memory.store("s", "xin chào")
+
+    for _ in range(3):
+        time.sleep(0.15)
+        assert memory.retrieve("s") == ["xin chào"]
+
+
+def test_byte_quota_drops_the_oldest_messages():
+    policy = SessionPolicy(idle_ttl_seconds=None, max_session_bytes=25, max_sessions=None)
+    memory, client = memory_with(policy)
+
+    for message in ("tin nhắn 1", "tin nhắn 2", "tin nhắn 3"):
+        memory.store("s", message)
+
+    assert memory.retrieve("s") == ["tin nhắn 3", "tin nhắn 2"]
+    assert int(client.get(bytes_key("s"))) == 2 * len("tin nhắn 1".encode("utf-8"))
+    assert memory.quota_trims == 1
+
+
+def test_count_cap_keeps_the_byte_counter_exact():
+    policy = SessionPolicy(idle_ttl_seconds=None, max_sessions=None)
+    memory, client = memory_with(policy, max_messages=2)
+
+    for message in ("aaa", "bb", "c", "dddd"):
+        memory.store("s", message)
+
+    assert memory.retrieve("s") == ["dddd", "c"]
+    assert int(client.get(bytes_key("s"))) == 5
+
+
+def test_quota_keeps_the_newest_entry_even_when_it_alone_is_too_large():
+    assert quota_keep_count([b"x" * 10, b"y"], 5) == 1
+    assert quota_keep_count([b"x", b"y"], 5) == 2
+
+
+def test_sweeper_evicts_least_recently_used_sessions():
+    policy = SessionPolicy(idle_ttl_seconds=None, max_sessions=2)
+    memory, client = memory_with(policy)
+    for user in ("a", "b", "c"):
+        memory.store(f"chat_history:{user}", "xin chào")
+    memory.retrieve("chat_history:a")
+    client.set("chat_history:b:summary", "tóm tắt")
+    evicted_version = int(client.get(version_key("chat_history:b")))
+
+    stats = asyncio.run(SessionSweeper(client, policy).sweep())
+
+    assert stats["evicted_sessions"] == 1
+    assert stats["live_sessions"] == 2
+    assert client.exists(*session_keys("chat_history:b")) == 0
+    assert client.zscore(ACCESS_INDEX_KEY, "chat_history:b") is None
+    # The version counter keeps increasing, so stale local copies never match again
+    assert int(client.get(version_key("chat_history:b"))) == evicted_version + 1
+    assert memory.retrieve("chat_history:a") == ["xin chào"]
+    assert memory.retrieve("chat_history:c") == ["xin chào"]
+
+
+def test_sweeper_deletes_sessions_idle_past_the_ttl():
+    policy = SessionPolicy(idle_ttl_seconds=60, max_sessions=None)
+    memory, client = memory_with(policy)
+    memory.store("old", "cũ")
+    memory.store("new", "mới")
+    # Written without a TTL, e.g. by an older version of the app
+    client.expire("old", 3600)
+    client.zadd(ACCESS_INDEX_KEY, {"old": time.time() - 120})
+
+    stats = asyncio.run(SessionSweeper(client, policy).sweep())
+
+    assert stats["expired_sessions"] == 1
+    assert stats["live_sessions"] == 1
+    assert stats["bytes_held"] == len("mới".encode("utf-8"))
+    assert client.exists("old") == 0
+    assert client.exists("new") == 1
+
+
+def test_sweeper_works_with_the_asyncio_client():
+    backend = InProcessBackend()
+    policy = SessionPolicy(idle_ttl_seconds=None, max_sessions=1)
+    memory = ShortTermMemory(session_policy=policy, backend=backend)
+    memory.store("a", "một")
+    memory.store("b", "hai")
+
+    stats = asyncio.run(SessionSweeper(backend.async_client(), policy).sweep())
+
+    assert stats["evicted_sessions"] == 1
+    assert memory.retrieve("a") == []
+
+
+def test_sweeper_runs_sync_client_commands_in_the_io_pool():
+    backend = InProcessBackend()
+    policy = SessionPolicy(idle_ttl_seconds=60, max_sessions=1)
+    memory = ShortTermMemory(session_policy=policy, backend=backend)
+    memory.store("a", "một")
+    memory.store("b", "hai")
+
+    submitted = executor_stats()["io"]["submitted"]
+    asyncio.run(SessionSweeper(backend.client(), policy).sweep())
+    offloaded = executor_stats()["io"]["submitted"] - submitted
+
+    submitted = executor_stats()["io"]["submitted"]
+    asyncio.run(SessionSweeper(backend.async_client(), policy).sweep())
+
+    assert offloaded > 0
+    assert executor_stats()["io"]["submitted"] == submitted
+
+
+def test_policy_from_env_treats_zero_as_disabled(monkeypatch):
+    monkeypatch.setenv("SESSION_IDLE_TTL_SECONDS", "600")
+    monkeypatch.setenv("MAX_SESSION_BYTES", "0")
+
+    policy = SessionPolicy.from_env()
+
+    assert policy.idle_ttl_seconds == 600
+    assert policy.max_session_bytes is None
+    assert policy.max_sessions == 10000
+
+
+def test_memory_handler_applies_the_environment_policy_by_default(monkeypatch):
+    monkeypatch.setenv("SESSION_IDLE_TTL_SECONDS", "600")
+    backend = InProcessBackend()
+    handler = MessageMemoryHandler(backend=backend)
+
+    handler.session_manager.store("s", "xin chào")
+
+    client = backend.client()
+    assert 0 < client.ttl("s") <= 600
+    assert client.zscore(ACCESS_INDEX_KEY, "s") is not None
+    assert handler.session_sweeper.policy is handler.session_manager.session_policy
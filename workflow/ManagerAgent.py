@@ -1,23 +1,49 @@
 import os
-import json
+import re
+import time
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional
+from dataclasses import replace
 from datetime import datetime
 from enum import Enum
 
 import chainlit as cl
 from pydantic import BaseModel
 from pydantic_ai import Agent
-from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai.providers.google_gla import GoogleGLAProvider
 
 from data.cache.redis_cache import ShortTermMemory
-from llm.base import AgentClient
+from data.cache.async_redis_cache import AsyncShortTermMemory, maybe_await
+from data.cache.redis_pool import RedisPoolSettings, configure_redis_pool
+from data.cache.backends import create_backend
+from data.cache.history_cache import SessionHistoryCache
+from data.cache.history_window import HistoryWindow, configure_history_window
+from data.cache.message_codec import HistoryEntry, encode_message, decode_history
+from data.cache.rolling_summary import RollingSummarizer
+from data.cache.semantic_memory import SemanticMemory
+from data.cache.session_policy import SessionPolicy
+from data.cache.session_sweeper import SessionSweeper
+from data.cache.document_store import DocumentStore, find_references, make_reference
+from data.cache.answer_cache import AnswerCache, is_context_dependent
+from data.cache.semantic_cache import SemanticAnswerCache
+from llm.base import AgentClient, LLMClientSettings, configure_llm_client, get_model, stream_text
+from llm.rate_limiter import BACKGROUND, RateLimiterSettings, configure_rate_limiter, get_rate_limiter, llm_priority
 from workflow.specialists.QnAHandler import QnAHandlerAgent
 from workflow.specialists.SearchHandler import SearchHandlerAgent
 from workflow.specialists.CalendarHandler import CalendarHandlerAgent
 from workflow.specialists.TicketHandler import TicketHandlerAgent
+from workflow.specialists.replies import ErrorReply, is_error_reply
+from workflow.manager_config import ManagerAgentConfig
+from workflow.specialist_registry import SpecialistRegistry
+from workflow.admission import AdmissionController, AdmissionRejected, USER_LIMIT, deadline_paused
+from workflow.faq_fast_path import FAQFastPath
+from workflow.speculative_retrieval import Speculation, SpeculativeRetrieval
+from workflow.intent_classifier import LABELLED_EXAMPLES, LocalIntentClassifier, load_examples
 from utils.basetools import *
+from utils.keyword_matcher import KeywordMatcher
+from utils.executors import (
+    ExecutorSettings, configure_executors, executor_stats, io_saturated, offload_cpu, submit_io
+)
 
 
 class TaskType(Enum):
@@ -36,12 +62,98 @@ class TaskClassification(BaseModel):
     reasoning: str
 
 
-class ChatMessage(BaseModel):
-    """Model for chat messages."""
-    user_id: str
-    message: str
-    timestamp: datetime
-    message_type: str = "user"  # user, assistant, system
+class FirstTokenTimer:
+    """Token callback wrapper that records the time to the first streamed token and the text sent so far."""
+    
+    def __init__(self, on_token: Callable[[str], Awaitable[Any]]):
+        self.on_token = on_token
+        self.start = time.perf_counter()
+        self.seconds: Optional[float] = None
+        self.parts: List[str] = []
+    
+    def restart(self):
+        """Start timing from now (once the request is admitted)."""
+        self.start = time.perf_counter()
+    
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+    
+    async def __call__(self, token: str):
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self.start
+        self.parts.append(token)
+        await self.on_token(token)
+
+
+# Keyword heuristics for classify_task, matched in one pass per text.
+# Task types score both the message and the classifier response, the string
+# categories boost scores from the message, and ("response", task) decides
+# the final route from the classifier response.
+CLASSIFICATION_KEYWORDS = KeywordMatcher({
+    TaskType.QNA: [
+        'qna', 'faq', 'q&a', 'hỏi đáp',
+        'quy định', 'chính sách', 'luật', 'điều lệ',
+        'vnu', 'hcmut', 'trường', 'đại học',
+        'sinh viên', 'giáo dục', 'khoa học', 'lập trình', 'kỹ thuật',
+        'bài tập', 'giải thích', 'hướng dẫn',
+        'phương pháp', 'nghiên cứu', 'học thuật',
+        'kiến thức', 'giải bài', 'công thức'
+    ],
+    TaskType.SEARCH: [
+        'search', 'tìm kiếm', 'tìm', 'kiếm',
+        'web', 'internet', 'google', 'nghiên cứu',
+        'thông tin mới', 'cập nhật', 'tin tức',
+        'xu hướng', 'phát triển', 'công nghệ mới'
+    ],
+    TaskType.CALENDAR: [
+        'calendar', 'lịch', 'thời gian', 'ngày',
+        'lịch học', 'lịch thi', 'thời khóa biểu',
+        'sự kiện', 'cuộc họp', 'deadline',
+        'kế hoạch', 'ôn tập', 'lịch trình',
+        'học kỳ', 'kỳ thi', 'đăng ký',
+        'học tập', 'học', 'giảng', 'bài', 'môn', 'khóa', 'tín chỉ'
+    ],
+    TaskType.TICKET: [
+        'ticket', 'email', 'gửi', 'báo cáo',
+        'hỗ trợ', 'trợ giúp', 'vấn đề', 'lỗi',
+        'khiếu nại', 'phản ánh', 'yêu cầu',
+        'ban quản lý', 'phòng đào tạo', 'hệ thống'
+    ],
+    TaskType.GENERAL: [
+        'general', 'chung', 'thông thường',
+        'chào', 'xin chào', 'hello', 'hi',
+        'cảm ơn', 'thank', 'bye', 'tạm biệt',
+        'trò chuyện', 'chat', 'nói chuyện'
+    ],
+    "educational": ['học', 'giảng', 'bài', 'môn', 'khóa', 'tín chỉ'],
+    "regulation": ['quy định', 'chính sách', 'thủ tục', 'hồ sơ'],
+    "time": ['khi nào', 'bao giờ', 'thời gian', 'ngày nào'],
+    "problem": ['bị lỗi', 'không hoạt động', 'sự cố', 'báo cáo'],
+    ("response", TaskType.QNA): ['qna', 'faq', 'quy định', 'chính sách', 'vnu', 'hcmut', 'trường'],
+    ("response", TaskType.SEARCH): ['search', 'tìm kiếm', 'nghiên cứu'],
+    ("response", TaskType.CALENDAR): ['calendar', 'lịch', 'lịch học', 'lịch thi', 'sự kiện', 'thời khóa biểu', 'kế hoạch', 'ôn tập'],
+    ("response", TaskType.TICKET): ['ticket', 'email', 'hỗ trợ', 'báo cáo'],
+})
+
+
+# Follow-up messages that refer back to an earlier attachment
+DOCUMENT_FOLLOWUP_PATTERN = re.compile(
+    r"tài liệu|tệp|file|đính kèm|văn bản|báo cáo|nội dung (trên|này|đó)|document|pdf|docx|csv|excel",
+    re.IGNORECASE
+)
+
+
+def response_text(response) -> str:
+    """Text of a specialist result (agent run result or string); error replies keep their flag."""
+    if isinstance(response, str):
+        return response
+    return str(response.output) if hasattr(response, 'output') else str(response)
+
+
+# Chat history entries are slotted records encoded with msgpack; the old
+# pydantic name is kept for callers that construct messages directly.
+ChatMessage = HistoryEntry
 
 
 class ManagerAgent:
@@ -52,101 +164,252 @@ class ManagerAgent:
     
     def __init__(
         self,
-        redis_host: str = "localhost",
-        redis_port: int = 6379,
-        redis_db: int = 0,
-        max_chat_history: int = 20,
-        collection_name: str = "vnu_hcmut_faq"
+        redis_host: Optional[str] = None,
+        redis_port: Optional[int] = None,
+        redis_db: Optional[int] = None,
+        max_chat_history: Optional[int] = None,
+        collection_name: Optional[str] = None,
+        use_async_memory: bool = False,
+        config: Optional[ManagerAgentConfig] = None
     ):
         """
         Initialize the ManagerAgent.
         
         Args:
-            redis_host: Redis server host
-            redis_port: Redis server port
-            redis_db: Redis database number
-            max_chat_history: Maximum number of chat messages to store
-            collection_name: Milvus collection name for QnA
+            redis_host: Redis server host (None: REDIS_HOST)
+            redis_port: Redis server port (None: REDIS_PORT)
+            redis_db: Redis database number (None: REDIS_DB)
+            max_chat_history: Maximum number of chat messages to store (None: MAX_CHAT_HISTORY)
+            collection_name: Milvus collection name for QnA (None: MILVUS_COLLECTION)
+            use_async_memory: Use the redis.asyncio memory backend so history
+                reads and writes do not block the event loop
+            config: Full ManagerAgentConfig; when given, its Redis, history and
+                collection settings take precedence over the arguments above.
+                Without it the configuration is loaded from the environment
+                and the arguments above are applied on top.
         """
         # Setup logging first
         self.logger = logging.getLogger(__name__)
         
-        # Initialize Redis memory handler
-        self.memory = ShortTermMemory(
-            host=redis_host,
-            port=redis_port,
-            db=redis_db,
-            max_messages=max_chat_history
+        if config is None:
+            # Every other setting (rate limits, pools, timeouts) comes from the environment
+            overrides = {
+                "redis_host": redis_host,
+                "redis_port": redis_port,
+                "redis_db": redis_db,
+                "max_chat_history": max_chat_history,
+                "collection_name": collection_name,
+            }
+            config = replace(
+                ManagerAgentConfig.from_env(),
+                **{name: value for name, value in overrides.items() if value is not None}
+            )
+        self.config = config
+        
+        # All memory components in the process share one bounded Redis pool
+        pool_settings = RedisPoolSettings.from_config(self.config)
+        configure_redis_pool(pool_settings)
+        
+        # History sent to the LLM is bounded by tokens, not message count
+        self.history_window = HistoryWindow(
+            max_tokens=self.config.history_max_tokens,
+            max_message_tokens=self.config.history_max_message_tokens
         )
+        configure_history_window(self.history_window)
         
-        # Initialize LLM for task classification
-        provider = GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY"))
-        self.classification_model = GeminiModel('gemini-2.0-flash', provider=provider)
+        # Recent history is mirrored locally and revalidated with a version counter
+        self.history_cache = (
+            SessionHistoryCache(
+                max_sessions=self.config.history_cache_max_sessions,
+                max_idle_seconds=self.config.session_idle_ttl_seconds or None
+            )
+            if self.config.enable_history_cache
+            else None
+        )
+        # Idle TTL and byte quota per session; a sweeper caps the number of sessions
+        self.session_policy = SessionPolicy.from_config(self.config)
+        
+        # Initialize memory handler on the configured backend (Redis or in-process)
+        self.memory_backend = create_backend(self.config.memory_backend, pool_settings)
+        memory_class = AsyncShortTermMemory if use_async_memory else ShortTermMemory
+        self.memory = memory_class(
+            max_messages=self.config.max_chat_history,
+            history_cache=self.history_cache,
+            session_policy=self.session_policy,
+            backend=self.memory_backend
+        )
+        # Started on the first message so it runs on the serving event loop
+        self.session_sweeper = SessionSweeper(self.memory.redis_client, self.session_policy)
+        
+        # All agents share one model and a bounded keep-alive HTTP connection pool
+        configure_llm_client(LLMClientSettings.from_config(self.config))
+        # ... and one Gemini request/token budget, with interactive calls served first
+        configure_rate_limiter(RateLimiterSettings.from_config(self.config))
+        
+        # Blocking tool work runs in bounded I/O and CPU pools, off the event loop
+        configure_executors(ExecutorSettings.from_config(self.config))
+        self.classification_model = get_model(self.config.model_name)
+        
+        # Long sessions fold older turns into a summary in the background
+        self.summarizer = None
+        if self.config.enable_rolling_summary:
+            self._init_summary_agent()
+            self.summarizer = RollingSummarizer(
+                redis_client=self.memory.redis_client,
+                summarize=self._summarize_history,
+                format_entry=self._format_history_line,
+                window=self.history_window,
+                trigger_messages=self.config.summary_trigger_messages,
+                keep_recent=self.config.summary_keep_recent,
+                max_summary_tokens=self.config.summary_max_tokens,
+                ttl_seconds=self.session_policy.idle_ttl_seconds
+            )
         
-        # Initialize specialist agents
-        self.collection_name = collection_name
+        # Processed attachments are shared across users and referenced from history
+        self.document_store = DocumentStore(
+            self.memory.redis_client,
+            ttl_seconds=self.config.document_ttl_seconds or None
+        )
+        
+        # Optional recall of relevant older turns by embedding similarity
+        self.semantic_memory = None
+        if self.config.enable_semantic_memory:
+            from utils.basetools.faq_tool import embedding_engine
+            self.semantic_memory = SemanticMemory(
+                redis_client=self.memory.redis_client,
+                embedding_engine=embedding_engine,
+                max_turns=self.config.semantic_max_turns,
+                top_k=self.config.semantic_top_k,
+                min_score=self.config.semantic_min_score,
+                ttl_seconds=self.session_policy.idle_ttl_seconds
+            )
+        
+        # Embedding classifier that answers confident cases without the LLM
+        self.local_classifier = None
+        if self.config.enable_local_classifier:
+            from utils.basetools.faq_tool import embedding_engine
+            examples = {label: list(texts) for label, texts in LABELLED_EXAMPLES.items()}
+            if self.config.intent_examples_path:
+                for label, texts in load_examples(self.config.intent_examples_path).items():
+                    examples.setdefault(label, []).extend(texts)
+            self.local_classifier = LocalIntentClassifier(embedding_engine, examples)
         
-        # Setup collection first if needed
-        collection_ready = self.setup_collection()
-        if not collection_ready:
-            self.logger.warning("Collection setup failed, QnA functionality may not be available")
+        # Bounds requests in flight globally and per user; excess load is shed
+        self.admission = AdmissionController(
+            max_concurrent=self.config.max_concurrent_requests,
+            max_queue=self.config.max_queued_requests,
+            max_per_user=self.config.max_requests_per_user,
+            queue_timeout_seconds=self.config.queue_timeout_seconds,
+            request_timeout_seconds=self.config.response_timeout_seconds or None
+        )
+        
+        # Answers to stateless questions (FAQ, search) are reused across users
+        self.answer_cache = None
+        if self.config.enable_caching:
+            self.answer_cache = AnswerCache(
+                self.memory.redis_client,
+                self.config.collection_name,
+                tasks=(TaskType.QNA.value, TaskType.SEARCH.value),
+                ttl_seconds=self.config.answer_cache_ttl_seconds,
+                local_max_entries=self.config.answer_cache_local_entries
+            )
         
+        # Near-exact FAQ matches are answered from the curated answer, without the LLM
+        self.faq_fast_path = None
+        if self.config.enable_faq_fast_path:
+            self.faq_fast_path = FAQFastPath(
+                min_score=self.config.faq_fast_path_min_score,
+                min_margin=self.config.faq_fast_path_min_margin,
+                sample_rate=self.config.faq_fast_path_sample_rate
+            )
+        
+        # FAQ retrieval for QnA can start while the message is being classified
+        self.speculative_retrieval = SpeculativeRetrieval() if self.config.enable_speculative_retrieval else None
+        
+        # Specialist agents are built on first use (or by start_warmup), so
+        # startup does not wait for collection setup and agent construction
+        self.collection_name = self.config.collection_name
         self._init_specialists()
         
         # Initialize classification agent
         self._init_classification_agent()
         
+        # General-purpose agent for GENERAL messages and unavailable specialists
+        self._init_general_agent()
+    
     def _init_specialists(self):
-        """Initialize all specialist agents."""
-        try:
-            self.logger.info("Initializing specialist agents...")
-            
-            # Initialize agents with error handling for each
-            try:
-                # Check if collection exists before initializing QnA agent
-                from pymilvus import utility
-                if not utility.has_collection(self.collection_name):
-                    self.logger.warning(f"Collection '{self.collection_name}' does not exist. QnA agent will not be available.")
-                    self.qna_agent = None
-                else:
-                    self.qna_agent = QnAHandlerAgent(collection_name=self.collection_name)
-                    self.logger.info("QnA agent initialized successfully")
-            except Exception as e:
-                self.logger.warning(f"QnA agent initialization failed: {e}")
-                self.qna_agent = None
-            
-            try:
-                self.search_agent = SearchHandlerAgent()
-                self.logger.info("Search agent initialized successfully")
-            except Exception as e:
-                self.logger.warning(f"Search agent initialization failed: {e}")
-                self.search_agent = None
-            
-            try:
-                self.calendar_agent = CalendarHandlerAgent(collection_name=self.collection_name)
-                self.logger.info("Calendar agent initialized successfully")
-            except Exception as e:
-                self.logger.warning(f"Calendar agent initialization failed: {e}")
-                self.calendar_agent = None
-            
-            try:
-                self.ticket_agent = TicketHandlerAgent(collection_name=self.collection_name)
-                self.logger.info("Ticket agent initialized successfully")
-            except Exception as e:
-                self.logger.warning(f"Ticket agent initialization failed: {e}")
-                self.ticket_agent = None
-            
-            # Check if any agents were successfully initialized
-            active_agents = [agent for agent in [self.qna_agent, self.search_agent, self.calendar_agent, self.ticket_agent] if agent is not None]
-            if not active_agents:
-                self.logger.error("No specialist agents could be initialized")
-                raise RuntimeError("Failed to initialize any specialist agents")
-            else:
-                self.logger.info(f"Successfully initialized {len(active_agents)}/4 specialist agents")
-                
-        except Exception as e:
-            self.logger.error(f"Error in specialist initialization: {e}")
-            # Don't re-raise the exception, let the system continue with partial functionality
+        """Register the specialist agents; each is constructed on first use."""
+        self.specialists = SpecialistRegistry(
+            factories={
+                TaskType.QNA.value: self._create_qna_agent,
+                TaskType.SEARCH.value: SearchHandlerAgent,
+                TaskType.CALENDAR.value: lambda: CalendarHandlerAgent(collection_name=self.collection_name),
+                TaskType.TICKET.value: lambda: TicketHandlerAgent(collection_name=self.collection_name),
+            },
+            enabled={
+                TaskType.QNA.value: self.config.qna_enabled,
+                TaskType.SEARCH.value: self.config.search_enabled,
+                TaskType.CALENDAR.value: self.config.calendar_enabled,
+                TaskType.TICKET.value: self.config.ticket_enabled,
+            }
+        )
+    
+    def _create_qna_agent(self) -> QnAHandlerAgent:
+        """Set up the FAQ collection and build the QnA agent around the shared search agent."""
+        from pymilvus import utility
+        if not self.setup_collection() or not utility.has_collection(self.collection_name):
+            raise RuntimeError(f"Collection '{self.collection_name}' is not available")
+        return QnAHandlerAgent(
+            collection_name=self.collection_name,
+            search_handler=self.specialists.load(TaskType.SEARCH.value) or SearchHandlerAgent(),
+            ensure_collection=False,
+            answer_cache=self._create_semantic_cache(),
+            fast_path=self.faq_fast_path
+        )
+    
+    def _create_semantic_cache(self) -> Optional[SemanticAnswerCache]:
+        """Build the QnA semantic answer cache, if enabled."""
+        if not self.config.enable_semantic_cache:
+            return None
+        from utils.basetools.faq_tool import embedding_engine
+        return SemanticAnswerCache(
+            embedding_engine,
+            self.memory.redis_client,
+            self.collection_name,
+            path=self.config.semantic_cache_path,
+            threshold=self.config.semantic_cache_threshold,
+            ttl_seconds=self.config.semantic_cache_ttl_seconds,
+            max_entries=self.config.semantic_cache_max_entries
+        )
+    
+    def start_warmup(self):
+        """Build the specialists and the local classifier in the background."""
+        extra = [self.local_classifier.build] if self.local_classifier is not None else []
+        # Cheap agents first so most routes are ready while QnA indexes
+        self.specialists.start_warmup(
+            names=[TaskType.SEARCH.value, TaskType.CALENDAR.value, TaskType.TICKET.value, TaskType.QNA.value],
+            extra=extra
+        )
+    
+    def get_readiness(self) -> Dict[str, Any]:
+        """Readiness of the specialist agents (pending, loading, ready, unavailable, disabled)."""
+        return self.specialists.status()
+    
+    @property
+    def qna_agent(self) -> Optional[QnAHandlerAgent]:
+        return self.specialists.get(TaskType.QNA.value)
+    
+    @property
+    def search_agent(self) -> Optional[SearchHandlerAgent]:
+        return self.specialists.get(TaskType.SEARCH.value)
+    
+    @property
+    def calendar_agent(self) -> Optional[CalendarHandlerAgent]:
+        return self.specialists.get(TaskType.CALENDAR.value)
+    
+    @property
+    def ticket_agent(self) -> Optional[TicketHandlerAgent]:
+        return self.specialists.get(TaskType.TICKET.value)
     
     def _init_classification_agent(self):
         """Initialize the task classification agent."""
@@ -196,77 +459,264 @@ class ManagerAgent:
             tools=[]
         ).create_agent()
     
+    def _init_general_agent(self):
+        """Initialize the agent that answers general queries."""
+        general_prompt = """Bạn là trợ lý ảo thông minh và thân thiện của VNU-HCMUT. 
+        
+        KHẢ NĂNG HỖ TRỢ:
+        1. Các vấn đề về trường Đại học Bách Khoa - ĐHQG-HCM:
+           - Quy định, chính sách của trường (QnA)
+           - Tìm kiếm thông tin trên web
+           - Quản lý lịch học, lịch thi
+           - Gửi ticket hỗ trợ cho ban quản lý
+        
+        2. Các câu hỏi học tập tổng quát:
+           - Kiến thức toán học, khoa học, công nghệ
+           - Phương pháp học tập và nghiên cứu
+           - Hướng dẫn giải bài tập
+           - Giải thích khái niệm học thuật
+           - Lập trình và kỹ thuật
+        
+        NGUYÊN TẮC TRẢ LỜI:
+        - Ưu tiên trả lời các câu hỏi liên quan đến trường và học tập
+        - Từ chối lịch sự các chủ đề không phù hợp (giải trí, tin tức, ...)
+        - Trả lời ngắn gọn, chuẩn xác, rành mạch
+        - Văn phong trang trọng, phù hợp môi trường học đường
+        - Khuyến khích sinh viên đặt câu hỏi học thuật và về trường
+        """
+        
+        self.general_agent = AgentClient(
+            model=self.classification_model,
+            system_prompt=general_prompt,
+            tools=[]
+        ).create_agent()
+    
+    def _init_summary_agent(self):
+        """Initialize the agent that maintains rolling conversation summaries."""
+        summary_prompt = """
+        Bạn là trợ lý tóm tắt hội thoại. Hãy cập nhật bản tóm tắt hiện có bằng các tin nhắn mới.
+        
+        Yêu cầu:
+        - Giữ lại thông tin quan trọng: yêu cầu của người dùng, thông tin cá nhân đã cung cấp,
+          các quyết định, kết quả đã trả lời và các việc còn dang dở
+        - Bỏ qua lời chào hỏi và nội dung lặp lại
+        - Viết ngắn gọn bằng tiếng Việt, tối đa khoảng 150 từ
+        - Chỉ trả về nội dung bản tóm tắt
+        """
+        
+        self.summary_agent = AgentClient(
+            model=self.classification_model,
+            system_prompt=summary_prompt,
+            tools=[]
+        ).create_agent()
+    
+    async def _summarize_history(self, previous_summary: str, lines: List[str]) -> str:
+        """Fold new history lines into the previous summary."""
+        query = f"""
+        Bản tóm tắt hiện có:
+        {previous_summary or "(chưa có)"}
+        
+        Các tin nhắn mới cần bổ sung:
+        {chr(10).join(lines)}
+        """
+        # Summaries are not awaited by the user; they yield rate budget to chat turns
+        with llm_priority(BACKGROUND):
+            result = await self.summary_agent.run(query)
+        return str(result.output if hasattr(result, 'output') else result)
+    
     def _get_session_key(self, user_id: str) -> str:
         """Generate Redis session key for user."""
         return f"chat_history:{user_id}"
     
-    def _store_message(self, user_id: str, message: ChatMessage):
+    async def _store_message(self, user_id: str, message: ChatMessage):
         """Store a chat message in Redis."""
         try:
             session_key = self._get_session_key(user_id)
-            message_data = {
-                "user_id": message.user_id,
-                "message": message.message,
-                "timestamp": message.timestamp.isoformat(),
-                "message_type": message.message_type
-            }
-            self.memory.store(session_key, json.dumps(message_data))
+            await maybe_await(self.memory.store(session_key, encode_message(message)))
             self.logger.debug(f"Stored message for user {user_id}")
         except Exception as e:
             self.logger.error(f"Error storing message: {e}")
     
-    def _get_chat_history(self, user_id: str) -> List[ChatMessage]:
+    async def _get_chat_history(self, user_id: str) -> List[ChatMessage]:
         """Retrieve chat history for a user from Redis."""
         try:
             session_key = self._get_session_key(user_id)
-            messages_data = self.memory.retrieve(session_key)
-            
-            chat_history = []
-            for msg_json in reversed(messages_data):  # Reverse to get chronological order
-                try:
-                    msg_data = json.loads(msg_json)
-                    chat_history.append(ChatMessage(
-                        user_id=msg_data["user_id"],
-                        message=msg_data["message"],
-                        timestamp=datetime.fromisoformat(msg_data["timestamp"]),
-                        message_type=msg_data["message_type"]
-                    ))
-                except (json.JSONDecodeError, KeyError) as e:
-                    self.logger.warning(f"Error parsing message: {e}")
-                    continue
-            
-            return chat_history
+            raw_messages = await maybe_await(self.memory.retrieve_raw(session_key))
+            
+            # Handles both msgpack and legacy JSON entries, oldest first
+            return decode_history(raw_messages)
         except Exception as e:
             self.logger.error(f"Error retrieving chat history: {e}")
             return []
     
-    def _format_chat_history_for_context(self, chat_history: List[ChatMessage]) -> str:
-        """Format chat history for use as context in prompts."""
-        if not chat_history:
+    def _format_history_line(self, msg: ChatMessage) -> str:
+        """Format a single history entry as a prompt line."""
+        timestamp = msg.timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        role = "Người dùng" if msg.message_type == "user" else "Trợ lý"
+        return f"[{timestamp}] {role}: {msg.message}"
+    
+    def _format_chat_history_for_context(
+        self,
+        chat_history: List[ChatMessage],
+        summary: Optional[str] = None,
+        recalled: Optional[List[str]] = None
+    ) -> str:
+        """
+        Format chat history for use as context in prompts.
+        
+        Args:
+            chat_history: Recent messages, oldest first
+            summary: Rolling summary of turns older than `chat_history`
+            recalled: Older turns recalled by semantic memory, oldest first
+        """
+        if not chat_history and not summary and not recalled:
             return "Không có lịch sử trò chuyện."
         
-        context_lines = ["=== Lịch sử trò chuyện ==="]
-        for msg in chat_history[-10:]:  # Only use last 10 messages for context
-            timestamp = msg.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            role = "Người dùng" if msg.message_type == "user" else "Trợ lý"
-            context_lines.append(f"[{timestamp}] {role}: {msg.message}")
+        lines = [
+            self._format_history_line(msg)
+            for msg in chat_history[-self.config.max_context_messages:]
+        ]
+        
+        context_lines = []
+        budget = self.history_window.max_tokens
+        if summary:
+            context_lines.extend(["=== Tóm tắt hội thoại trước đó ===", summary])
+            budget = max(0, budget - self.history_window.count(summary))
+        if recalled:
+            recalled = [self.history_window.truncate(line) for line in recalled]
+            context_lines.append("=== Các trao đổi liên quan trước đó ===")
+            context_lines.extend(recalled)
+            budget = max(0, budget - sum(self.history_window.count(line) for line in recalled))
+        
+        # Keep the newest messages that fit the token budget, eliding oversized ones
+        recent, omitted = self.history_window.select(lines, budget)
+        context_lines.append("=== Lịch sử trò chuyện ===")
+        if omitted:
+            context_lines.append(f"[Đã lược bỏ {omitted} tin nhắn cũ hơn]")
+        context_lines.extend(recent)
         
         return "\n".join(context_lines)
     
-    async def classify_task(self, user_message: str, chat_history: List[ChatMessage]) -> TaskClassification:
+    async def _recall_related_turns(
+        self,
+        session_key: str,
+        current: ChatMessage,
+        recent: List[ChatMessage]
+    ) -> List[str]:
+        """Recall older turns related to the current message and remember the message itself."""
+        vector = await self.semantic_memory.embed(current.message)
+        
+        # Turns that are already in the recency window are not recalled again
+        visible = recent[-self.config.max_context_messages:]
+        before = visible[0].ts if visible else None
+        recalled = await self.semantic_memory.recall(session_key, vector, before=before)
+        
+        # The query embedding doubles as the stored embedding of this turn
+        await self.semantic_memory.add(session_key, current, vector)
+        return [self._format_history_line(entry) for _, entry in recalled]
+    
+    async def _build_history_context(
+        self,
+        user_id: str,
+        chat_history: List[ChatMessage],
+        current: Optional[ChatMessage] = None
+    ) -> Dict[str, Any]:
+        """
+        Build the history context shared by classification and routing.
+        
+        With rolling summaries enabled the context is the stored summary plus
+        the turns it does not cover yet, and a background summarization is
+        started when that tail gets too long. With semantic memory enabled,
+        older turns relevant to `current` are added as well.
+        
+        Returns:
+            Dictionary with the formatted context and the history tokens saved this turn
+        """
+        if self.summarizer is None and self.semantic_memory is None:
+            return {"context": self._format_chat_history_for_context(chat_history), "tokens_saved": 0}
+        
+        session_key = self._get_session_key(user_id)
+        summary = None
+        recent = chat_history
+        recalled = None
+        try:
+            if self.summarizer is not None:
+                summary = await self.summarizer.load(session_key)
+                recent = self.summarizer.pending(chat_history, summary)
+                self.summarizer.maybe_schedule(session_key, recent, summary)
+            
+            if self.semantic_memory is not None and current is not None:
+                recalled = await self._recall_related_turns(session_key, current, recent)
+        except Exception as e:
+            self.logger.error(f"Error building extended history context: {e}")
+            summary, recent, recalled = None, chat_history, None
+        
+        context = self._format_chat_history_for_context(
+            recent, summary.text if summary else None, recalled
+        )
+        tokens_saved = 0
+        if self.summarizer is not None:
+            raw_context = self._format_chat_history_for_context(chat_history)
+            tokens_saved = self.summarizer.record_turn(raw_context, context)
+        return {"context": context, "tokens_saved": tokens_saved}
+    
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """History memory metrics: live sessions, bytes held, evictions and cache hits."""
+        stats = {**self.session_sweeper.stats(), "quota_trims": self.memory.quota_trims}
+        if self.history_cache is not None:
+            stats["history_cache"] = self.history_cache.stats()
+        return stats
+    
+    def get_summary_stats(self) -> Dict[str, Any]:
+        """Rolling summary metrics (prompt tokens saved, summaries generated)."""
+        if self.summarizer is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.summarizer.stats()}
+    
+    def get_classifier_stats(self) -> Dict[str, Any]:
+        """Local classifier metrics (LLM calls skipped, latency saved)."""
+        if self.local_classifier is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.local_classifier.stats()}
+    
+    async def classify_task(
+        self,
+        user_message: str,
+        chat_history: List[ChatMessage],
+        history_context: Optional[str] = None
+    ) -> TaskClassification:
         """
         Classify the user's task based on their message and chat history.
         
         Args:
             user_message: The current user message
             chat_history: Previous chat messages for context
+            history_context: Pre-formatted chat history, to avoid re-formatting per call
+                ("" answers from the message alone)
             
         Returns:
             TaskClassification object with task type, confidence, and reasoning
         """
+        local_seconds = 0.0
+        # The local classifier ignores history, so follow-ups go straight to the LLM
+        if self.local_classifier is not None and self._is_stateless_message(user_message):
+            try:
+                prediction = await self.local_classifier.classify(user_message)
+                local_seconds = prediction.seconds
+                if prediction.confidence >= self.config.classification_confidence_threshold:
+                    self.local_classifier.record(used_llm=False, local_seconds=local_seconds)
+                    return TaskClassification(
+                        task_type=TaskType(prediction.label),
+                        confidence=prediction.confidence,
+                        reasoning=f"Phân loại cục bộ (độ tương đồng {prediction.similarity:.2f})"
+                    )
+            except Exception as e:
+                self.logger.warning(f"Local classification failed, using LLM: {e}")
+        
         try:
             # Prepare context with chat history
-            history_context = self._format_chat_history_for_context(chat_history)
+            if history_context is None:
+                history_context = self._format_chat_history_for_context(chat_history)
             
             classification_query = f"""
             Lịch sử trò chuyện:
@@ -278,106 +728,45 @@ class ManagerAgent:
             """
             
             # Get classification from agent
+            llm_start = time.perf_counter()
             response = await self.classification_agent.run(classification_query)
+            if self.local_classifier is not None:
+                self.local_classifier.record(
+                    used_llm=True,
+                    local_seconds=local_seconds,
+                    llm_seconds=time.perf_counter() - llm_start
+                )
             
             # Parse response to extract classification
             # This is a simplified parsing - in practice, you might want more robust parsing
             response_text = str(response.output if hasattr(response, 'output') else response).lower()
             
-            # More robust parsing with multiple criteria
-            task_scores = {
-                TaskType.QNA: 0,
-                TaskType.SEARCH: 0,
-                TaskType.CALENDAR: 0,
-                TaskType.TICKET: 0,
-                TaskType.GENERAL: 0
-            }
-            
-            # QNA keywords and patterns
-            qna_patterns = [
-                'qna', 'faq', 'q&a', 'hỏi đáp',
-                'quy định', 'chính sách', 'luật', 'điều lệ',
-                'vnu', 'hcmut', 'trường', 'đại học',
-                'sinh viên', 'giáo dục', 'khoa học', 'lập trình', 'kỹ thuật',
-                'bài tập', 'giải thích', 'hướng dẫn',
-                'phương pháp', 'nghiên cứu', 'học thuật',
-                'kiến thức', 'giải bài', 'công thức'
-            ]
-            
-            # SEARCH keywords
-            search_patterns = [
-                'search', 'tìm kiếm', 'tìm', 'kiếm',
-                'web', 'internet', 'google', 'nghiên cứu',
-                'thông tin mới', 'cập nhật', 'tin tức',
-                'xu hướng', 'phát triển', 'công nghệ mới'
-            ]
-            
-            # CALENDAR keywords
-            calendar_patterns = [
-                'calendar', 'lịch', 'thời gian', 'ngày',
-                'lịch học', 'lịch thi', 'thời khóa biểu',
-                'sự kiện', 'cuộc họp', 'deadline',
-                'kế hoạch', 'ôn tập', 'lịch trình',
-                'học kỳ', 'kỳ thi', 'đăng ký',
-                'học tập', 'học', 'giảng', 'bài', 'môn', 'khóa', 'tín chí'
-            ]
-            
-            # TICKET keywords
-            ticket_patterns = [
-                'ticket', 'email', 'gửi', 'báo cáo',
-                'hỗ trợ', 'trợ giúp', 'vấn đề', 'lỗi',
-                'khiếu nại', 'phản ánh', 'yêu cầu',
-                'ban quản lý', 'phòng đào tạo', 'hệ thống'
-            ]
-            
-            # GENERAL keywords
-            general_patterns = [
-                'general', 'chung', 'thông thường',
-                'chào', 'xin chào', 'hello', 'hi',
-                'cảm ơn', 'thank', 'bye', 'tạm biệt',
-                'trò chuyện', 'chat', 'nói chuyện'
-            ]
+            # More robust parsing with multiple criteria: one keyword scan of
+            # the message and one of the response
+            message_hits = CLASSIFICATION_KEYWORDS.match(user_message)
+            response_hits = CLASSIFICATION_KEYWORDS.match(response_text)
             
             # Count matches for each category
-            for pattern in qna_patterns:
-                if pattern in response_text or pattern in user_message.lower():
-                    task_scores[TaskType.QNA] += 1
-            
-            for pattern in search_patterns:
-                if pattern in response_text or pattern in user_message.lower():
-                    task_scores[TaskType.SEARCH] += 1
-            
-            for pattern in calendar_patterns:
-                if pattern in response_text or pattern in user_message.lower():
-                    task_scores[TaskType.CALENDAR] += 1
-            
-            for pattern in ticket_patterns:
-                if pattern in response_text or pattern in user_message.lower():
-                    task_scores[TaskType.TICKET] += 1
-            
-            for pattern in general_patterns:
-                if pattern in response_text or pattern in user_message.lower():
-                    task_scores[TaskType.GENERAL] += 1
+            task_scores = {
+                task: len(message_hits.get(task, set()) | response_hits.get(task, set()))
+                for task in TaskType
+            }
             
             # Additional context-based scoring
             # Educational content gets CALENDAR boost (moved from QNA)
-            educational_keywords = ['học', 'giảng', 'bài', 'môn', 'khóa', 'tín chí']
-            if any(keyword in user_message.lower() for keyword in educational_keywords):
+            if message_hits.get("educational"):
                 task_scores[TaskType.CALENDAR] += 3
             
             # Questions about regulations/policies get QNA boost
-            regulation_keywords = ['quy định', 'chính sách', 'thủ tục', 'hồ sơ']
-            if any(keyword in user_message.lower() for keyword in regulation_keywords):
+            if message_hits.get("regulation"):
                 task_scores[TaskType.QNA] += 3
             
             # Time-related queries get CALENDAR boost
-            time_keywords = ['khi nào', 'bao giờ', 'thời gian', 'ngày nào']
-            if any(keyword in user_message.lower() for keyword in time_keywords):
+            if message_hits.get("time"):
                 task_scores[TaskType.CALENDAR] += 2
             
             # Problem/issue reports get TICKET boost
-            problem_keywords = ['bị lỗi', 'không hoạt động', 'sự cố', 'báo cáo']
-            if any(keyword in user_message.lower() for keyword in problem_keywords):
+            if message_hits.get("problem"):
                 task_scores[TaskType.TICKET] += 3
             
             # Determine best match
@@ -399,18 +788,11 @@ class ManagerAgent:
             task_type = best_task
             
             # Determine task type based on keywords in response
-            if any(keyword in response_text for keyword in ['qna', 'faq', 'quy định', 'chính sách', 'vnu', 'hcmut', 'trường']):
-                task_type = TaskType.QNA
-                confidence = 0.8
-            elif any(keyword in response_text for keyword in ['search', 'tìm kiếm', 'nghiên cứu']):
-                task_type = TaskType.SEARCH
-                confidence = 0.8
-            elif any(keyword in response_text for keyword in ['calendar', 'lịch', 'lịch học', 'lịch thi', 'sự kiện', 'thời khóa biểu', 'kế hoạch', 'ôn tập']):
-                task_type = TaskType.CALENDAR
-                confidence = 0.8
-            elif any(keyword in response_text for keyword in ['ticket', 'email', 'hỗ trợ', 'báo cáo']):
-                task_type = TaskType.TICKET
-                confidence = 0.8
+            for task in (TaskType.QNA, TaskType.SEARCH, TaskType.CALENDAR, TaskType.TICKET):
+                if response_hits.get(("response", task)):
+                    task_type = task
+                    confidence = 0.8
+                    break
             else:
                 task_type = TaskType.GENERAL
                 confidence = 0.6
@@ -434,7 +816,10 @@ class ManagerAgent:
         self,
         task_type: TaskType,
         user_message: str,
-        chat_history: List[ChatMessage]
+        chat_history: List[ChatMessage],
+        history_context: Optional[str] = None,
+        on_token: Optional[Callable[[str], Awaitable[Any]]] = None,
+        prefetched: Optional[asyncio.Future] = None
     ) -> str:
         """
         Route the user's query to the appropriate specialist agent.
@@ -443,80 +828,86 @@ class ManagerAgent:
             task_type: The classified task type
             user_message: The user's message
             chat_history: Chat history for context
+            history_context: Pre-formatted chat history, to avoid re-formatting per call
+            on_token: When given, the answer is streamed and each text delta is
+                passed to it as it is generated
+            prefetched: Speculative FAQ retrieval for the message, handed to QnA
             
         Returns:
-            Response from the specialist agent
+            Response from the specialist agent (the full text when streamed)
         """
         try:
             # Add chat history context to the query
-            history_context = self._format_chat_history_for_context(chat_history)
-            enhanced_query = f"{history_context}\n\nCâu hỏi hiện tại: {user_message}"
+            if history_context is None:
+                history_context = self._format_chat_history_for_context(chat_history)
+            enhanced_query = f"Câu hỏi hiện tại: {user_message}"
+            if history_context:
+                enhanced_query = f"{history_context}\n\n{enhanced_query}"
             
-            if task_type == TaskType.QNA and self.qna_agent is not None:
-                response = await self.qna_agent.run(enhanced_query)
-                return str(response.output) if hasattr(response, 'output') else str(response)
+            # Built on first use; None when disabled or failed to initialize
+            specialist = None
+            if task_type != TaskType.GENERAL:
+                # A cold start is paid once per process, not by this request's deadline
+                async with deadline_paused():
+                    specialist = await self.specialists.aget(task_type.value)
             
-            elif task_type == TaskType.SEARCH and self.search_agent is not None:
-                response = await self.search_agent.run(enhanced_query)
-                return str(response)  # SearchHandler returns a string directly
+            # Only QnA takes a speculative retrieval
+            kwargs = {"prefetched": prefetched} if task_type == TaskType.QNA and prefetched is not None else {}
             
-            elif task_type == TaskType.CALENDAR and self.calendar_agent is not None:
-                response = await self.calendar_agent.run(enhanced_query)
-                return str(response.output) if hasattr(response, 'output') else str(response)
+            if on_token is not None and specialist is not None:
+                return await self._forward_stream(specialist.run_stream(enhanced_query, **kwargs), on_token)
             
-            elif task_type == TaskType.TICKET and self.ticket_agent is not None:
-                response = await self.ticket_agent.run(enhanced_query)
-                return str(response.output) if hasattr(response, 'output') else str(response)
+            if task_type == TaskType.QNA and specialist is not None:
+                response = await specialist.run(enhanced_query, **kwargs)
+                return response_text(response)
+            
+            elif task_type == TaskType.SEARCH and specialist is not None:
+                response = await specialist.run(enhanced_query)
+                return response_text(response)  # SearchHandler returns a string directly
+            
+            elif task_type in (TaskType.CALENDAR, TaskType.TICKET) and specialist is not None:
+                response = await specialist.run(enhanced_query)
+                return response_text(response)
             
             else:  # GENERAL or fallback when specialist agent is unavailable
                 agent_name = task_type.value if task_type != TaskType.GENERAL else "general"
                 if task_type != TaskType.GENERAL:
                     self.logger.warning(f"{agent_name} agent is not available, falling back to general handler")
-                return await self._handle_general_query(user_message, chat_history)
+                return await self._handle_general_query(user_message, chat_history, history_context, on_token)
                 
         except Exception as e:
             self.logger.error(f"Error routing to specialist: {e}")
-            return f"Xin lỗi, đã có lỗi xảy ra khi xử lý yêu cầu của bạn: {e}"
+            return ErrorReply(f"Xin lỗi, đã có lỗi xảy ra khi xử lý yêu cầu của bạn: {e}")
     
-    async def _handle_general_query(self, user_message: str, chat_history: List[ChatMessage]) -> str:
+    async def _forward_stream(self, deltas: AsyncIterator[str], on_token: Callable[[str], Awaitable[Any]]) -> str:
+        """Pass streamed text deltas to a callback and return the full text (an ErrorReply if one was streamed)."""
+        parts = []
+        failed = False
+        async for delta in deltas:
+            if delta:
+                parts.append(delta)
+                failed = failed or is_error_reply(delta)
+                await on_token(delta)
+        text = "".join(parts)
+        return ErrorReply(text) if failed else text
+    
+    async def _handle_general_query(
+        self,
+        user_message: str,
+        chat_history: List[ChatMessage],
+        history_context: Optional[str] = None,
+        on_token: Optional[Callable[[str], Awaitable[Any]]] = None
+    ) -> str:
         """Handle general queries that don't fit into specific categories."""
         try:
-            # Create a general response agent
-            provider = GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY"))
-            model = GeminiModel('gemini-2.0-flash', provider=provider)
-            
-            general_agent = AgentClient(
-                model=model,
-                system_prompt="""Bạn là trợ lý ảo thông minh và thân thiện của VNU-HCMUT. 
-                
-                KHẢ NĂNG HỖ TRỢ:
-                1. Các vấn đề về trường Đại học Bách Khoa - ĐHQG-HCM:
-                   - Quy định, chính sách của trường (QnA)
-                   - Tìm kiếm thông tin trên web
-                   - Quản lý lịch học, lịch thi
-                   - Gửi ticket hỗ trợ cho ban quản lý
-                
-                2. Các câu hỏi học tập tổng quát:
-                   - Kiến thức toán học, khoa học, công nghệ
-                   - Phương pháp học tập và nghiên cứu
-                   - Hướng dẫn giải bài tập
-                   - Giải thích khái niệm học thuật
-                   - Lập trình và kỹ thuật
-                
-                NGUYÊN TẮC TRẢ LỜI:
-                - Ưu tiên trả lời các câu hỏi liên quan đến trường và học tập
-                - Từ chối lịch sự các chủ đề không phù hợp (giải trí, tin tức, ...)
-                - Trả lời ngắn gọn, chuẩn xác, rành mạch
-                - Văn phong trang trọng, phù hợp môi trường học đường
-                - Khuyến khích sinh viên đặt câu hỏi học thuật và về trường
-                """,
-                tools=[]
-            ).create_agent()
-            
-            history_context = self._format_chat_history_for_context(chat_history)
+            if history_context is None:
+                history_context = self._format_chat_history_for_context(chat_history)
             enhanced_query = f"{history_context}\n\nTin nhắn: {user_message}"
             
-            response = await general_agent.run(enhanced_query)
+            if on_token is not None:
+                return await self._forward_stream(stream_text(self.general_agent, enhanced_query), on_token)
+            
+            response = await self.general_agent.run(enhanced_query)
             return str(response.output) if hasattr(response, 'output') else str(response)
             
         except Exception as e:
@@ -539,72 +930,318 @@ class ManagerAgent:
             # Process the document using the universal tool
             document_result = process_document_tool(file_path, extract_text_from_images=True)
             
-            if not document_result.success:
-                return f"❌ Không thể xử lý tài liệu: {document_result.error_message}"
-            
-            # Generate formatted summary
-            content_summary = extract_content_summary(document_result)
-            
-            self.logger.info(f"Successfully processed document: {file_path}")
-            return content_summary
+            return self._summarize_document(file_path, document_result)
             
         except Exception as e:
             self.logger.error(f"Error processing document {file_path}: {e}")
             return f"❌ Lỗi xử lý tài liệu: {str(e)}"
     
-    async def process_message_with_document(self, user_id: str, user_message: str, document_path: Optional[str] = None) -> Dict[str, Any]:
+    async def aprocess_document(self, file_path: str) -> str:
+        """Async process_document: parsing and OCR run in the CPU pool."""
+        try:
+            self.logger.info(f"Processing document: {file_path}")
+            document_result = await offload_cpu(process_document_tool, file_path, True)
+            return self._summarize_document(file_path, document_result)
+        except Exception as e:
+            self.logger.error(f"Error processing document {file_path}: {e}")
+            return f"❌ Lỗi xử lý tài liệu: {str(e)}"
+    
+    def _summarize_document(self, file_path: str, document_result) -> str:
+        """Format a processed document, or an error line if processing failed."""
+        if not document_result.success:
+            return f"❌ Không thể xử lý tài liệu: {document_result.error_message}"
+        
+        # Generate formatted summary
+        content_summary = extract_content_summary(document_result)
+        
+        self.logger.info(f"Successfully processed document: {file_path}")
+        return content_summary
+    
+    def _attach_document(self, user_message: str, document_content: str) -> str:
+        """Append document content to a message for the current turn's prompts."""
+        return f"""
+{user_message}
+
+=== TÀI LIỆU ĐÍNH KÈM ===
+{document_content}
+
+Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài liệu đính kèm ở trên.
+"""
+    
+    async def _expand_document_reference(self, user_message: str, chat_history: List[ChatMessage]) -> str:
+        """
+        Expand the most recent document reference in history if the message refers to a document.
+        
+        Args:
+            user_message: The current user message
+            chat_history: Chat history including the current message as its last entry
+            
+        Returns:
+            The message, with the referenced document content attached when needed
+        """
+        if not DOCUMENT_FOLLOWUP_PATTERN.search(user_message):
+            return user_message
+        
+        for msg in reversed(chat_history[:-1]):
+            references = find_references(msg.message)
+            if not references:
+                continue
+            _, digest = references[-1]
+            try:
+                content = await self.document_store.get(digest)
+            except Exception as e:
+                self.logger.error(f"Error loading referenced document: {e}")
+                content = None
+            if content:
+                return self._attach_document(user_message, content)
+            break
+        
+        return user_message
+    
+    async def _admit(self, user_id: str, handler, streamed: Optional[FirstTokenTimer] = None) -> Dict[str, Any]:
+        """
+        Run a request under admission control, answering shed or expired requests directly.
+        
+        An expired request keeps whatever part of its answer was already
+        streamed, and the reply is stored so the user message is not left unanswered.
+        """
+        start_time = datetime.now()
+        try:
+            return await self.admission.run(user_id, handler)
+        except AdmissionRejected as e:
+            if e.reason == USER_LIMIT:
+                response = "⏳ Yêu cầu trước của bạn vẫn đang được xử lý. Vui lòng đợi phản hồi rồi gửi tiếp."
+            else:
+                response = "⚠️ Hệ thống đang quá tải. Vui lòng thử lại sau ít phút."
+            reasoning = f"Rejected by admission control: {e.reason}"
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Request for {user_id} exceeded {self.config.response_timeout_seconds}s and was cancelled")
+            partial = streamed.text if streamed is not None else ""
+            if partial:
+                response = f"{partial}\n\n⏱️ Câu trả lời chưa hoàn tất vì xử lý quá lâu. Vui lòng thử lại hoặc đặt câu hỏi ngắn gọn hơn."
+            else:
+                response = "⏱️ Yêu cầu xử lý quá lâu và đã bị hủy. Vui lòng thử lại hoặc đặt câu hỏi ngắn gọn hơn."
+            reasoning = "Request deadline exceeded"
+            try:
+                await self._store_message(user_id, ChatMessage(
+                    user_id=user_id,
+                    message=response,
+                    timestamp=datetime.now(),
+                    message_type="assistant"
+                ))
+            except Exception as e:
+                self.logger.error(f"Error storing timeout reply: {e}")
+        
+        return {
+            "response": response,
+            "classification": {
+                "task_type": "error",
+                "confidence": 0.0,
+                "reasoning": reasoning
+            },
+            "metadata": {
+                "user_id": user_id,
+                "timestamp": start_time.isoformat(),
+                "processing_time_seconds": (datetime.now() - start_time).total_seconds(),
+                "error": True,
+                "rejected": True
+            }
+        }
+    
+    def get_admission_stats(self) -> Dict[str, Any]:
+        """Admission metrics: requests active and queued, rejections and timeouts."""
+        return self.admission.stats()
+    
+    def get_answer_cache_stats(self) -> Dict[str, Any]:
+        """Answer cache metrics (local and shared hits, misses, invalidations), exact and semantic."""
+        stats = {"enabled": False}
+        if self.answer_cache is not None:
+            stats = {"enabled": True, **self.answer_cache.stats()}
+        qna_agent = self.specialists.get(TaskType.QNA.value)
+        if qna_agent is not None and qna_agent.answer_cache is not None:
+            stats["semantic"] = qna_agent.answer_cache.stats()
+        return stats
+    
+    def get_fast_path_stats(self) -> Dict[str, Any]:
+        """FAQ fast path metrics (share of QnA turns answered without the LLM, samples kept)."""
+        if self.faq_fast_path is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.faq_fast_path.stats()}
+    
+    def get_llm_rate_stats(self) -> Dict[str, Any]:
+        """Gemini rate limiter metrics: calls and wait time per priority, 429s, retries, budget left."""
+        return get_rate_limiter().stats()
+    
+    def get_executor_stats(self) -> Dict[str, Any]:
+        """Offload pool metrics (calls in flight and queued, failures, latency) for the I/O and CPU pools."""
+        return executor_stats()
+    
+    def get_speculation_stats(self) -> Dict[str, Any]:
+        """Speculative retrieval metrics: wall-clock seconds saved or wasted per route."""
+        if self.speculative_retrieval is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.speculative_retrieval.stats()}
+    
+    def _start_speculation(self, user_message: str) -> Optional[Speculation]:
+        """Start the FAQ retrieval QnA would do for a message, before it is classified."""
+        if self.speculative_retrieval is None:
+            return None
+        # Follow-ups and attachment questions are not answered from a bare FAQ search
+        if is_context_dependent(user_message) or DOCUMENT_FOLLOWUP_PATTERN.search(user_message):
+            return None
+        # Never build the QnA agent just to speculate
+        qna_agent = self.specialists.get(TaskType.QNA.value)
+        if qna_agent is None:
+            return None
+        # A discarded search keeps its worker until it returns; never queue behind real work
+        if io_saturated():
+            self.speculative_retrieval.skip()
+            return None
+        return self.speculative_retrieval.start(lambda: submit_io(qna_agent.retrieve, user_message))
+    
+    def _settle_speculation(self, speculation: Optional[Speculation], task_type: TaskType) -> Optional[asyncio.Future]:
+        """Hand the speculative retrieval to QnA if it won the route, cancel it otherwise."""
+        if speculation is None:
+            return None
+        return self.speculative_retrieval.resolve(speculation, task_type.value, use=task_type == TaskType.QNA)
+    
+    def _is_stateless_message(self, user_message: str) -> bool:
+        """Whether a message can be answered without the conversation around it."""
+        return not is_context_dependent(user_message) and not DOCUMENT_FOLLOWUP_PATTERN.search(user_message)
+    
+    def _is_cacheable_message(self, user_message: str) -> bool:
+        """Whether the answer to a message may go to the exact-match answer cache."""
+        return self.answer_cache is not None and self._is_stateless_message(user_message)
+    
+    def _answers_shared(self, task_type: TaskType, user_message: str) -> bool:
+        """
+        Whether the answer to this turn may be served to other users from a cache.
+        
+        Such answers are generated from the bare question: one student's earlier
+        turns (major, name, documents) must not shape an answer replayed to others.
+        """
+        if task_type not in (TaskType.QNA, TaskType.SEARCH):
+            return False
+        semantic = task_type == TaskType.QNA and self.config.enable_semantic_cache
+        return (self.answer_cache is not None or semantic) and self._is_stateless_message(user_message)
+    
+    async def _lookup_answer(self, user_message: str) -> Optional[tuple]:
+        """Return a cached (task type, answer) for a message, or None."""
+        if not self._is_cacheable_message(user_message):
+            return None
+        try:
+            return await self.answer_cache.get(user_message)
+        except Exception as e:
+            self.logger.warning(f"Answer cache lookup failed: {e}")
+            return None
+    
+    async def _remember_answer(self, user_message: str, task_type: TaskType, response: str):
+        """Cache an answer produced by the FAQ or search specialist."""
+        if not self._is_cacheable_message(user_message):
+            return
+        # Fallbacks to the general agent use history, and errors must not stick
+        if self.specialists.get(task_type.value) is None or is_error_reply(response):
+            return
+        try:
+            await self.answer_cache.put(user_message, task_type.value, response)
+        except Exception as e:
+            self.logger.warning(f"Answer cache store failed: {e}")
+    
+    async def process_message_with_document(
+        self,
+        user_id: str,
+        user_message: str,
+        document_path: Optional[str] = None,
+        on_token: Optional[Callable[[str], Awaitable[Any]]] = None
+    ) -> Dict[str, Any]:
         """
         Process user message with optional document attachment.
         
+        Requests go through admission control: they may wait for a slot, be
+        rejected under load, or be cancelled at the response deadline.
+        
         Args:
             user_id: Unique identifier for the user
             user_message: The user's message
             document_path: Optional path to attached document
+            on_token: Optional callback receiving the answer text as it is generated
             
         Returns:
             Dictionary containing response and metadata
         """
+        first_token = FirstTokenTimer(on_token) if on_token is not None else None
+        return await self._admit(
+            user_id,
+            lambda: self._process_message_with_document(user_id, user_message, document_path, first_token),
+            first_token
+        )
+    
+    async def _process_message_with_document(
+        self,
+        user_id: str,
+        user_message: str,
+        document_path: Optional[str] = None,
+        first_token: Optional[FirstTokenTimer] = None
+    ) -> Dict[str, Any]:
         start_time = datetime.now()
+        if first_token is not None:
+            first_token.restart()
+        self.session_sweeper.start()
+        if self.config.warm_up_specialists:
+            self.start_warmup()
         
         try:
-            # Process document if provided
+            # Process document if provided; content is stored once per file hash
             document_content = ""
+            document_reference = ""
+            document_reused = False
             if document_path and os.path.exists(document_path):
-                document_content = self.process_document(document_path)
+                document_name = os.path.basename(document_path)
+                digest, document_content, document_reused = await self.document_store.get_or_process(
+                    document_path,
+                    document_name,
+                    self.aprocess_document,
+                    is_error=lambda content: content.startswith("❌")
+                )
+                if not document_content.startswith("❌"):
+                    document_reference = make_reference(document_name, digest)
                 self.logger.info(f"Document processed for user {user_id}: {document_path}")
             
-            # Enhance user message with document content if available
+            # The current turn sees the full content; history only keeps the reference
             enhanced_message = user_message
+            stored_message = user_message
             if document_content:
-                enhanced_message = f"""
-{user_message}
-
-=== TÀI LIỆU ĐÍNH KÈM ===
-{document_content}
-
-Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài liệu đính kèm ở trên.
-"""
+                enhanced_message = self._attach_document(user_message, document_content)
+                stored_message = (
+                    f"{user_message}\n\n{document_reference}" if document_reference else enhanced_message
+                )
             
-            # Store enhanced user message
+            # Store user message
             user_msg = ChatMessage(
                 user_id=user_id,
-                message=enhanced_message,
+                message=stored_message,
                 timestamp=start_time,
                 message_type="user"
             )
-            self._store_message(user_id, user_msg)
+            await self._store_message(user_id, user_msg)
             
             # Get chat history
-            chat_history = self._get_chat_history(user_id)
+            chat_history = await self._get_chat_history(user_id)
+            
+            # Format history once and share it between classification and routing
+            history = await self._build_history_context(user_id, chat_history, user_msg)
+            history_context = history["context"]
             
             # Classify the task (using enhanced message)
-            classification = await self.classify_task(enhanced_message, chat_history)
+            classification = await self.classify_task(enhanced_message, chat_history, history_context)
             
             # Route to appropriate specialist
             response = await self.route_to_specialist(
                 classification.task_type,
                 enhanced_message,
-                chat_history
+                chat_history,
+                history_context,
+                on_token=first_token
             )
             
             # Store assistant response
@@ -614,7 +1251,9 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                 timestamp=datetime.now(),
                 message_type="assistant"
             )
-            self._store_message(user_id, assistant_msg)
+            await self._store_message(user_id, assistant_msg)
+            if self.semantic_memory is not None:
+                self.semantic_memory.add_in_background(self._get_session_key(user_id), assistant_msg)
             
             processing_time = (datetime.now() - start_time).total_seconds()
             
@@ -630,7 +1269,11 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                     "timestamp": start_time.isoformat(),
                     "processing_time_seconds": processing_time,
                     "chat_history_length": len(chat_history),
+                    "history_tokens_saved": history["tokens_saved"],
+                    "streamed": first_token is not None and first_token.seconds is not None,
+                    "time_to_first_token_seconds": first_token.seconds if first_token is not None else None,
                     "document_processed": document_path is not None and os.path.exists(document_path) if document_path else False,
+                    "document_reused": document_reused,
                     "document_path": document_path if document_path else None
                 }
             }
@@ -647,7 +1290,7 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                     timestamp=datetime.now(),
                     message_type="assistant"
                 )
-                self._store_message(user_id, error_msg)
+                await self._store_message(user_id, error_msg)
             except:
                 pass
             
@@ -667,18 +1310,43 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                 }
             }
 
-    async def process_message(self, user_id: str, user_message: str) -> Dict[str, Any]:
+    async def process_message(
+        self,
+        user_id: str,
+        user_message: str,
+        on_token: Optional[Callable[[str], Awaitable[Any]]] = None
+    ) -> Dict[str, Any]:
         """
         Main method to process user messages.
         
+        Requests go through admission control: they may wait for a slot, be
+        rejected under load, or be cancelled at the response deadline.
+        
         Args:
             user_id: Unique identifier for the user
             user_message: The user's message
+            on_token: Optional callback receiving the answer text as it is
+                generated; the full text is stored in history once it completes
             
         Returns:
             Dictionary containing response and metadata
         """
+        first_token = FirstTokenTimer(on_token) if on_token is not None else None
+        return await self._admit(user_id, lambda: self._process_message(user_id, user_message, first_token), first_token)
+    
+    async def _process_message(
+        self,
+        user_id: str,
+        user_message: str,
+        first_token: Optional[FirstTokenTimer] = None
+    ) -> Dict[str, Any]:
         start_time = datetime.now()
+        if first_token is not None:
+            first_token.restart()
+        speculation = None
+        self.session_sweeper.start()
+        if self.config.warm_up_specialists:
+            self.start_warmup()
         
         try:
             # Store user message
@@ -688,21 +1356,45 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                 timestamp=start_time,
                 message_type="user"
             )
-            self._store_message(user_id, user_msg)
+            await self._store_message(user_id, user_msg)
+            
+            # A repeated stateless question skips classification, retrieval and generation
+            cached = await self._lookup_answer(user_message)
+            if cached is not None:
+                return await self._answer_from_cache(user_id, start_time, cached, first_token)
+            
+            # FAQ retrieval runs alongside history loading and classification
+            speculation = self._start_speculation(user_message)
             
             # Get chat history
-            chat_history = self._get_chat_history(user_id)
+            chat_history = await self._get_chat_history(user_id)
+            
+            # Format history once and share it between classification and routing
+            history = await self._build_history_context(user_id, chat_history, user_msg)
+            history_context = history["context"]
+            
+            # Bring back an earlier attachment only when this turn refers to it
+            query_message = await self._expand_document_reference(user_message, chat_history)
             
             # Classify the task
-            classification = await self.classify_task(user_message, chat_history)
+            classification = await self.classify_task(query_message, chat_history, history_context)
+            prefetched = self._settle_speculation(speculation, classification.task_type)
+            speculation = None
             
-            # Route to appropriate specialist
+            # Route to appropriate specialist; shared answers see no history
+            shared = self._answers_shared(classification.task_type, user_message)
             response = await self.route_to_specialist(
                 classification.task_type,
-                user_message,
-                chat_history
+                query_message,
+                chat_history,
+                "" if shared else history_context,
+                on_token=first_token,
+                prefetched=prefetched
             )
             
+            if shared:
+                await self._remember_answer(user_message, classification.task_type, response)
+            
             # Store assistant response
             assistant_msg = ChatMessage(
                 user_id=user_id,
@@ -710,7 +1402,9 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                 timestamp=datetime.now(),
                 message_type="assistant"
             )
-            self._store_message(user_id, assistant_msg)
+            await self._store_message(user_id, assistant_msg)
+            if self.semantic_memory is not None:
+                self.semantic_memory.add_in_background(self._get_session_key(user_id), assistant_msg)
             
             processing_time = (datetime.now() - start_time).total_seconds()
             
@@ -725,13 +1419,19 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                     "user_id": user_id,
                     "timestamp": start_time.isoformat(),
                     "processing_time_seconds": processing_time,
-                    "chat_history_length": len(chat_history)
+                    "chat_history_length": len(chat_history),
+                    "history_tokens_saved": history["tokens_saved"],
+                    "answer_cache_hit": False,
+                    "streamed": first_token is not None and first_token.seconds is not None,
+                    "time_to_first_token_seconds": first_token.seconds if first_token is not None else None
                 }
             }
             
         except Exception as e:
             self.logger.error(f"Error processing message: {e}")
             error_response = f"Xin lỗi, đã có lỗi xảy ra: {e}"
+            if speculation is not None:
+                speculation.task.cancel()
             
             # Still try to store error response
             try:
@@ -741,7 +1441,7 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                     timestamp=datetime.now(),
                     message_type="assistant"
                 )
-                self._store_message(user_id, error_msg)
+                await self._store_message(user_id, error_msg)
             except:
                 pass
             
@@ -760,10 +1460,49 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
                 }
             }
     
-    def get_user_stats(self, user_id: str) -> Dict[str, Any]:
+    async def _answer_from_cache(
+        self,
+        user_id: str,
+        start_time: datetime,
+        cached: tuple,
+        first_token: Optional[FirstTokenTimer] = None
+    ) -> Dict[str, Any]:
+        """Answer a turn with a cached response and record it in history."""
+        task_type, response = cached
+        if first_token is not None:
+            await first_token(response)
+        
+        assistant_msg = ChatMessage(
+            user_id=user_id,
+            message=response,
+            timestamp=datetime.now(),
+            message_type="assistant"
+        )
+        await self._store_message(user_id, assistant_msg)
+        if self.semantic_memory is not None:
+            self.semantic_memory.add_in_background(self._get_session_key(user_id), assistant_msg)
+        
+        return {
+            "response": response,
+            "classification": {
+                "task_type": task_type,
+                "confidence": 1.0,
+                "reasoning": "Câu trả lời đã lưu cho câu hỏi trùng lặp"
+            },
+            "metadata": {
+                "user_id": user_id,
+                "timestamp": start_time.isoformat(),
+                "processing_time_seconds": (datetime.now() - start_time).total_seconds(),
+                "answer_cache_hit": True,
+                "streamed": first_token is not None,
+                "time_to_first_token_seconds": first_token.seconds if first_token is not None else None
+            }
+        }
+    
+    async def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Get statistics for a user's chat history."""
         try:
-            chat_history = self._get_chat_history(user_id)
+            chat_history = await self._get_chat_history(user_id)
             
             if not chat_history:
                 return {
@@ -791,11 +1530,15 @@ Hãy phân tích và trả lời dựa trên cả tin nhắn và nội dung tài
             self.logger.error(f"Error getting user stats: {e}")
             return {"error": str(e)}
     
-    def clear_user_history(self, user_id: str) -> bool:
+    async def clear_user_history(self, user_id: str) -> bool:
         """Clear chat history for a specific user."""
         try:
             session_key = self._get_session_key(user_id)
-            self.memory.redis_client.delete(session_key)
+            await maybe_await(self.memory.delete(session_key))
+            if self.summarizer is not None:
+                await self.summarizer.clear(session_key)
+            if self.semantic_memory is not None:
+                await self.semantic_memory.clear(session_key)
             self.logger.info(f"Cleared chat history for user {user_id}")
             return True
         except Exception as e:
@@ -0,0 +1,192 @@
+"""
+Admission control for ManagerAgent requests.
+
+Every message fans out into LLM, Milvus and Redis calls, so the number of
+requests processed at once is bounded:
+
+- a global limit on requests in flight (a semaphore);
+- a per-user limit on requests in flight or waiting;
+- a bounded wait queue: when it is full, or a request waits too long, the
+  request is shed immediately instead of piling up;
+- a hard deadline per request that cancels all of its pending awaits. One-off
+  work a request happens to pay for, such as building a specialist agent on
+  first use, runs under `deadline_paused` and does not count against it.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Rejection reasons
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+USER_LIMIT = "user_limit"
+
+# Deadline of the request being processed in the current task
+_deadline: ContextVar[Optional[asyncio.Timeout]] = ContextVar("request_deadline", default=None)
+
+
+@asynccontextmanager
+async def deadline_paused() -> AsyncIterator[None]:
+    """Stop the current request's deadline clock for the duration of the block."""
+    scope = _deadline.get()
+    if scope is None or scope.when() is None:
+        yield
+        return
+    loop = asyncio.get_running_loop()
+    remaining = scope.when() - loop.time()
+    scope.reschedule(None)
+    try:
+        yield
+    finally:
+        scope.reschedule(loop.time() + remaining)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of being processed."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    """Bounds concurrent requests globally and per user, with a bounded wait queue."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 10,
+        max_queue: int = 50,
+        max_per_user: int = 2,
+        queue_timeout_seconds: float = 10.0,
+        request_timeout_seconds: Optional[float] = 30.0,
+    ):
+        """
+        Args:
+            max_concurrent: Requests processed at the same time
+            max_queue: Requests allowed to wait for a slot; more are rejected
+            max_per_user: Requests one user may have processing or waiting
+            queue_timeout_seconds: Longest wait for a slot before the request is rejected
+            request_timeout_seconds: Deadline for processing an admitted request (None: no deadline)
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.request_timeout_seconds = request_timeout_seconds
+
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._per_user: Dict[str, int] = defaultdict(int)
+        self._active = 0
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "admitted": 0,
+            "completed": 0,
+            "timed_out": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "rejected_user_limit": 0,
+            "max_queue_depth": 0,
+            "queue_wait_seconds": 0.0,
+        }
+
+    def _reject(self, reason: str):
+        self._stats[f"rejected_{reason}"] += 1
+        logger.warning(f"Request rejected: {reason} (active={self._active}, waiting={self._waiting})")
+        raise AdmissionRejected(reason)
+
+    async def _acquire(self, user_id: str):
+        """Take a processing slot for a user, waiting in the queue if needed."""
+        with self._lock:
+            if self._per_user[user_id] >= self.max_per_user:
+                self._reject(USER_LIMIT)
+            self._per_user[user_id] += 1
+
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending, so the check cannot go stale
+            await self._semaphore.acquire()
+        else:
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._release_user(user_id)
+                    self._reject(QUEUE_FULL)
+                self._waiting += 1
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._waiting)
+
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._release_user(user_id)
+                    self._reject(QUEUE_TIMEOUT)
+            except BaseException:
+                with self._lock:
+                    self._release_user(user_id)
+                raise
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+                    self._stats["queue_wait_seconds"] += time.perf_counter() - start
+
+        with self._lock:
+            self._active += 1
+            self._stats["admitted"] += 1
+
+    def _release_user(self, user_id: str):
+        self._per_user[user_id] -= 1
+        if self._per_user[user_id] <= 0:
+            del self._per_user[user_id]
+
+    def _release(self, user_id: str):
+        self._semaphore.release()
+        with self._lock:
+            self._active -= 1
+            self._release_user(user_id)
+
+    async def run(self, user_id: str, handler: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a request handler under admission control.
+
+        Raises:
+            AdmissionRejected: The request was shed before processing
+            asyncio.TimeoutError: Processing exceeded the request deadline; the
+                handler's pending awaits have been cancelled
+        """
+        await self._acquire(user_id)
+        try:
+            async with asyncio.timeout(self.request_timeout_seconds) as scope:
+                token = _deadline.set(scope)
+                try:
+                    result = await handler()
+                finally:
+                    _deadline.reset(token)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timed_out"] += 1
+            raise
+        finally:
+            self._release(user_id)
+        with self._lock:
+            self._stats["completed"] += 1
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """Requests processing and queued now, plus admission and rejection counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = self._active
+            stats["queue_depth"] = self._waiting
+            stats["users_in_flight"] = len(self._per_user)
+        stats["rejected"] = (
+            stats["rejected_queue_full"] + stats["rejected_queue_timeout"] + stats["rejected_user_limit"]
+        )
+        return stats
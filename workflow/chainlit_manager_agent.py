@@ -10,6 +10,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from workflow.ManagerAgent import ManagerAgent
+import time
 import uuid
 from dotenv import load_dotenv
 from typing import Union
@@ -34,15 +35,21 @@ async def start():
                 author="System"
             ).send()
             
+            init_start = time.perf_counter()
             manager = ManagerAgent(
                 redis_host="localhost",
                 redis_port=6379,
                 redis_db=0,
                 max_chat_history=20,
-                collection_name="vnu_hcmut_faq"
+                collection_name="vnu_hcmut_faq",
+                use_async_memory=True
             )
+            init_ms = (time.perf_counter() - init_start) * 1000
+            
+            # Specialists load in the background; messages are served meanwhile
+            manager.start_warmup()
             await cl.Message(
-                content="🤖 ManagerAgent VNU-HCMUT đã được khởi tạo thành công!\n\n"
+                content=f"🤖 ManagerAgent VNU-HCMUT đã được khởi tạo thành công ({init_ms:.0f} ms)!\n\n"
                        "Tôi có thể giúp sinh viên VNU-HCMUT:\n"
                        "• Trả lời câu hỏi về quy định, chính sách của trường\n"
                        "• Tìm kiếm thông tin trên web\n"
@@ -50,8 +57,11 @@ async def start():
                        "• Gửi ticket hỗ trợ cho ban quản lý\n"
                        "• Xử lý tài liệu (CSV, PDF, DOCX, JPG, PNG)\n"
                        "• Trò chuyện thông thường\n\n"
-                       "Hãy gửi tin nhắn hoặc upload file để bắt đầu!",
-                author="System"
+                       "Hãy gửi tin nhắn hoặc upload file để bắt đầu!\n\n"
+                       "⏳ Các chuyên gia đang được khởi động trong nền; "
+                       "yêu cầu gửi trước khi sẵn sàng sẽ chờ chuyên gia tương ứng.",
+                author="System",
+                actions=[cl.Action(name="show_status", payload={}, label="Trạng thái")]
             ).send()
         except Exception as e:
             error_msg = f"❌ Lỗi khởi tạo ManagerAgent: {e}\n\n"
@@ -99,7 +109,7 @@ async def start():
     # Show user stats if available
     try:
         if isinstance(manager, ManagerAgent):
-            stats = manager.get_user_stats(user_id)
+            stats = await manager.get_user_stats(user_id)
             if stats.get("total_messages", 0) > 0:
                 await cl.Message(
                     content=f"📊 Lịch sử chat: {stats['total_messages']} tin nhắn\n"
@@ -150,6 +160,9 @@ async def main(message: cl.Message):
     if document_path:
         step_name = "📄 Đang xử lý tài liệu và tin nhắn..."
         
+    # Created outside the step so the streamed answer is a top-level message
+    response_msg = cl.Message(content="", author="Assistant")
+    
     async with cl.Step(name=step_name) as step:
         try:
             # Check manager type and process message
@@ -157,10 +170,13 @@ async def main(message: cl.Message):
                 raise Exception("ManagerAgent not properly initialized")
                 
             # Process message with optional document
+            # Tokens are shown as they are generated
             if document_path:
-                result = await manager.process_message_with_document(user_id, user_message, document_path)
+                result = await manager.process_message_with_document(
+                    user_id, user_message, document_path, on_token=response_msg.stream_token
+                )
             else:
-                result = await manager.process_message(user_id, user_message)
+                result = await manager.process_message(user_id, user_message, on_token=response_msg.stream_token)
             
             # Update step with classification info
             step.name = f"✅ Phân loại: {result['classification']['task_type'].upper()}"
@@ -169,8 +185,12 @@ async def main(message: cl.Message):
                 f"**Task Type**: {result['classification']['task_type']}\n"
                 f"**Confidence**: {result['classification']['confidence']:.2f}\n"
                 f"**Processing Time**: {result['metadata']['processing_time_seconds']:.2f}s\n"
-                f"**Chat History**: {result['metadata']['chat_history_length']} messages"
+                f"**Chat History**: {result['metadata'].get('chat_history_length', 0)} messages"
             )
+            if result['metadata'].get('answer_cache_hit'):
+                step_output += "\n**Answer Cache**: ✅ hit"
+            if result['metadata'].get('time_to_first_token_seconds') is not None:
+                step_output += f"\n**Time to First Token**: {result['metadata']['time_to_first_token_seconds']:.2f}s"
             
             # Add document processing info if applicable
             if document_path and result['metadata'].get('document_processed'):
@@ -205,11 +225,9 @@ async def main(message: cl.Message):
             ).send()
             return
     
-    # Send the response
-    await cl.Message(
-        content=result["response"],
-        author="Assistant"
-    ).send()
+    # Ends the stream (if tokens were streamed) with the text stored in history
+    response_msg.content = result["response"]
+    await response_msg.send()
     
     # Optionally show classification details in debug mode
     if os.getenv("DEBUG_MODE", "false").lower() == "true":
@@ -253,7 +271,7 @@ async def clear_history(action):
     user_id = cl.user_session.get("user_id") or "anonymous"
     
     try:
-        success = manager.clear_user_history(user_id)
+        success = await manager.clear_user_history(user_id)
         if success:
             await cl.Message(
                 content="🗑️ Đã xóa lịch sử chat thành công!",
@@ -286,7 +304,7 @@ async def show_stats(action):
     user_id = cl.user_session.get("user_id") or "anonymous"
     
     try:
-        stats = manager.get_user_stats(user_id)
+        stats = await manager.get_user_stats(user_id)
         
         stats_message = (
             f"📊 **Thống kê Chat**\n\n"
@@ -309,6 +327,96 @@ async def show_stats(action):
         ).send()
 
 
+STATE_LABELS = {
+    "pending": "⏸️ Chưa khởi động",
+    "loading": "⏳ Đang khởi động",
+    "ready": "✅ Sẵn sàng",
+    "unavailable": "❌ Không khả dụng",
+    "disabled": "🚫 Đã tắt",
+}
+
+
+@cl.action_callback("show_status")
+async def show_status(action):
+    """Show specialist readiness and request load."""
+    global manager
+    
+    if not isinstance(manager, ManagerAgent):
+        await cl.Message(
+            content="❌ ManagerAgent không khả dụng",
+            author="System"
+        ).send()
+        return
+    
+    readiness = manager.get_readiness()
+    lines = []
+    for name, info in readiness["specialists"].items():
+        line = f"• {name.upper()}: {STATE_LABELS.get(info['state'], info['state'])}"
+        if info["load_seconds"] is not None:
+            line += f" ({info['load_seconds']:.1f}s)"
+        if info["error"]:
+            line += f" - {info['error']}"
+        lines.append(line)
+    
+    admission = manager.get_admission_stats()
+    lines.append(
+        f"\n• Đang xử lý: {admission['active']} | Hàng đợi: {admission['queue_depth']} | "
+        f"Từ chối: {admission['rejected']} | Quá hạn: {admission['timed_out']}"
+    )
+    
+    pools = manager.get_executor_stats()
+    lines.append(
+        " | ".join(
+            f"• Luồng {name.upper()}: {pool['in_flight']}/{pool['workers']} đang chạy, "
+            f"{pool['queued']} chờ, TB {pool['avg_seconds']:.2f}s"
+            for name, pool in pools.items()
+        )
+    )
+    
+    rate = manager.get_llm_rate_stats()
+    lines.append(
+        f"• Hạn mức Gemini: còn {rate['requests_available']} yêu cầu, {rate['waiting']} chờ, "
+        f"chờ lâu nhất {rate['max_wait_seconds']:.1f}s, 429: {rate['rate_limited']}"
+    )
+    
+    answer_cache = manager.get_answer_cache_stats()
+    if answer_cache["enabled"]:
+        lines.append(
+            f"• Bộ nhớ đệm câu trả lời: {answer_cache['hit_rate']:.0%} trúng "
+            f"({answer_cache['local_hits'] + answer_cache['shared_hits']} lần)"
+        )
+    if "semantic" in answer_cache:
+        semantic = answer_cache["semantic"]
+        lines.append(
+            f"• Bộ nhớ đệm ngữ nghĩa: {semantic['hit_rate']:.0%} trúng "
+            f"({semantic['hits']} lần, {semantic['entries']} câu hỏi)"
+        )
+    
+    fast_path = manager.get_fast_path_stats()
+    if fast_path["enabled"]:
+        lines.append(
+            f"• Trả lời trực tiếp từ FAQ: {fast_path['fast_path_rate']:.0%} "
+            f"({fast_path['fast_path']}/{fast_path['turns']} lượt, {fast_path['sampled']} lượt đối chiếu)"
+        )
+    
+    speculation = manager.get_speculation_stats()
+    if speculation["enabled"]:
+        per_route = ", ".join(
+            f"{route.upper()} +{stats['seconds_saved']:.1f}s/-{stats['seconds_wasted']:.1f}s"
+            for route, stats in speculation["routes"].items()
+        )
+        lines.append(
+            f"• Truy xuất song song: tiết kiệm {speculation['seconds_saved']:.1f}s, "
+            f"lãng phí {speculation['seconds_wasted']:.1f}s" + (f" ({per_route})" if per_route else "")
+        )
+    
+    header = "✅ Tất cả chuyên gia đã sẵn sàng" if readiness["ready"] else "⏳ Đang khởi động chuyên gia"
+    await cl.Message(
+        content=f"🩺 **Trạng thái hệ thống**\n\n{header}\n\n" + "\n".join(lines),
+        author="System"
+    ).send()
+
+
 if __name__ == "__main__":
     print("Starting Chainlit app with ManagerAgent...")
     print("Make sure Redis is running and GEMINI_API_KEY is set!")
@@ -0,0 +1,141 @@
+"""
+FAQ fast path for QnAHandlerAgent.
+
+Retrieval runs before the LLM. When the top hybrid_search hit scores at least
+`min_score` and leads the runner-up by at least `min_margin`, the question is
+taken to be a near-exact match of a curated FAQ entry and its answer is
+returned directly, lightly templated with the matched question, without a
+Gemini call.
+
+A sampling rate sends a fraction of fast-path-eligible turns through the LLM
+anyway; the curated and generated answers are kept side by side (and logged)
+so the thresholds can be calibrated against the LLM's output. The default
+thresholds are not calibrated yet, which is why the fast path is off unless
+enabled in config.
+
+Only hits ranked by the WeightedRanker are considered: when hybrid_search falls
+back to a plain vector search its scores are L2 distances, where higher means
+a worse match, and such a turn always goes to the LLM.
+"""
+
+import logging
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Ranker tag of hybrid_search hits whose score is a similarity
+# (data.milvus.milvus_client.RANKER_WEIGHTED; not imported to keep pymilvus out)
+WEIGHTED_RANKER = "weighted"
+
+ANSWER_TEMPLATE = """{answer}
+
+📚 *Trả lời từ FAQ của trường cho câu hỏi: "{question}"*"""
+
+
+@dataclass
+class FastPathMatch:
+    """Top FAQ hit that cleared the fast-path thresholds."""
+
+    question: str
+    answer: str
+    score: float
+    margin: float
+
+
+class FAQFastPath:
+    """Decides when a curated FAQ answer can be returned without the LLM."""
+
+    def __init__(
+        self,
+        min_score: float = 0.85,
+        min_margin: float = 0.1,
+        sample_rate: float = 0.0,
+        max_samples: int = 200,
+    ):
+        """
+        Args:
+            min_score: Minimum hybrid_search score of the top hit
+            min_margin: Minimum score lead of the top hit over the runner-up
+            sample_rate: Fraction of eligible turns still answered by the LLM for comparison
+            max_samples: Number of recent comparisons kept in memory
+        """
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.sample_rate = sample_rate
+
+        self._samples: Deque[Dict[str, Any]] = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self._stats = {"turns": 0, "fast_path": 0, "sampled": 0, "llm": 0}
+
+    def select(self, results: List[Dict[str, Any]]) -> Optional[FastPathMatch]:
+        """Return the top hit if it clears the score and margin thresholds."""
+        if any(hit.get("ranker") != WEIGHTED_RANKER for hit in results):
+            return None
+        hits = sorted(
+            (hit for hit in results if hit.get("Answer")),
+            key=lambda hit: hit.get("score", 0.0),
+            reverse=True,
+        )
+        if not hits:
+            return None
+        top = hits[0]
+        # The same FAQ entry can be returned more than once; compare against a different one
+        runner_up = next((hit for hit in hits[1:] if hit.get("Question") != top.get("Question")), None)
+        score = top.get("score", 0.0)
+        margin = score - (runner_up.get("score", 0.0) if runner_up else 0.0)
+        if score < self.min_score or margin < self.min_margin:
+            return None
+        return FastPathMatch(question=top.get("Question") or "", answer=top["Answer"], score=score, margin=margin)
+
+    def should_sample(self) -> bool:
+        """Whether an eligible turn should go to the LLM for quality comparison."""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def render(self, match: FastPathMatch) -> str:
+        return ANSWER_TEMPLATE.format(answer=match.answer.strip(), question=match.question.strip())
+
+    def record(self, fast_path: bool, sampled: bool = False):
+        """Record how a turn was answered."""
+        with self._lock:
+            self._stats["turns"] += 1
+            if fast_path:
+                self._stats["fast_path"] += 1
+            else:
+                self._stats["llm"] += 1
+                if sampled:
+                    self._stats["sampled"] += 1
+
+    def record_sample(self, query: str, match: FastPathMatch, llm_answer: str):
+        """Keep a curated answer next to the LLM answer it would have replaced."""
+        sample = {
+            "query": query,
+            "faq_question": match.question,
+            "score": match.score,
+            "margin": match.margin,
+            "faq_answer": match.answer,
+            "llm_answer": llm_answer,
+        }
+        with self._lock:
+            self._samples.append(sample)
+        logger.info(
+            f"FAQ fast path sample (score={match.score:.3f}, margin={match.margin:.3f}): "
+            f"'{query}' ~ '{match.question}'"
+        )
+
+    def samples(self) -> List[Dict[str, Any]]:
+        """Recent fast-path/LLM comparisons, oldest first."""
+        with self._lock:
+            return list(self._samples)
+
+    def stats(self) -> Dict[str, float]:
+        """Fast-path rate over QnA turns that reached retrieval, plus sampling counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["samples_kept"] = len(self._samples)
+        turns = stats["turns"]
+        stats["fast_path_rate"] = stats["fast_path"] / turns if turns else 0.0
+        return stats
@@ -0,0 +1,207 @@
+"""
+Local intent classifier for ManagerAgent.
+
+Each task type is represented by the centroid of the sentence embeddings of a
+set of labelled example messages. A message is classified by cosine similarity
+to the centroids; the softmax over those similarities is the confidence. When
+it clears the configured threshold the LLM classification call is skipped
+entirely, otherwise ManagerAgent falls back to the LLM. The classifier only
+sees the message, so follow-ups that depend on the conversation always go to
+the LLM. It is off by default: the embedding model is English-centric and the
+confidence threshold has not been calibrated on Vietnamese traffic yet.
+
+Extra labelled examples can be supplied as a JSON file mapping task type
+values ("qna", "search", "calendar", "ticket", "general") to lists of messages.
+"""
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.executors import offload_io
+
+logger = logging.getLogger(__name__)
+
+LABELLED_EXAMPLES: Dict[str, List[str]] = {
+    "qna": [
+        "Quy định về đăng ký học phần của trường như thế nào?",
+        "Điều kiện để được xét học bổng khuyến khích học tập là gì?",
+        "Sinh viên cần bao nhiêu tín chỉ để tốt nghiệp?",
+        "Thủ tục bảo lưu kết quả học tập gồm những hồ sơ gì?",
+        "Học phí một tín chỉ của chương trình chuẩn là bao nhiêu?",
+        "Làm thế nào để giải phương trình bậc 2?",
+        "Tính đạo hàm của hàm số sin(x)",
+        "Giải thích thuật toán sắp xếp nhanh",
+        "Sự khác nhau giữa TCP và UDP là gì?",
+        "Chính sách rút môn học sau thời hạn ra sao?",
+        "Phương pháp học tốt môn giải tích 1 là gì?",
+        "Điểm rèn luyện được tính như thế nào?",
+    ],
+    "search": [
+        "Tìm kiếm thông tin về AI mới nhất",
+        "Tìm giúp mình các bài báo về mô hình ngôn ngữ lớn năm nay",
+        "Tin tức công nghệ mới nhất tuần này là gì?",
+        "Tra cứu trên web xu hướng phát triển của xe điện",
+        "Tìm tài liệu tham khảo về học máy trên internet",
+        "Có thông tin cập nhật nào về cuộc thi lập trình ACM ICPC không?",
+        "Search Google giúp mình về blockchain",
+        "Nghiên cứu các công ty công nghệ đang tuyển thực tập sinh",
+    ],
+    "calendar": [
+        "Lịch thi cuối kỳ khi nào?",
+        "Lên kế hoạch ôn tập cho kỳ thi giữa kỳ",
+        "Viết code để import lịch học vào Google Calendar",
+        "Làm thế nào để setup Google Calendar API?",
+        "Tạo script backup lịch học hàng tuần",
+        "Tạo file CSV thời khóa biểu học kỳ này",
+        "Nhắc mình deadline nộp bài tập lớn vào thứ sáu",
+        "Sắp xếp lịch học nhóm vào cuối tuần",
+        "Thời khóa biểu tuần sau của mình có những môn nào?",
+        "Lập lịch trình ôn thi cho 3 môn trong 2 tuần",
+    ],
+    "ticket": [
+        "Hệ thống LMS bị lỗi, cần hỗ trợ",
+        "Gửi email cho phòng đào tạo về việc sai điểm",
+        "Mình không đăng nhập được vào cổng thông tin sinh viên",
+        "Báo cáo sự cố wifi ở thư viện không hoạt động",
+        "Tạo ticket yêu cầu cấp lại thẻ sinh viên",
+        "Khiếu nại về việc bị tính học phí sai",
+        "Phản ánh với ban quản lý ký túc xá về tình trạng mất nước",
+        "Trang đăng ký môn học báo lỗi không lưu được",
+    ],
+    "general": [
+        "Chào bạn, hôm nay thế nào?",
+        "Xin chào",
+        "Cảm ơn bạn nhiều nhé",
+        "Tạm biệt, hẹn gặp lại",
+        "Bạn là ai vậy?",
+        "Kể cho mình một câu chuyện vui đi",
+        "Hôm nay trời đẹp quá",
+        "Bạn có thể làm được những gì?",
+    ],
+}
+
+
+def load_examples(path: str) -> Dict[str, List[str]]:
+    """Load labelled examples from a JSON file ({task type: [messages]})."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return {label: [str(text) for text in texts] for label, texts in data.items()}
+
+
+@dataclass
+class LocalPrediction:
+    """Result of the local classifier for one message."""
+
+    label: str
+    confidence: float
+    similarity: float
+    seconds: float
+
+
+class LocalIntentClassifier:
+    """Nearest-centroid intent classifier over sentence embeddings."""
+
+    def __init__(
+        self,
+        embedding_engine,
+        examples: Optional[Dict[str, List[str]]] = None,
+        temperature: float = 0.05,
+        min_similarity: float = 0.3,
+    ):
+        """
+        Args:
+            embedding_engine: EmbeddingEngine whose model encodes messages
+            examples: Labelled examples per task type value (default: LABELLED_EXAMPLES)
+            temperature: Softmax temperature turning similarities into a confidence
+            min_similarity: Messages less similar than this to every centroid get confidence 0
+        """
+        self.embedding_engine = embedding_engine
+        self.examples = examples or LABELLED_EXAMPLES
+        self.temperature = temperature
+        self.min_similarity = min_similarity
+
+        self.labels: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+        self._build_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "messages": 0,
+            "local": 0,
+            "llm": 0,
+            "local_seconds": 0.0,
+            "llm_seconds": 0.0,
+        }
+
+    def build(self):
+        """Embed the examples and compute one normalized centroid per label."""
+        with self._build_lock:
+            if self.centroids is not None:
+                return
+            labels, centroids = [], []
+            for label, texts in self.examples.items():
+                if not texts:
+                    continue
+                vectors = self.embedding_engine.model.encode(texts, normalize_embeddings=True)
+                centroid = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+                centroids.append(centroid / np.linalg.norm(centroid))
+                labels.append(label)
+            self.labels = labels
+            self.centroids = np.stack(centroids)
+            logger.info(f"Built intent centroids for {len(labels)} task types")
+
+    def predict(self, message: str) -> LocalPrediction:
+        """Classify a message (blocking; embeds it with the model)."""
+        start = time.perf_counter()
+        if self.centroids is None:
+            self.build()
+
+        vector = self.embedding_engine.model.encode(message, normalize_embeddings=True)
+        similarities = self.centroids @ np.asarray(vector, dtype=np.float32)
+        best = int(np.argmax(similarities))
+
+        if similarities[best] < self.min_similarity:
+            confidence = 0.0
+        else:
+            logits = (similarities - similarities[best]) / self.temperature
+            confidence = float(1.0 / np.exp(logits).sum())
+
+        return LocalPrediction(
+            label=self.labels[best],
+            confidence=confidence,
+            similarity=float(similarities[best]),
+            seconds=time.perf_counter() - start,
+        )
+
+    async def classify(self, message: str) -> LocalPrediction:
+        """Classify a message off the event loop."""
+        return await offload_io(self.predict, message)
+
+    def record(self, used_llm: bool, local_seconds: float, llm_seconds: float = 0.0):
+        """Record whether a message needed the LLM and how long each stage took."""
+        with self._stats_lock:
+            self._stats["messages"] += 1
+            self._stats["local_seconds"] += local_seconds
+            if used_llm:
+                self._stats["llm"] += 1
+                self._stats["llm_seconds"] += llm_seconds
+            else:
+                self._stats["local"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Skip rate and estimated latency saved (skipped calls x mean LLM latency)."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        messages = stats["messages"]
+        avg_llm = stats["llm_seconds"] / stats["llm"] if stats["llm"] else 0.0
+        avg_local = stats["local_seconds"] / messages if messages else 0.0
+        stats["skip_rate"] = stats["local"] / messages if messages else 0.0
+        stats["avg_llm_seconds"] = avg_llm
+        stats["avg_local_seconds"] = avg_local
+        stats["estimated_seconds_saved"] = stats["local"] * avg_llm - stats["local_seconds"]
+        return stats
@@ -11,12 +11,27 @@ from typing import Optional
 class ManagerAgentConfig:
     """Configuration for ManagerAgent."""
     
+    # Memory Configuration ("redis" or "memory" for the in-process backend)
+    memory_backend: str = "redis"
+    
     # Redis Configuration
     redis_host: str = "localhost"
     redis_port: int = 6379
     redis_db: int = 0
     redis_password: Optional[str] = None
+    redis_max_connections: int = 50
+    redis_socket_timeout: float = 5.0
+    redis_socket_connect_timeout: float = 5.0
+    redis_health_check_interval: int = 30
+    redis_ssl: bool = False
     max_chat_history: int = 20
+    enable_history_cache: bool = True
+    history_cache_max_sessions: int = 1024
+    session_idle_ttl_seconds: int = 7 * 24 * 3600  # 0 disables expiry
+    max_session_bytes: int = 256 * 1024  # 0 disables the per-session quota
+    max_sessions: int = 10000  # 0 disables global eviction
+    session_sweep_interval_seconds: float = 300.0
+    document_ttl_seconds: int = 30 * 24 * 3600  # 0 keeps processed documents forever
     
     # Milvus Configuration
     collection_name: str = "academic_support_qa"
@@ -26,17 +41,39 @@ class ManagerAgentConfig:
     # AI Model Configuration
     gemini_api_key: Optional[str] = None
     model_name: str = "gemini-2.0-flash"
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry: float = 30.0
+    llm_timeout: float = 60.0
+    llm_connect_timeout: float = 5.0
+    rate_limit_per_minute: int = 60  # Gemini requests per minute, shared by all LLM calls
+    rate_limit_tokens_per_minute: int = 1_000_000  # estimated prompt + answer tokens per minute
+    rate_limit_max_wait_seconds: float = 30.0  # longest a call waits for budget before failing
+    rate_limit_retries: int = 3  # retries of a call answered with 429
     
     # Classification Configuration
-    classification_confidence_threshold: float = 0.6
+    classification_confidence_threshold: float = 0.6  # local classifier confidence needed to skip the LLM
     enable_context_classification: bool = True
+    enable_local_classifier: bool = False  # off until its threshold is calibrated on real traffic
+    intent_examples_path: Optional[str] = None  # JSON {task type: [messages]} added to the built-in examples
     max_context_messages: int = 10
+    history_max_tokens: int = 2000
+    history_max_message_tokens: int = 400
+    enable_rolling_summary: bool = False
+    summary_trigger_messages: int = 12
+    summary_keep_recent: int = 6
+    summary_max_tokens: int = 300
+    enable_semantic_memory: bool = False
+    semantic_top_k: int = 3
+    semantic_min_score: float = 0.35
+    semantic_max_turns: int = 200
     
     # Specialist Configuration
     qna_enabled: bool = True
     search_enabled: bool = True
     calendar_enabled: bool = True
     ticket_enabled: bool = True
+    warm_up_specialists: bool = True  # build specialists in the background instead of on first use
     
     # Logging Configuration
     log_level: str = "INFO"
@@ -44,20 +81,53 @@ class ManagerAgentConfig:
     log_file: Optional[str] = None
     
     # Performance Configuration
-    response_timeout_seconds: int = 30
+    response_timeout_seconds: int = 120  # per-request deadline (specialist cold starts excluded), 0 disables it
     max_concurrent_requests: int = 10
-    enable_caching: bool = True
+    max_queued_requests: int = 50
+    max_requests_per_user: int = 2
+    queue_timeout_seconds: float = 10.0
+    executor_io_workers: int = 16  # threads for blocking tool I/O
+    executor_cpu_workers: int = 2  # workers for document parsing and OCR
+    executor_cpu_processes: bool = True  # False runs CPU work in threads
+    enable_caching: bool = True  # exact-match answer cache for FAQ and search answers
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_local_entries: int = 1024
+    enable_semantic_cache: bool = False  # reuse FAQ answers for paraphrased questions
+    semantic_cache_threshold: float = 0.92  # calibrate on labelled pairs (data.cache.semantic_calibration)
+    semantic_cache_ttl_seconds: int = 86400
+    semantic_cache_max_entries: int = 2000
+    semantic_cache_path: Optional[str] = "data/semantic_cache/faq"
+    enable_faq_fast_path: bool = False  # answer near-exact FAQ matches without the LLM
+    faq_fast_path_min_score: float = 0.85
+    faq_fast_path_min_margin: float = 0.1
+    faq_fast_path_sample_rate: float = 0.05  # share of eligible turns still sent to the LLM
+    enable_speculative_retrieval: bool = False  # start QnA's FAQ search during classification
     
     @classmethod
     def from_env(cls) -> 'ManagerAgentConfig':
         """Load configuration from environment variables."""
         return cls(
+            # Memory
+            memory_backend=os.getenv("MEMORY_BACKEND", "redis").lower(),
+            
             # Redis
             redis_host=os.getenv("REDIS_HOST", "localhost"),
             redis_port=int(os.getenv("REDIS_PORT", "6379")),
             redis_db=int(os.getenv("REDIS_DB", "0")),
             redis_password=os.getenv("REDIS_PASSWORD"),
+            redis_max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+            redis_socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "5")),
+            redis_socket_connect_timeout=float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "5")),
+            redis_health_check_interval=int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")),
+            redis_ssl=os.getenv("REDIS_SSL", "false").lower() == "true",
             max_chat_history=int(os.getenv("MAX_CHAT_HISTORY", "20")),
+            enable_history_cache=os.getenv("ENABLE_HISTORY_CACHE", "true").lower() == "true",
+            history_cache_max_sessions=int(os.getenv("HISTORY_CACHE_MAX_SESSIONS", "1024")),
+            session_idle_ttl_seconds=int(os.getenv("SESSION_IDLE_TTL_SECONDS", str(7 * 24 * 3600))),
+            max_session_bytes=int(os.getenv("MAX_SESSION_BYTES", str(256 * 1024))),
+            max_sessions=int(os.getenv("MAX_SESSIONS", "10000")),
+            session_sweep_interval_seconds=float(os.getenv("SESSION_SWEEP_INTERVAL", "300")),
+            document_ttl_seconds=int(os.getenv("DOCUMENT_TTL_SECONDS", str(30 * 24 * 3600))),
             
             # Milvus
             collection_name=os.getenv("MILVUS_COLLECTION", "academic_support_qa"),
@@ -67,17 +137,39 @@ class ManagerAgentConfig:
             # AI Model
             gemini_api_key=os.getenv("GEMINI_API_KEY"),
             model_name=os.getenv("GEMINI_MODEL", "gemini-2.0-flash"),
+            llm_max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "20")),
+            llm_max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10")),
+            llm_keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30")),
+            llm_timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+            llm_connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+            rate_limit_per_minute=int(os.getenv("RATE_LIMIT_PER_MINUTE", "60")),
+            rate_limit_tokens_per_minute=int(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "1000000")),
+            rate_limit_max_wait_seconds=float(os.getenv("RATE_LIMIT_MAX_WAIT", "30")),
+            rate_limit_retries=int(os.getenv("RATE_LIMIT_RETRIES", "3")),
             
             # Classification
             classification_confidence_threshold=float(os.getenv("CLASSIFICATION_THRESHOLD", "0.6")),
             enable_context_classification=os.getenv("ENABLE_CONTEXT_CLASSIFICATION", "true").lower() == "true",
+            enable_local_classifier=os.getenv("ENABLE_LOCAL_CLASSIFIER", "false").lower() == "true",
+            intent_examples_path=os.getenv("INTENT_EXAMPLES_PATH"),
             max_context_messages=int(os.getenv("MAX_CONTEXT_MESSAGES", "10")),
+            history_max_tokens=int(os.getenv("HISTORY_MAX_TOKENS", "2000")),
+            history_max_message_tokens=int(os.getenv("HISTORY_MAX_MESSAGE_TOKENS", "400")),
+            enable_rolling_summary=os.getenv("ENABLE_ROLLING_SUMMARY", "false").lower() == "true",
+            summary_trigger_messages=int(os.getenv("SUMMARY_TRIGGER_MESSAGES", "12")),
+            summary_keep_recent=int(os.getenv("SUMMARY_KEEP_RECENT", "6")),
+            summary_max_tokens=int(os.getenv("SUMMARY_MAX_TOKENS", "300")),
+            enable_semantic_memory=os.getenv("ENABLE_SEMANTIC_MEMORY", "false").lower() == "true",
+            semantic_top_k=int(os.getenv("SEMANTIC_TOP_K", "3")),
+            semantic_min_score=float(os.getenv("SEMANTIC_MIN_SCORE", "0.35")),
+            semantic_max_turns=int(os.getenv("SEMANTIC_MAX_TURNS", "200")),
             
             # Specialists
             qna_enabled=os.getenv("QNA_ENABLED", "true").lower() == "true",
             search_enabled=os.getenv("SEARCH_ENABLED", "true").lower() == "true",
             calendar_enabled=os.getenv("CALENDAR_ENABLED", "true").lower() == "true",
             ticket_enabled=os.getenv("TICKET_ENABLED", "true").lower() == "true",
+            warm_up_specialists=os.getenv("WARM_UP_SPECIALISTS", "true").lower() == "true",
             
             # Logging
             log_level=os.getenv("LOG_LEVEL", "INFO"),
@@ -85,9 +177,27 @@ class ManagerAgentConfig:
             log_file=os.getenv("LOG_FILE"),
             
             # Performance
-            response_timeout_seconds=int(os.getenv("RESPONSE_TIMEOUT", "30")),
+            response_timeout_seconds=int(os.getenv("RESPONSE_TIMEOUT", "120")),
             max_concurrent_requests=int(os.getenv("MAX_CONCURRENT_REQUESTS", "10")),
+            max_queued_requests=int(os.getenv("MAX_QUEUED_REQUESTS", "50")),
+            max_requests_per_user=int(os.getenv("MAX_REQUESTS_PER_USER", "2")),
+            queue_timeout_seconds=float(os.getenv("QUEUE_TIMEOUT", "10")),
+            executor_io_workers=int(os.getenv("EXECUTOR_IO_WORKERS", "16")),
+            executor_cpu_workers=int(os.getenv("EXECUTOR_CPU_WORKERS", "2")),
+            executor_cpu_processes=os.getenv("EXECUTOR_CPU_PROCESSES", "true").lower() == "true",
             enable_caching=os.getenv("ENABLE_CACHING", "true").lower() == "true",
+            answer_cache_ttl_seconds=int(os.getenv("ANSWER_CACHE_TTL", "3600")),
+            answer_cache_local_entries=int(os.getenv("ANSWER_CACHE_LOCAL_ENTRIES", "1024")),
+            enable_semantic_cache=os.getenv("ENABLE_SEMANTIC_CACHE", "false").lower() == "true",
+            semantic_cache_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            semantic_cache_ttl_seconds=int(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+            semantic_cache_max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000")),
+            semantic_cache_path=os.getenv("SEMANTIC_CACHE_PATH", "data/semantic_cache/faq") or None,
+            enable_faq_fast_path=os.getenv("ENABLE_FAQ_FAST_PATH", "false").lower() == "true",
+            faq_fast_path_min_score=float(os.getenv("FAQ_FAST_PATH_MIN_SCORE", "0.85")),
+            faq_fast_path_min_margin=float(os.getenv("FAQ_FAST_PATH_MIN_MARGIN", "0.1")),
+            faq_fast_path_sample_rate=float(os.getenv("FAQ_FAST_PATH_SAMPLE_RATE", "0.05")),
+            enable_speculative_retrieval=os.getenv("ENABLE_SPECULATIVE_RETRIEVAL", "false").lower() == "true",
         )
     
     def validate(self) -> bool:
@@ -98,17 +208,84 @@ class ManagerAgentConfig:
         if not self.gemini_api_key:
             errors.append("GEMINI_API_KEY is required")
         
+        if self.memory_backend not in ("redis", "memory"):
+            errors.append("memory_backend must be 'redis' or 'memory'")
+        
         # Check Redis configuration
         if not (1 <= self.redis_port <= 65535):
             errors.append("Redis port must be between 1 and 65535")
         
+        if self.redis_max_connections < 1:
+            errors.append("redis_max_connections must be at least 1")
+        
+        if not (1 <= self.llm_max_keepalive_connections <= self.llm_max_connections):
+            errors.append("llm_max_keepalive_connections must be between 1 and llm_max_connections")
+        
         if self.max_chat_history < 1:
             errors.append("max_chat_history must be at least 1")
         
+        if self.history_cache_max_sessions < 1:
+            errors.append("history_cache_max_sessions must be at least 1")
+        
+        if min(self.session_idle_ttl_seconds, self.max_session_bytes, self.max_sessions) < 0:
+            errors.append("session TTL, byte quota and session cap must not be negative")
+        
+        if self.session_sweep_interval_seconds <= 0:
+            errors.append("session_sweep_interval_seconds must be positive")
+        
+        if not (1 <= self.history_max_message_tokens <= self.history_max_tokens):
+            errors.append("history_max_message_tokens must be between 1 and history_max_tokens")
+        
+        if self.enable_rolling_summary and not (
+            0 < self.summary_keep_recent < self.summary_trigger_messages <= self.max_chat_history
+        ):
+            errors.append(
+                "rolling summary requires 0 < summary_keep_recent < summary_trigger_messages <= max_chat_history"
+            )
+        
+        if self.enable_semantic_memory and self.semantic_max_turns < 1:
+            errors.append("semantic_max_turns must be at least 1")
+        
+        if min(self.max_concurrent_requests, self.max_requests_per_user) < 1 or self.max_queued_requests < 0:
+            errors.append("max_concurrent_requests and max_requests_per_user must be at least 1, max_queued_requests not negative")
+        
+        if self.response_timeout_seconds < 0 or self.queue_timeout_seconds <= 0:
+            errors.append("response_timeout_seconds must not be negative and queue_timeout_seconds must be positive")
+        
+        # A request must outlast at least one LLM call that waits for rate-limit budget
+        if 0 < self.response_timeout_seconds <= self.llm_timeout + self.rate_limit_max_wait_seconds:
+            errors.append("response_timeout_seconds must exceed llm_timeout + rate_limit_max_wait_seconds")
+        
+        if min(self.rate_limit_per_minute, self.rate_limit_tokens_per_minute) < 1:
+            errors.append("rate_limit_per_minute and rate_limit_tokens_per_minute must be at least 1")
+        
+        if self.rate_limit_max_wait_seconds <= 0 or self.rate_limit_retries < 0:
+            errors.append("rate_limit_max_wait_seconds must be positive and rate_limit_retries not negative")
+        
+        if min(self.executor_io_workers, self.executor_cpu_workers) < 1:
+            errors.append("executor_io_workers and executor_cpu_workers must be at least 1")
+        
+        if self.enable_caching and (self.answer_cache_ttl_seconds < 1 or self.answer_cache_local_entries < 0):
+            errors.append("answer_cache_ttl_seconds must be at least 1 and answer_cache_local_entries not negative")
+        
+        if self.enable_semantic_cache and not (0.0 < self.semantic_cache_threshold <= 1.0):
+            errors.append("semantic_cache_threshold must be between 0.0 (exclusive) and 1.0")
+        
+        if self.enable_semantic_cache and (self.semantic_cache_ttl_seconds < 1 or self.semantic_cache_max_entries < 1):
+            errors.append("semantic_cache_ttl_seconds and semantic_cache_max_entries must be at least 1")
+        
+        if self.enable_faq_fast_path and not (
+            0.0 <= self.faq_fast_path_min_margin <= 1.0 and 0.0 <= self.faq_fast_path_sample_rate <= 1.0
+        ):
+            errors.append("faq_fast_path_min_margin and faq_fast_path_sample_rate must be between 0.0 and 1.0")
+        
         # Check thresholds
         if not (0.0 <= self.classification_confidence_threshold <= 1.0):
             errors.append("classification_confidence_threshold must be between 0.0 and 1.0")
         
+        if self.intent_examples_path and not os.path.isfile(self.intent_examples_path):
+            errors.append(f"intent_examples_path '{self.intent_examples_path}' does not exist")
+        
         if errors:
             print("Configuration validation errors:")
             for error in errors:
@@ -148,12 +325,28 @@ ENV_TEMPLATE = """
 # ManagerAgent Configuration Template
 # Copy this to .env and fill in your values
 
+# Memory backend: redis, or memory (in-process, no Redis server needed)
+MEMORY_BACKEND=redis
+
 # Redis Configuration
 REDIS_HOST=localhost
 REDIS_PORT=6379
 REDIS_DB=0
 # REDIS_PASSWORD=your_redis_password  # Uncomment if needed
+REDIS_MAX_CONNECTIONS=50
+REDIS_SOCKET_TIMEOUT=5
+REDIS_SOCKET_CONNECT_TIMEOUT=5
+REDIS_HEALTH_CHECK_INTERVAL=30
+REDIS_SSL=false
 MAX_CHAT_HISTORY=20
+ENABLE_HISTORY_CACHE=true
+HISTORY_CACHE_MAX_SESSIONS=1024
+# Session retention (0 disables the limit)
+SESSION_IDLE_TTL_SECONDS=604800
+MAX_SESSION_BYTES=262144
+MAX_SESSIONS=10000
+SESSION_SWEEP_INTERVAL=300
+DOCUMENT_TTL_SECONDS=2592000
 
 # Milvus Configuration
 MILVUS_COLLECTION=academic_support_qa
@@ -163,17 +356,39 @@ MILVUS_URI=http://localhost:19530
 # AI Model Configuration
 GEMINI_API_KEY=your_gemini_api_key_here
 GEMINI_MODEL=gemini-2.0-flash
+LLM_MAX_CONNECTIONS=20
+LLM_MAX_KEEPALIVE_CONNECTIONS=10
+LLM_KEEPALIVE_EXPIRY=30
+LLM_TIMEOUT=60
+LLM_CONNECT_TIMEOUT=5
+RATE_LIMIT_PER_MINUTE=60
+RATE_LIMIT_TOKENS_PER_MINUTE=1000000
+RATE_LIMIT_MAX_WAIT=30
+RATE_LIMIT_RETRIES=3
 
 # Classification Configuration
 CLASSIFICATION_THRESHOLD=0.6
 ENABLE_CONTEXT_CLASSIFICATION=true
+ENABLE_LOCAL_CLASSIFIER=false
+# INTENT_EXAMPLES_PATH=config/intent_examples.json  # Uncomment to add labelled examples
 MAX_CONTEXT_MESSAGES=10
+HISTORY_MAX_TOKENS=2000
+HISTORY_MAX_MESSAGE_TOKENS=400
+ENABLE_ROLLING_SUMMARY=false
+SUMMARY_TRIGGER_MESSAGES=12
+SUMMARY_KEEP_RECENT=6
+SUMMARY_MAX_TOKENS=300
+ENABLE_SEMANTIC_MEMORY=false
+SEMANTIC_TOP_K=3
+SEMANTIC_MIN_SCORE=0.35
+SEMANTIC_MAX_TURNS=200
 
 # Specialist Configuration
 QNA_ENABLED=true
 SEARCH_ENABLED=true
 CALENDAR_ENABLED=true
 TICKET_ENABLED=true
+WARM_UP_SPECIALISTS=true
 
 # Logging Configuration
 LOG_LEVEL=INFO
@@ -181,9 +396,27 @@ DEBUG_LOGGING=false
 # LOG_FILE=logs/manager_agent.log  # Uncomment to enable file logging
 
 # Performance Configuration
-RESPONSE_TIMEOUT=30
+RESPONSE_TIMEOUT=120
 MAX_CONCURRENT_REQUESTS=10
+MAX_QUEUED_REQUESTS=50
+MAX_REQUESTS_PER_USER=2
+QUEUE_TIMEOUT=10
+EXECUTOR_IO_WORKERS=16
+EXECUTOR_CPU_WORKERS=2
+EXECUTOR_CPU_PROCESSES=true
 ENABLE_CACHING=true
+ANSWER_CACHE_TTL=3600
+ANSWER_CACHE_LOCAL_ENTRIES=1024
+ENABLE_SEMANTIC_CACHE=false
+SEMANTIC_CACHE_THRESHOLD=0.92  # calibrate with: python -m data.cache.semantic_calibration
+SEMANTIC_CACHE_TTL=86400
+SEMANTIC_CACHE_MAX_ENTRIES=2000
+SEMANTIC_CACHE_PATH=data/semantic_cache/faq  # empty keeps the cache in memory only
+ENABLE_FAQ_FAST_PATH=false
+FAQ_FAST_PATH_MIN_SCORE=0.85
+FAQ_FAST_PATH_MIN_MARGIN=0.1
+FAQ_FAST_PATH_SAMPLE_RATE=0.05
+ENABLE_SPECULATIVE_RETRIEVAL=false
 """
 
 
@@ -0,0 +1,160 @@
+"""
+Lazily constructed specialist agents.
+
+Building a specialist can be slow (QnA may index the FAQ collection into
+Milvus), so ManagerAgent registers a factory per specialist and builds each
+one on first use, in the shared I/O pool (utils.executors). An optional warm-up task builds them in
+the background right after startup, and every specialist exposes a readiness
+state that the UI can report:
+
+- pending: not built yet
+- loading: being built
+- ready: built and serving
+- unavailable: construction failed; retried after `retry_after_seconds`
+- disabled: turned off in the configuration
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from utils.executors import offload_io
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+UNAVAILABLE = "unavailable"
+DISABLED = "disabled"
+
+
+class SpecialistRegistry:
+    """Builds specialists on demand, at most once each, and tracks their state."""
+
+    def __init__(
+        self,
+        factories: Dict[str, Callable[[], Any]],
+        enabled: Optional[Dict[str, bool]] = None,
+        retry_after_seconds: float = 60.0,
+    ):
+        """
+        Args:
+            factories: Blocking constructor per specialist name
+            enabled: Specialists turned on in the configuration (default: all)
+            retry_after_seconds: Delay before a failed specialist is built again
+        """
+        enabled = enabled or {}
+        self.factories = factories
+        self.retry_after_seconds = retry_after_seconds
+
+        self._agents: Dict[str, Any] = {}
+        self._states = {name: PENDING if enabled.get(name, True) else DISABLED for name in factories}
+        self._errors: Dict[str, str] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._locks = {name: threading.Lock() for name in factories}
+        self._state_lock = threading.Lock()
+        self._warmup_task: Optional[asyncio.Task] = None
+        self._warmup_thread: Optional[threading.Thread] = None
+
+    def get(self, name: str) -> Optional[Any]:
+        """Return a specialist if it is already built, without building it."""
+        return self._agents.get(name)
+
+    def load(self, name: str) -> Optional[Any]:
+        """Build a specialist if needed (blocking); None if it is disabled or failed."""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+
+        with self._locks[name]:
+            agent = self._agents.get(name)
+            if agent is not None:
+                return agent
+            state = self._states[name]
+            if state == DISABLED:
+                return None
+            if state == UNAVAILABLE and time.monotonic() - self._failed_at[name] < self.retry_after_seconds:
+                return None
+
+            self._set_state(name, LOADING)
+            start = time.perf_counter()
+            try:
+                agent = self.factories[name]()
+            except Exception as e:
+                logger.warning(f"{name} agent initialization failed: {e}")
+                with self._state_lock:
+                    self._errors[name] = str(e)
+                    self._failed_at[name] = time.monotonic()
+                self._set_state(name, UNAVAILABLE)
+                return None
+
+            self._agents[name] = agent
+            with self._state_lock:
+                self._load_seconds[name] = time.perf_counter() - start
+                self._errors.pop(name, None)
+            self._set_state(name, READY)
+            logger.info(f"{name} agent initialized in {self._load_seconds[name]:.2f}s")
+            return agent
+
+    async def aget(self, name: str) -> Optional[Any]:
+        """Return a specialist, building it in the I/O pool on first use."""
+        agent = self._agents.get(name)
+        if agent is not None or self._states[name] == DISABLED:
+            return agent
+        return await offload_io(self.load, name)
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None, extra: Iterable[Callable[[], Any]] = ()):
+        """Build specialists (and run extra blocking warm-up steps) one after another."""
+        for step in extra:
+            try:
+                await offload_io(step)
+            except Exception as e:
+                logger.warning(f"Warm-up step failed: {e}")
+        for name in names or self.factories:
+            await offload_io(self.load, name)
+        logger.info(f"Specialist warm-up finished: {self.states()}")
+
+    def start_warmup(self, names: Optional[Iterable[str]] = None, extra: Iterable[Callable[[], Any]] = ()):
+        """Start warm-up on the running event loop, or in a daemon thread if there is none."""
+        if self._warmup_task is not None or self._warmup_thread is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._warmup_thread = threading.Thread(
+                target=asyncio.run, args=(self.warm_up(names, extra),), daemon=True
+            )
+            self._warmup_thread.start()
+        else:
+            self._warmup_task = loop.create_task(self.warm_up(names, extra))
+
+    def _set_state(self, name: str, state: str):
+        with self._state_lock:
+            self._states[name] = state
+
+    def states(self) -> Dict[str, str]:
+        with self._state_lock:
+            return dict(self._states)
+
+    def is_ready(self) -> bool:
+        """True once every enabled specialist has been built or has failed."""
+        return all(state in (READY, UNAVAILABLE, DISABLED) for state in self.states().values())
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness report: state, build time and last error per specialist."""
+        with self._state_lock:
+            return {
+                "ready": all(state in (READY, UNAVAILABLE, DISABLED) for state in self._states.values()),
+                "specialists": {
+                    name: {
+                        "state": state,
+                        "load_seconds": self._load_seconds.get(name),
+                        "error": self._errors.get(name),
+                    }
+                    for name, state in self._states.items()
+                },
+            }
@@ -1,18 +1,15 @@
-import os
-
-from llm.base import AgentClient
-from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai.providers.google_gla import GoogleGLAProvider
+from llm.base import AgentClient, get_model, stream_text
 
 from data.cache.memory_handler import MessageMemoryHandler
 from config.system_prompts import get_enhanced_system_prompt
 
 from utils.basetools import *
+from utils.executors import io_tool
 
 class CalendarHandlerAgent(AgentClient):
     def __init__(self, collection_name: str):
-        provider = GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY"))
-        model = GeminiModel('gemini-2.0-flash', provider=provider)
+        # All specialists share one model and HTTP connection pool
+        model = get_model()
 
         specific_role = """Bạn là trợ lý ảo thông minh của VNU-HCMUT, có nhiệm vụ hỗ trợ sinh viên quản lý lịch học, lịch thi và các sự kiện của trường.
 
@@ -65,10 +62,15 @@ LƯU Ý:
         self.agent = AgentClient(
             model=model,
             system_prompt=enhanced_prompt,
-            tools=[read_file_tool] 
+            tools=[io_tool(read_file_tool)]
         ).create_agent()
 
     async def run(self, query: str):
         """Run the Calendar Handler agent with the provided query."""
         response = await self.agent.run(query)
-        return response
\ No newline at end of file
+        return response
+
+    async def run_stream(self, query: str):
+        """Run the Calendar Handler agent, yielding the answer text as it is generated."""
+        async for delta in stream_text(self.agent, query):
+            yield delta
@@ -1,34 +1,196 @@
 from data.milvus.indexing import MilvusIndexer
-import os
 import re
 import json
+import logging
+from contextlib import aclosing
+from typing import Optional
 
-from llm.base import AgentClient
-from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai.providers.google_gla import GoogleGLAProvider
+from llm.base import AgentClient, get_model, stream_text
 
 from data.cache.memory_handler import MessageMemoryHandler
+from data.cache.answer_cache import is_context_dependent
 from config.system_prompts import get_enhanced_system_prompt
 
 import chainlit as cl
 
 from utils.basetools import *
+from utils.executors import io_tool, offload_io
+from utils.keyword_matcher import KeywordMatcher
+from workflow.specialists.replies import ErrorReply, is_error_reply
+
+logger = logging.getLogger(__name__)
+
+# Computation types that retrieved answers may call for
+COMPUTATION_PATTERNS = {
+    'gpa_calculation': {
+        'keywords': ['gpa', 'điểm trung bình', 'dtb', 'trung bình học kỳ', 'trung bình tích lũy'],
+        'formulas': ['(điểm × tín chỉ)', 'tổng tín chỉ', 'weighted average'],
+        'needs_input': ['điểm các môn', 'số tín chỉ'],
+        'description': 'Tính điểm trung bình học kỳ hoặc tích lũy'
+    },
+    'admission_score': {
+        'keywords': ['điểm xét tuyển', 'tổng hợp', 'điểm đầu vào', 'điểm chuẩn'],
+        'formulas': ['điểm thi × hệ số', 'điểm học bạ × hệ số', 'ưu tiên khu vực'],
+        'needs_input': ['điểm thi đại học', 'điểm học bạ', 'khu vực'],
+        'description': 'Tính điểm xét tuyển đại học'
+    },
+    'scholarship_eligibility': {
+        'keywords': ['học bổng', 'khuyến khích', 'học lực', 'điều kiện'],
+        'formulas': ['gpa >= ngưỡng', 'rèn luyện >= điểm'],
+        'needs_input': ['gpa hiện tại', 'điểm rèn luyện'],
+        'description': 'Kiểm tra điều kiện học bổng'
+    },
+    'credit_calculation': {
+        'keywords': ['tín chỉ', 'đăng ký học', 'khối lượng', 'tính tín chỉ'],
+        'formulas': ['tổng tín chỉ', 'tín chỉ tối đa', 'tín chỉ tối thiểu'],
+        'needs_input': ['số môn học', 'tín chỉ từng môn'],
+        'description': 'Tính toán tín chỉ học tập'
+    },
+    'tuition_calculation': {
+        'keywords': ['học phí', 'chi phí', 'tiền học', 'đóng học phí'],
+        'formulas': ['tín chỉ × đơn giá', 'phí dịch vụ'],
+        'needs_input': ['số tín chỉ đăng ký', 'mức phí'],
+        'description': 'Tính toán học phí'
+    }
+}
+
+# Keywords of each computation type, and the words of each of its formulas
+COMPUTATION_KEYWORDS = KeywordMatcher({
+    **{comp_type: patterns['keywords'] for comp_type, patterns in COMPUTATION_PATTERNS.items()},
+    **{
+        (comp_type, formula): formula.split()
+        for comp_type, patterns in COMPUTATION_PATTERNS.items()
+        for formula in patterns['formulas']
+    },
+})
+
+# Query keywords and the follow-up suggestions offered when nothing was found
+SUGGESTION_KEYWORDS = KeywordMatcher({
+    'finance': ['học phí', 'tiền', 'chi phí', 'học bổng'],
+    'exams': ['điểm', 'thi', 'kiểm tra', 'tốt nghiệp'],
+    'registration': ['đăng ký', 'môn học', 'lịch học'],
+    'paperwork': ['thủ tục', 'giấy tờ', 'xác nhận'],
+    'dormitory': ['ký túc xá', 'ktx', 'chỗ ở'],
+    'admission': ['tuyển sinh', 'nhập học', 'xét tuyển'],
+})
+
+SUGGESTIONS = {
+    'finance': [
+        "• Thông tin học phí các khóa học hiện tại",
+        "• Chính sách học bổng và hỗ trợ tài chính",
+        "• Hướng dẫn đóng học phí và các khoản phí"
+    ],
+    'exams': [
+        "• Quy chế thi và kiểm tra",
+        "• Điều kiện tốt nghiệp",
+        "• Cách tính điểm trung bình"
+    ],
+    'registration': [
+        "• Hướng dẫn đăng ký môn học",
+        "• Lịch học và thời khóa biểu",
+        "• Quy định về việc hủy/thêm môn học"
+    ],
+    'paperwork': [
+        "• Các loại giấy tờ xác nhận sinh viên",
+        "• Thủ tục xin nghỉ học tạm thời",
+        "• Quy trình làm bằng cấp"
+    ],
+    'dormitory': [
+        "• Thông tin về ký túc xá",
+        "• Quy định nội trú",
+        "• Đăng ký chỗ ở"
+    ],
+    'admission': [
+        "• Thông tin tuyển sinh mới nhất",
+        "• Điều kiện xét tuyển",
+        "• Hồ sơ nhập học"
+    ],
+}
+
+# University-related keywords (phrases match without diacritics, so "hoc phi" matches too)
+UNIVERSITY_KEYWORDS = KeywordMatcher({
+    'university': [
+        'hcmut', 'bách khoa', 'vnu-hcmut', 'đhqg',
+        'trường đại học', 'sinh viên',
+        'học phí', 'tuyển sinh', 'đào tạo',
+        'môn học', 'khoa', 'bộ môn', 'giảng viên',
+        'thủ tục', 'học vụ', 'ký túc xá',
+        'thư viện', 'cơ sở vật chất',
+        'chương trình', 'ngành học',
+        'điểm', 'thi', 'kiểm tra', 'tốt nghiệp',
+        'đăng ký', 'lịch học', 'thời khóa biểu',
+        'gpa', 'học bổng'
+    ],
+})
+
+
+OUT_OF_SCOPE_RESPONSE = """Xin lỗi, tôi chỉ có thể hỗ trợ các vấn đề liên quan đến Trường Đại học Bách Khoa - ĐHQG-HCM. 
+
+Tôi có thể giúp bạn về:
+• Quy định học vụ và đào tạo
+• Thủ tục hành chính sinh viên  
+• Thông tin tuyển sinh và chương trình học
+• Dịch vụ sinh viên (học bổng, ký túc xá, thư viện)
+• Cơ sở vật chất và tiện ích của trường
+• Các hoạt động và sự kiện của trường
+• **Tính toán GPA, điểm xét tuyển, học bổng**
+
+Bạn có câu hỏi gì về trường Bách Khoa không?"""
+
+
+# ManagerAgent prefixes the current question with the formatted chat history
+CURRENT_QUESTION_MARKER = "Câu hỏi hiện tại:"
+ATTACHMENT_MARKER = "=== TÀI LIỆU ĐÍNH KÈM ==="
+
+
+def current_question(query: str) -> str:
+    """The question of the current turn, without the chat history before it."""
+    return query.rpartition(CURRENT_QUESTION_MARKER)[2].strip()
+
+
+def has_history(query: str) -> bool:
+    """Whether chat history precedes the current question in a routed query."""
+    return bool(query.rpartition(CURRENT_QUESTION_MARKER)[0].strip())
+
 
 class QnAHandlerAgent(AgentClient):
-    def __init__(self, collection_name: str):
+    def __init__(
+        self,
+        collection_name: str,
+        search_handler=None,
+        ensure_collection: bool = True,
+        answer_cache=None,
+        fast_path=None
+    ):
+        """
+        Args:
+            collection_name: Milvus FAQ collection
+            search_handler: SearchHandlerAgent to reuse for web fallback (default: a new one)
+            ensure_collection: Create and index the collection if it does not exist
+                (callers that already set it up pass False to skip the check)
+            answer_cache: Optional SemanticAnswerCache answering paraphrases of
+                questions answered before
+            fast_path: Optional FAQFastPath returning curated answers of
+                near-exact FAQ matches without an LLM call
+        """
         # Only run indexer if collection doesn't exist
         from pymilvus import utility
-        if not utility.has_collection(collection_name):
+        if ensure_collection and not utility.has_collection(collection_name):
             # Initialize Milvus indexer (run only once to create collection and index data)
             indexer = MilvusIndexer(collection_name=collection_name, faq_file="src/data/mock_data/vnu_hcmut_faq.xlsx")
             indexer.run()
 
-        provider = GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY"))
-        model = GeminiModel('gemini-2.0-flash', provider=provider)
+        self.collection_name = collection_name
+
+        # All specialists share one model and HTTP connection pool
+        model = get_model()
 
         # Initialize your tools
         #---------------------------------------------
-        faq_tool = create_faq_tool(collection_name=collection_name)
+        # One FAQ search (and Milvus client) serves both the agent's tool and
+        # the handler's own searches; the tool runs in the I/O pool, off the event loop
+        self._faq_search = create_faq_tool(collection_name=collection_name)
+        faq_tool = io_tool(self._faq_search)
         
         # Calculator tools for computational capabilities
         from utils.basetools.calculator_tool import (
@@ -105,56 +267,27 @@ LƯU Ý QUAN TRỌNG:
         ).create_agent()
 
         # Initialize SearchHandler for fallback
-        from .SearchHandler import SearchHandlerAgent
-        self.search_handler = SearchHandlerAgent()
+        if search_handler is None:
+            from .SearchHandler import SearchHandlerAgent
+            search_handler = SearchHandlerAgent()
+        self.search_handler = search_handler
+        self.answer_cache = answer_cache
+        self.fast_path = fast_path
 
     def _has_computational_content(self, text: str) -> dict:
         """
         Analyze text to detect computational content and formulas.
         Returns detailed information about what type of computation is needed.
         """
-        computation_patterns = {
-            'gpa_calculation': {
-                'keywords': ['gpa', 'điểm trung bình', 'dtb', 'trung bình học kỳ', 'trung bình tích lũy'],
-                'formulas': ['(điểm × tín chỉ)', 'tổng tín chỉ', 'weighted average'],
-                'needs_input': ['điểm các môn', 'số tín chỉ'],
-                'description': 'Tính điểm trung bình học kỳ hoặc tích lũy'
-            },
-            'admission_score': {
-                'keywords': ['điểm xét tuyển', 'tổng hợp', 'điểm đầu vào', 'điểm chuẩn'],
-                'formulas': ['điểm thi × hệ số', 'điểm học bạ × hệ số', 'ưu tiên khu vực'],
-                'needs_input': ['điểm thi đại học', 'điểm học bạ', 'khu vực'],
-                'description': 'Tính điểm xét tuyển đại học'
-            },
-            'scholarship_eligibility': {
-                'keywords': ['học bổng', 'khuyến khích', 'học lực', 'điều kiện'],
-                'formulas': ['gpa >= ngưỡng', 'rèn luyện >= điểm'],
-                'needs_input': ['gpa hiện tại', 'điểm rèn luyện'],
-                'description': 'Kiểm tra điều kiện học bổng'
-            },
-            'credit_calculation': {
-                'keywords': ['tín chỉ', 'đăng ký học', 'khối lượng', 'tính tín chỉ'],
-                'formulas': ['tổng tín chỉ', 'tín chỉ tối đa', 'tín chỉ tối thiểu'],
-                'needs_input': ['số môn học', 'tín chỉ từng môn'],
-                'description': 'Tính toán tín chỉ học tập'
-            },
-            'tuition_calculation': {
-                'keywords': ['học phí', 'chi phí', 'tiền học', 'đóng học phí'],
-                'formulas': ['tín chỉ × đơn giá', 'phí dịch vụ'],
-                'needs_input': ['số tín chỉ đăng ký', 'mức phí'],
-                'description': 'Tính toán học phí'
-            }
-        }
-        
-        text_lower = text.lower()
+        hits = COMPUTATION_KEYWORDS.match(text)
         detected_computations = []
         
-        for comp_type, patterns in computation_patterns.items():
+        for comp_type, patterns in COMPUTATION_PATTERNS.items():
             # Check for keywords
-            keyword_matches = sum(1 for keyword in patterns['keywords'] if keyword in text_lower)
+            keyword_matches = len(hits.get(comp_type, ()))
             
-            # Check for formula patterns
-            formula_matches = sum(1 for formula in patterns['formulas'] if any(word in text_lower for word in formula.split()))
+            # Check for formula patterns (a formula matches if any of its words occurs)
+            formula_matches = sum(1 for formula in patterns['formulas'] if hits.get((comp_type, formula)))
             
             if keyword_matches > 0 or formula_matches > 0:
                 confidence = min(1.0, (keyword_matches + formula_matches) / (len(patterns['keywords']) + len(patterns['formulas'])))
@@ -302,51 +435,13 @@ Tôi tìm thấy thông tin về học phí. Để tính toán chi phí:
         """
         Generate contextual suggestions based on the query content.
         """
-        query_lower = query.lower()
+        hits = SUGGESTION_KEYWORDS.match(query)
         suggestions = []
         
-        # Academic-related queries
-        if any(keyword in query_lower for keyword in ['học phí', 'tiền', 'chi phí', 'học bổng']):
-            suggestions.extend([
-                "• Thông tin học phí các khóa học hiện tại",
-                "• Chính sách học bổng và hỗ trợ tài chính",
-                "• Hướng dẫn đóng học phí và các khoản phí"
-            ])
-            
-        if any(keyword in query_lower for keyword in ['điểm', 'thi', 'kiểm tra', 'tốt nghiệp']):
-            suggestions.extend([
-                "• Quy chế thi và kiểm tra",
-                "• Điều kiện tốt nghiệp",
-                "• Cách tính điểm trung bình"
-            ])
-            
-        if any(keyword in query_lower for keyword in ['đăng ký', 'môn học', 'lịch học']):
-            suggestions.extend([
-                "• Hướng dẫn đăng ký môn học",
-                "• Lịch học và thời khóa biểu",
-                "• Quy định về việc hủy/thêm môn học"
-            ])
-            
-        if any(keyword in query_lower for keyword in ['thủ tục', 'giấy tờ', 'xác nhận']):
-            suggestions.extend([
-                "• Các loại giấy tờ xác nhận sinh viên",
-                "• Thủ tục xin nghỉ học tạm thời",
-                "• Quy trình làm bằng cấp"
-            ])
-            
-        if any(keyword in query_lower for keyword in ['ký túc xá', 'ktx', 'chỗ ở']):
-            suggestions.extend([
-                "• Thông tin về ký túc xá",
-                "• Quy định nội trú",
-                "• Đăng ký chỗ ở"
-            ])
-            
-        if any(keyword in query_lower for keyword in ['tuyển sinh', 'nhập học', 'xét tuyển']):
-            suggestions.extend([
-                "• Thông tin tuyển sinh mới nhất",
-                "• Điều kiện xét tuyển",
-                "• Hồ sơ nhập học"
-            ])
+        # Suggestions for every topic the query mentions
+        for topic, topic_suggestions in SUGGESTIONS.items():
+            if hits.get(topic):
+                suggestions.extend(topic_suggestions)
             
         # Default suggestions if no specific category matches
         if not suggestions:
@@ -360,108 +455,73 @@ Tôi tìm thấy thông tin về học phí. Để tính toán chi phí:
 
     def _is_university_related(self, query: str) -> bool:
         """Check if query is related to HCMUT"""
-        query_lower = query.lower()
-        
-        # University-related keywords
-        university_keywords = [
-            'hcmut', 'bách khoa', 'bach khoa', 'vnu-hcmut', 'đhqg', 'dhqg',
-            'trường đại học', 'truong dai hoc', 'sinh viên', 'sinh vien',
-            'học phí', 'hoc phi', 'tuyển sinh', 'tuyen sinh', 'đào tạo', 'dao tao',
-            'môn học', 'mon hoc', 'khoa', 'bộ môn', 'bo mon', 'giảng viên', 'giang vien',
-            'thủ tục', 'thu tuc', 'học vụ', 'hoc vu', 'ký túc xá', 'ky tuc xa',
-            'thư viện', 'thu vien', 'cơ sở vật chất', 'co so vat chat',
-            'chương trình', 'chuong trinh', 'ngành học', 'nganh hoc',
-            'điểm', 'diem', 'thi', 'kiểm tra', 'kiem tra', 'tốt nghiệp', 'tot nghiep',
-            'đăng ký', 'dang ky', 'lịch học', 'lich hoc', 'thời khóa biểu', 'thoi khoa bieu',
-            'gpa', 'học bổng', 'hoc bong'
-        ]
-        
-        # Check if any university keyword is present
-        for keyword in university_keywords:
-            if keyword in query_lower:
-                return True
-                
-        return False
+        return UNIVERSITY_KEYWORDS.matches_any(query, 'university')
 
-    async def run(self, query: str):
-        """Run the enhanced QnA handler agent with computational capabilities."""
-        try:
-            # First validate if query is related to HCMUT
-            if not self._is_university_related(query):
-                return """Xin lỗi, tôi chỉ có thể hỗ trợ các vấn đề liên quan đến Trường Đại học Bách Khoa - ĐHQG-HCM. 
+    def _search_faq(self, query: str):
+        """Direct FAQ search used to judge whether the collection covers a query."""
+        search_input = FAQInput(query=query, limit=5, search_answers=False)
+        return self._faq_search(search_input)
 
-Tôi có thể giúp bạn về:
-• Quy định học vụ và đào tạo
-• Thủ tục hành chính sinh viên  
-• Thông tin tuyển sinh và chương trình học
-• Dịch vụ sinh viên (học bổng, ký túc xá, thư viện)
-• Cơ sở vật chất và tiện ích của trường
-• Các hoạt động và sự kiện của trường
-• **Tính toán GPA, điểm xét tuyển, học bổng**
+    async def _retrieval_results(self, captured: list, query: str, retrieved: Optional[list] = None) -> list:
+        """
+        FAQ results to judge coverage with: those the agent retrieved while
+        answering, those retrieved before generation, or a direct search of
+        the current question (without the chat history) if there are neither.
+        """
+        return captured or retrieved or await offload_io(self.retrieve, current_question(query))
+
+    def _with_retrieved_context(self, query: str, retrieved: Optional[list]) -> str:
+        """Add FAQ entries retrieved before generation to the prompt, sparing the agent a faq_tool round trip."""
+        entries = [hit for hit in retrieved or [] if hit.get("Answer")][:3]
+        if not entries:
+            return query
+        context = "\n".join(
+            f"{i}. Hỏi: {hit.get('Question')}\n   Đáp: {hit['Answer']}" for i, hit in enumerate(entries, 1)
+        )
+        return f"""{query}
 
-Bạn có câu hỏi gì về trường Bách Khoa không?"""
+=== KẾT QUẢ TÌM KIẾM FAQ ===
+{context}
 
-            # First, try to get results from Milvus via the agent
-            response = await self.agent.run(query)
-            
-            # Extract search results from the response to evaluate quality
-            # We need to perform a direct search to evaluate the results
-            faq_tool_instance = create_faq_tool(collection_name="summerschool_workshop")
-            search_input = FAQInput(query=query, limit=5, search_answers=False)
-            search_results = faq_tool_instance(search_input)
-            
-            # Check if the response contains computational content
-            combined_text = query + " " + str(response)
-            computation_info = self._has_computational_content(combined_text)
-            
-            # If computational content is detected, enhance the response
-            if computation_info['has_computation']:
-                primary_comp = computation_info['primary_computation']
-                
-                # Add computational guidance to the response
-                enhanced_response = f"""🔍 **Thông tin từ cơ sở dữ liệu FAQ:**
-{response}
+Nếu các kết quả FAQ trên đã đủ để trả lời thì không cần gọi lại faq_tool."""
 
-🧮 **Phát hiện yêu cầu tính toán:** {primary_comp['description']}
+    def _computation_guidance(self, computation_info: dict, query: str) -> str:
+        """Section asking for the inputs of a detected computation."""
+        primary_comp = computation_info['primary_computation']
+        return f"""🧮 **Phát hiện yêu cầu tính toán:** {primary_comp['description']}
 
 {self._generate_computation_prompt(computation_info, query)}
 
 💡 **Sau khi bạn cung cấp thông tin, tôi sẽ tính toán cụ thể và đưa ra kết quả chính xác cho bạn.**"""
-                
-                return enhanced_response
-            
-            # Evaluate if the Milvus results are good enough
-            elif not self._evaluate_search_quality(search_results.results, query):
-                # If Milvus results are not good, use SearchHandler
-                print(f"Milvus results insufficient for query: {query}. Using SearchHandler.")
-                
-                # Call SearchHandler for better results
-                search_response = await self.search_handler.run(query)
-                
-                # Check if search results contain computational content
-                search_computation_info = self._has_computational_content(search_response)
-                
-                if search_computation_info['has_computation']:
-                    primary_comp = search_computation_info['primary_computation']
-                    enhanced_response = f"""🔍 **Tìm kiếm trong cơ sở dữ liệu FAQ**
+
+    async def _search_fallback(self, query: str) -> str:
+        """Answer from the web search when the FAQ collection does not cover the query."""
+        print(f"Milvus results insufficient for query: {query}. Using SearchHandler.")
+        
+        # Call SearchHandler for better results
+        search_response = await self.search_handler.run(query)
+        
+        # A failed web search is reported as is, never cached as an answer
+        if is_error_reply(search_response):
+            return search_response
+        
+        # Check if search results contain computational content
+        search_computation_info = self._has_computational_content(search_response)
+        
+        if search_computation_info['has_computation']:
+            return f"""🔍 **Tìm kiếm trong cơ sở dữ liệu FAQ**
 Tôi không tìm thấy thông tin rõ ràng trong cơ sở dữ liệu FAQ của trường về câu hỏi này.
 
 🌐 **Kết quả tìm kiếm mở rộng:**
 {search_response}
 
-🧮 **Phát hiện yêu cầu tính toán:** {primary_comp['description']}
-
-{self._generate_computation_prompt(search_computation_info, query)}
-
-💡 **Sau khi bạn cung cấp thông tin, tôi sẽ tính toán cụ thể và đưa ra kết quả chính xác cho bạn.**"""
-                    
-                    return enhanced_response
-                
-                # Generate contextual suggestions based on query content
-                suggestions = self._generate_suggestions(query)
-                
-                # Combine Milvus results (if any) with search results
-                combined_response = f"""
+{self._computation_guidance(search_computation_info, query)}"""
+        
+        # Generate contextual suggestions based on query content
+        suggestions = self._generate_suggestions(query)
+        
+        # Combine Milvus results (if any) with search results
+        return f"""
 🔍 **Tìm kiếm trong cơ sở dữ liệu FAQ**
 Tôi không tìm thấy thông tin rõ ràng trong cơ sở dữ liệu FAQ của trường về câu hỏi này.
 
@@ -477,16 +537,219 @@ Nếu cần hỗ trợ cụ thể hơn, vui lòng liên hệ:
 - Phòng Công tác sinh viên: để biết về thủ tục hành chính, học bổng
 - Hotline trường: để được hỗ trợ nhanh chóng
 """
-                return combined_response
-            else:
-                # Milvus results are good, return the original response
-                return response
-                
+
+    async def _error_fallback(self, error: Exception, query: str) -> str:
+        print(f"Error in QnAHandler: {error}")
+        # Fallback to SearchHandler if there's an error
+        try:
+            search_response = await self.search_handler.run(query)
+            return ErrorReply(f"Đã xảy ra lỗi khi truy cập cơ sở dữ liệu FAQ. Tuy nhiên, đây là thông tin tìm kiếm được:\n\n{search_response}")
+        except Exception as search_error:
+            return ErrorReply(f"Xin lỗi, đã xảy ra lỗi khi xử lý câu hỏi của bạn. Vui lòng thử lại sau. Lỗi: {search_error}")
+
+    async def _cached_answer(self, query: str):
+        """
+        Look up a paraphrase of the current question in the semantic cache.
+
+        Returns (answer or None, question, vector); question is None when the
+        turn must not use the cache (follow-ups, attachments, no cache). Only
+        queries routed without chat history qualify: an answer generated with
+        one user's history must not be served to another user.
+        """
+        if self.answer_cache is None or has_history(query):
+            return None, None, None
+        question = current_question(query)
+        if not question or ATTACHMENT_MARKER in question or is_context_dependent(question):
+            return None, None, None
+        try:
+            answer, vector = await self.answer_cache.lookup(question)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None, None, None
+        return answer, question, vector
+
+    async def _cache_answer(self, question, vector, answer: str):
+        if question is None:
+            return
+        try:
+            await self.answer_cache.add(question, answer, vector)
         except Exception as e:
-            print(f"Error in QnAHandler: {e}")
-            # Fallback to SearchHandler if there's an error
+            logger.warning(f"Semantic cache store failed: {e}")
+
+    def retrieve(self, question: str) -> list:
+        """FAQ search for a bare question (blocking); ManagerAgent runs it speculatively."""
+        return self._search_faq(question).results
+
+    async def _retrieve_first(self, query: str, prefetched=None) -> Optional[list]:
+        """
+        FAQ results for the current question, retrieved before generation:
+        the speculative retrieval started by ManagerAgent, or a search of
+        our own when the fast path needs one.
+        """
+        if prefetched is not None:
             try:
-                search_response = await self.search_handler.run(query)
-                return f"Đã xảy ra lỗi khi truy cập cơ sở dữ liệu FAQ. Tuy nhiên, đây là thông tin tìm kiếm được:\n\n{search_response}"
-            except Exception as search_error:
-                return f"Xin lỗi, đã xảy ra lỗi khi xử lý câu hỏi của bạn. Vui lòng thử lại sau. Lỗi: {search_error}"
\ No newline at end of file
+                return await prefetched
+            except Exception as e:
+                logger.warning(f"Speculative FAQ retrieval failed: {e}")
+                return None
+        if self.fast_path is None:
+            return None
+        question = current_question(query)
+        if not question or ATTACHMENT_MARKER in question or is_context_dependent(question):
+            return None
+        try:
+            return await offload_io(self.retrieve, question)
+        except Exception as e:
+            logger.warning(f"FAQ fast path retrieval failed: {e}")
+            return None
+
+    def _fast_path_match(self, query: str, retrieved: Optional[list]):
+        """
+        Check whether the top FAQ entry retrieved for the current question can
+        be answered directly.
+
+        Returns (match or None, sampled); a sampled match still goes to the LLM.
+        """
+        if self.fast_path is None or retrieved is None:
+            return None, False
+        question = current_question(query)
+        match = self.fast_path.select(retrieved)
+        # Answers with formulas need the inputs the LLM path asks for
+        if match is not None and self._has_computational_content(question + " " + match.answer)['has_computation']:
+            match = None
+        sampled = match is not None and self.fast_path.should_sample()
+        self.fast_path.record(fast_path=match is not None and not sampled, sampled=sampled)
+        return match, sampled
+
+    async def run(self, query: str, prefetched=None):
+        """
+        Run the enhanced QnA handler agent with computational capabilities.
+
+        Args:
+            query: The question, after the formatted chat history
+            prefetched: Optional awaitable of FAQ results for the current
+                question, retrieved while the message was being classified
+        """
+        # First validate if query is related to HCMUT
+        if not self._is_university_related(query):
+            return OUT_OF_SCOPE_RESPONSE
+
+        cached, question, vector = await self._cached_answer(query)
+        if cached is not None:
+            return cached
+
+        retrieved = await self._retrieve_first(query, prefetched)
+        match, sampled = self._fast_path_match(query, retrieved)
+        if match is not None and not sampled:
+            return self.fast_path.render(match)
+
+        try:
+            response = await self._answer(query, retrieved)
+        except Exception as e:
+            return await self._error_fallback(e, query)
+        if is_error_reply(response):
+            return response
+
+        answer = str(response.output) if hasattr(response, 'output') else str(response)
+        if sampled:
+            self.fast_path.record_sample(current_question(query), match, answer)
+        await self._cache_answer(question, vector, answer)
+        return response
+
+    async def _answer(self, query: str, retrieved: Optional[list] = None):
+        """Answer from the FAQ collection, with computation guidance or the web search fallback."""
+        # The agent searches Milvus through faq_tool; its results are kept to
+        # judge coverage instead of repeating the search
+        with capture_faq_results() as captured:
+            response = await self.agent.run(self._with_retrieved_context(query, retrieved))
+        return await self._complete_answer(query, response, await self._retrieval_results(captured, query, retrieved))
+
+    async def _complete_answer(self, query: str, response, search_results: list):
+        """Add computation guidance to an agent answer, or replace it when the FAQ does not cover the query."""
+        # Check if the response contains computational content
+        combined_text = query + " " + str(response)
+        computation_info = self._has_computational_content(combined_text)
+        
+        # If computational content is detected, enhance the response
+        if computation_info['has_computation']:
+            # Add computational guidance to the response
+            return f"""🔍 **Thông tin từ cơ sở dữ liệu FAQ:**
+{response}
+
+{self._computation_guidance(computation_info, query)}"""
+        
+        # Evaluate if the Milvus results are good enough
+        elif not self._evaluate_search_quality(search_results, query):
+            # If Milvus results are not good, use SearchHandler
+            return await self._search_fallback(query)
+        else:
+            # Milvus results are good, return the original response
+            return response
+
+    async def run_stream(self, query: str, prefetched=None):
+        """
+        Run the QnA handler, yielding the answer text as it is generated.
+
+        FAQ coverage is judged from the results the agent retrieved, once its
+        tool calls are done and the first text arrives. When the collection
+        covers the query the answer is streamed and computation guidance
+        follows it; otherwise the answer is completed as in run() and comes
+        in one piece.
+        """
+        if not self._is_university_related(query):
+            yield OUT_OF_SCOPE_RESPONSE
+            return
+        
+        cached, question, vector = await self._cached_answer(query)
+        if cached is not None:
+            yield cached
+            return
+        
+        retrieved = await self._retrieve_first(query, prefetched)
+        match, sampled = self._fast_path_match(query, retrieved)
+        if match is not None and not sampled:
+            yield self.fast_path.render(match)
+            return
+        
+        streamed = False
+        try:
+            parts = []
+            search_results = None
+            prompt = self._with_retrieved_context(query, retrieved)
+            with capture_faq_results() as captured:
+                async with aclosing(stream_text(self.agent, prompt)) as deltas:
+                    async for delta in deltas:
+                        if search_results is None:
+                            search_results = await self._retrieval_results(captured, query, retrieved)
+                            covered = self._evaluate_search_quality(search_results, query)
+                        parts.append(delta)
+                        if covered:
+                            streamed = True
+                            yield delta
+            
+            if not streamed:
+                if search_results is None:
+                    search_results = await self._retrieval_results(captured, query, retrieved)
+                response = await self._complete_answer(query, "".join(parts), search_results)
+                if is_error_reply(response):
+                    yield response
+                    return
+                answer = str(response.output) if hasattr(response, 'output') else str(response)
+                yield answer
+                if sampled:
+                    self.fast_path.record_sample(current_question(query), match, answer)
+                await self._cache_answer(question, vector, answer)
+                return
+            
+            computation_info = self._has_computational_content(query + " " + "".join(parts))
+            if computation_info['has_computation']:
+                guidance = "\n\n" + self._computation_guidance(computation_info, query)
+                parts.append(guidance)
+                yield guidance
+            if sampled:
+                self.fast_path.record_sample(current_question(query), match, "".join(parts))
+            await self._cache_answer(question, vector, "".join(parts))
+        except Exception as e:
+            if streamed:
+                raise
+            yield await self._error_fallback(e, query)
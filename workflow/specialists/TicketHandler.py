@@ -1,19 +1,16 @@
-import os
-
-from llm.base import AgentClient
-from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai.providers.google_gla import GoogleGLAProvider
+from llm.base import AgentClient, get_model, stream_text
 
 from data.cache.memory_handler import MessageMemoryHandler
 from config.system_prompts import get_enhanced_system_prompt
 
 from utils.basetools import *
+from utils.executors import io_tool
 
 class TicketHandlerAgent(AgentClient):
     def __init__(self, collection_name: str):
 
-        provider = GoogleGLAProvider(api_key=os.getenv("GEMINI_API_KEY"))
-        model = GeminiModel('gemini-2.0-flash', provider=provider)
+        # All specialists share one model and HTTP connection pool
+        model = get_model()
 
         specific_role = """Bạn là trợ lý ảo thông minh của VNU-HCMUT, có nhiệm vụ hỗ trợ sinh viên gửi email tickets dựa trên thắc mắc về các vấn đề học tập và dịch vụ sinh viên của trường. 
 
@@ -43,10 +40,15 @@ Body: {body}"""
         self.agent = AgentClient(
             model=model,
             system_prompt=enhanced_prompt,
-            tools=[send_email_tool]
+            tools=[io_tool(send_email_tool)]
         ).create_agent()
 
     async def run(self, query: str):
         """Run the Ticket Handler agent with the provided query."""
         response = await self.agent.run(query)
-        return response
\ No newline at end of file
+        return response
+
+    async def run_stream(self, query: str):
+        """Run the Ticket Handler agent, yielding the answer text as it is generated."""
+        async for delta in stream_text(self.agent, query):
+            yield delta
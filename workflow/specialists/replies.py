@@ -0,0 +1,17 @@
+"""
+Replies a specialist gives when it could not answer.
+
+Error and fallback paths return an ErrorReply instead of a plain string. It
+is still a string for callers that only show it, but the flag lets
+ManagerAgent and the answer caches tell it apart from an answer, so a
+transient failure (Milvus or web search down) is never cached.
+"""
+
+
+class ErrorReply(str):
+    """Text shown in place of an answer after an error or failed lookup."""
+
+
+def is_error_reply(response) -> bool:
+    """Whether a specialist response is an ErrorReply."""
+    return isinstance(response, ErrorReply)
@@ -0,0 +1,109 @@
+"""
+Speculative FAQ retrieval for ManagerAgent.
+
+Most messages end up routed to QnA, whose first step is an FAQ search
+(embedding plus Milvus). In speculative mode that search starts as soon as a
+message arrives, concurrently with history loading and classification. If the
+message is routed to QnA the running search is handed to the specialist;
+otherwise it is cancelled. The search runs in the shared I/O pool, and
+cancelling only drops it while it is still queued: once a worker has picked it
+up, it holds that worker until it returns. Speculation is therefore skipped
+while the pool is saturated, so it never delays a request's own I/O.
+
+Per route, the time the search ran before the route was decided is recorded
+for QnA as wall-clock time saved; for the other routes the whole search, up to
+the moment its worker is free again, is recorded as wasted work.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Speculation:
+    """One retrieval started ahead of the routing decision."""
+
+    def __init__(self, submit: Callable[[], Future]):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.future = submit()
+        self.future.add_done_callback(self._done)
+        # Cancelling the awaitable cancels the pool future if it has not started
+        self.task = asyncio.wrap_future(self.future)
+
+    def _done(self, future: Future):
+        self.finished = time.perf_counter()
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"Speculative retrieval failed: {future.exception()}")
+
+    def ahead_seconds(self, decided_at: float) -> float:
+        """Seconds of retrieval that ran before the route was decided."""
+        end = self.finished if self.finished is not None and self.finished < decided_at else decided_at
+        return max(0.0, end - self.started)
+
+
+class SpeculativeRetrieval:
+    """Starts speculative retrievals and accounts for them per route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"turns": 0, "seconds_saved": 0.0, "seconds_wasted": 0.0}
+        )
+        self._skipped = 0
+
+    def start(self, submit: Callable[[], Future]) -> Speculation:
+        """Start a retrieval; `submit` hands it to a worker pool and returns the pool future."""
+        return Speculation(submit)
+
+    def skip(self):
+        """Record a message not speculated on because the worker pool was saturated."""
+        with self._lock:
+            self._skipped += 1
+
+    def resolve(self, speculation: Speculation, route: str, use: bool) -> Optional[asyncio.Future]:
+        """
+        Settle a speculation once the route is known.
+
+        Returns the retrieval to hand to the specialist when `use` is true;
+        otherwise the retrieval is cancelled and None is returned. The time of
+        a discarded retrieval is recorded once its worker is done with it.
+        """
+        if use:
+            ahead = speculation.ahead_seconds(time.perf_counter())
+            with self._lock:
+                stats = self._routes[route]
+                stats["turns"] += 1
+                stats["seconds_saved"] += ahead
+            return speculation.task
+
+        with self._lock:
+            self._routes[route]["turns"] += 1
+
+        def wasted(future: Future):
+            with self._lock:
+                self._routes[route]["seconds_wasted"] += time.perf_counter() - speculation.started
+
+        speculation.task.cancel()
+        speculation.future.add_done_callback(wasted)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Turns, wall-clock seconds saved and seconds of wasted retrieval per route, plus skipped turns."""
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self._routes.items()}
+            skipped = self._skipped
+        for stats in routes.values():
+            stats["avg_seconds_saved"] = stats["seconds_saved"] / stats["turns"] if stats["turns"] else 0.0
+        return {
+            "routes": routes,
+            "skipped_saturated": skipped,
+            "seconds_saved": sum(stats["seconds_saved"] for stats in routes.values()),
+            "seconds_wasted": sum(stats["seconds_wasted"] for stats in routes.values()),
+        }